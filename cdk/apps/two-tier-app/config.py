@@ -0,0 +1,488 @@
+""" The typed configuration of the two tier app """
+
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+# The shared package lives two directories above the app, under cdk/.
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from shared.app_config import (  # noqa: E402
+    ConfigError,
+    EnvironmentConfig,
+    load_config,
+)
+from shared.mysql_parameters import (  # noqa: E402
+    INSTANCE_CLASSES,
+    INSTANCE_PARAMETERS,
+)
+from shared.rds_storage import storage_iops, validate_storage  # noqa: E402
+
+__all__ = [
+    "ConfigError",
+    "RdsConfig",
+    "RdsProxyConfig",
+    "RdsReplicaConfig",
+    "RdsServerlessConfig",
+    "RdsStorageConfig",
+    "TwoTierConfig",
+    "load_config",
+]
+
+# The connection pinning filters an RDS Proxy accepts for MySQL.
+SESSION_PINNING_FILTERS = ("EXCLUDE_VARIABLE_SETS",)
+
+# An EC2 instance type, such as "r5.large", which RDS prefixes with "db.".
+INSTANCE_TYPE = re.compile(r"^[a-z][a-z0-9-]*\.[a-z0-9]+$")
+
+# How the database is provisioned: a MySQL instance of a fixed class, or an
+# Aurora MySQL cluster of Serverless v2 instances.
+ENGINE_MODES = ("instance", "aurora-serverless-v2")
+
+
+def _check_instance_type(reader, key, instance_type):
+    """
+    Record an error for an instance type which is malformed, or which the
+    MySQL parameters cannot be derived for.
+    """
+
+    if instance_type is None:
+        return
+    if not INSTANCE_TYPE.match(instance_type):
+        reader.errors.append(
+            f"{key} must be an instance type such as r5.large, not "
+            f"{instance_type!r}"
+        )
+    elif instance_type not in INSTANCE_CLASSES:
+        reader.errors.append(
+            f"{key} {instance_type!r} is not in "
+            f"shared.mysql_parameters.INSTANCE_CLASSES"
+        )
+
+
+@dataclass(frozen=True)
+class RdsProxyConfig:
+    """
+    The RDS Proxy in front of the database, pooling the connections of the
+    application instances.
+    """
+
+    __slots__ = (
+        "enabled",
+        "borrow_timeout",
+        "max_connections_percent",
+        "max_idle_connections_percent",
+        "session_pinning_filters",
+    )
+
+    enabled: bool
+    borrow_timeout: int
+    max_connections_percent: int
+    max_idle_connections_percent: int
+    session_pinning_filters: Tuple[str, ...]
+
+    @classmethod
+    def from_context(cls, reader):
+        path = ("rds", "{environment}", "proxy")
+        config = cls(
+            enabled=reader.get(*path, "enabled", kind=bool, default=False),
+            borrow_timeout=reader.get(
+                *path, "borrow_timeout_seconds", kind=int
+            ),
+            max_connections_percent=reader.get(
+                *path, "max_connections_percent", kind=int
+            ),
+            max_idle_connections_percent=reader.get(
+                *path, "max_idle_connections_percent", kind=int
+            ),
+            session_pinning_filters=tuple(
+                reader.get(*path, "session_pinning_filters", kind=list) or ()
+            ),
+        )
+
+        """
+        The limits RDS applies to the proxy's target group, checked here so
+        that synth fails rather than the deploy.
+        """
+
+        prefix = f"rds.{reader.environment}.proxy"
+        if config.borrow_timeout is not None and not (
+            0 <= config.borrow_timeout <= 3600
+        ):
+            reader.errors.append(
+                f"{prefix}.borrow_timeout_seconds must be from 0 to 3600"
+            )
+        if config.max_connections_percent is not None and not (
+            1 <= config.max_connections_percent <= 100
+        ):
+            reader.errors.append(
+                f"{prefix}.max_connections_percent must be from 1 to 100"
+            )
+        if (
+            config.max_idle_connections_percent is not None
+            and config.max_connections_percent is not None
+            and not (
+                0
+                <= config.max_idle_connections_percent
+                <= config.max_connections_percent
+            )
+        ):
+            reader.errors.append(
+                f"{prefix}.max_idle_connections_percent must be from 0 to "
+                f"max_connections_percent"
+            )
+        for pinning_filter in config.session_pinning_filters:
+            if pinning_filter not in SESSION_PINNING_FILTERS:
+                reader.errors.append(
+                    f"{prefix}.session_pinning_filters must be of "
+                    f"{', '.join(SESSION_PINNING_FILTERS)}, not "
+                    f"{pinning_filter!r}"
+                )
+
+        return config
+
+
+@dataclass(frozen=True)
+class RdsReplicaConfig:
+    """
+    The read replicas of the database, spread over the listed availability
+    zones in turn, or placed by RDS when none are listed.
+    """
+
+    __slots__ = (
+        "count",
+        "instance_type",
+        "availability_zones",
+        "lag_alarm_seconds",
+    )
+
+    count: int
+    instance_type: str
+    availability_zones: Tuple[str, ...]
+    lag_alarm_seconds: int
+
+    @classmethod
+    def from_context(cls, reader):
+        path = ("rds", "{environment}", "read_replicas")
+        config = cls(
+            count=reader.get(*path, "count", kind=int, default=0),
+            instance_type=reader.get(*path, "instance_type"),
+            availability_zones=tuple(
+                reader.get(*path, "availability_zones", kind=list) or ()
+            ),
+            lag_alarm_seconds=reader.get(*path, "lag_alarm_seconds", kind=int),
+        )
+
+        """
+        RDS allows at most 15 MySQL read replicas of an instance.
+        """
+
+        prefix = f"rds.{reader.environment}.read_replicas"
+        if config.count is not None and not 0 <= config.count <= 15:
+            reader.errors.append(f"{prefix}.count must be from 0 to 15")
+        _check_instance_type(
+            reader, f"{prefix}.instance_type", config.instance_type
+        )
+
+        return config
+
+    def identifiers(self, account_alias):
+        """
+        A function to name the read replicas, so that the monitoring stack
+        can alarm on them without a lookup.
+
+        :param account_alias: The alias of the account
+        :return: The DB instance identifier of each replica
+        """
+
+        return [
+            f"{account_alias.lower()}-app-rds-replica-{index}"
+            for index in range(1, (self.count or 0) + 1)
+        ]
+
+
+@dataclass(frozen=True)
+class RdsServerlessConfig:
+    """
+    The capacity range of the Serverless v2 instances of an Aurora cluster,
+    in Aurora capacity units (ACUs).
+    """
+
+    __slots__ = ("min_capacity", "max_capacity")
+
+    min_capacity: float
+    max_capacity: float
+
+    @classmethod
+    def from_context(cls, reader):
+        path = ("rds", "{environment}", "serverless")
+        config = cls(
+            min_capacity=reader.get(*path, "min_capacity", kind=(int, float)),
+            max_capacity=reader.get(*path, "max_capacity", kind=(int, float)),
+        )
+
+        """
+        Aurora scales from 0.5 to 128 ACUs, in steps of half an ACU.
+        """
+
+        prefix = f"rds.{reader.environment}.serverless"
+        for key in ("min_capacity", "max_capacity"):
+            value = getattr(config, key)
+            if value is not None and not (
+                0.5 <= value <= 128 and float(value * 2).is_integer()
+            ):
+                reader.errors.append(
+                    f"{prefix}.{key} must be from 0.5 to 128 in steps of 0.5"
+                )
+        if (
+            config.min_capacity is not None
+            and config.max_capacity is not None
+            and config.min_capacity > config.max_capacity
+        ):
+            reader.errors.append(
+                f"{prefix}.min_capacity must not be over max_capacity"
+            )
+
+        return config
+
+
+@dataclass(frozen=True)
+class RdsStorageConfig:
+    """
+    The storage of the MySQL instance and its replicas, and the latency and
+    queue depth its alarms fire above. Aurora manages its own storage, so
+    only the alarms apply to it.
+    """
+
+    __slots__ = (
+        "storage_type",
+        "allocated_gb",
+        "max_allocated_gb",
+        "iops",
+        "throughput",
+        "read_latency_ms",
+        "write_latency_ms",
+        "disk_queue_depth",
+    )
+
+    storage_type: str
+    allocated_gb: int
+    max_allocated_gb: int
+    iops: Optional[int]
+    throughput: Optional[int]
+    read_latency_ms: int
+    write_latency_ms: int
+    disk_queue_depth: int
+
+    @classmethod
+    def from_context(cls, reader):
+        path = ("rds", "{environment}", "storage")
+        alarms = (*path, "alarms")
+        config = cls(
+            storage_type=reader.get(*path, "type"),
+            allocated_gb=reader.get(*path, "allocated_gb", kind=int),
+            max_allocated_gb=reader.get(*path, "max_allocated_gb", kind=int),
+            iops=reader.get(*path, "iops", kind=int, default=None),
+            throughput=reader.get(
+                *path, "throughput_mbps", kind=int, default=None
+            ),
+            read_latency_ms=reader.get(*alarms, "read_latency_ms", kind=int),
+            write_latency_ms=reader.get(*alarms, "write_latency_ms", kind=int),
+            disk_queue_depth=reader.get(*alarms, "disk_queue_depth", kind=int),
+        )
+
+        prefix = f"rds.{reader.environment}.storage"
+        if config.storage_type is not None and config.allocated_gb is not None:
+            for error in validate_storage(
+                "mysql",
+                config.storage_type,
+                config.allocated_gb,
+                config.iops,
+                config.throughput,
+            ):
+                reader.errors.append(f"{prefix}: {error}")
+        if (
+            config.allocated_gb is not None
+            and config.max_allocated_gb is not None
+            and config.max_allocated_gb < config.allocated_gb
+        ):
+            reader.errors.append(
+                f"{prefix}.max_allocated_gb must not be under allocated_gb"
+            )
+
+        return config
+
+    @property
+    def sustained_iops(self):
+        return storage_iops(
+            "mysql", self.storage_type, self.allocated_gb, self.iops
+        )
+
+
+@dataclass(frozen=True)
+class RdsConfig:
+    """
+    The configuration of the database of a single environment.
+    """
+
+    __slots__ = (
+        "engine_mode",
+        "instance_type",
+        "parameters",
+        "proxy",
+        "read_replicas",
+        "serverless",
+        "storage",
+    )
+
+    engine_mode: str
+    instance_type: str
+    parameters: Mapping[str, str]
+    proxy: RdsProxyConfig
+    read_replicas: RdsReplicaConfig
+    serverless: RdsServerlessConfig
+    storage: RdsStorageConfig
+
+    @property
+    def aurora(self):
+        return self.engine_mode == "aurora-serverless-v2"
+
+    @staticmethod
+    def instance_identifier(account_alias):
+        """
+        A function to name the primary instance, or the writer of an Aurora
+        cluster, which the monitoring stack alarms on.
+
+        :param account_alias: The alias of the account
+        :return: The DB instance identifier
+        """
+
+        return f"{account_alias.lower()}-app-rds-instance"
+
+    @classmethod
+    def from_context(cls, reader):
+        path = ("rds", "{environment}")
+        config = cls(
+            engine_mode=reader.get(*path, "engine_mode"),
+            instance_type=reader.get(*path, "instance_type"),
+            parameters=MappingProxyType(
+                reader.get(*path, "parameters", kind=dict) or {}
+            ),
+            proxy=RdsProxyConfig.from_context(reader),
+            read_replicas=RdsReplicaConfig.from_context(reader),
+            serverless=RdsServerlessConfig.from_context(reader),
+            storage=RdsStorageConfig.from_context(reader),
+        )
+
+        """
+        The parameters replace those derived from the instance class, and
+        are passed to RDS as strings. An Aurora cluster sizes the instance
+        parameters to its capacity units, so they cannot be set on it.
+        """
+
+        prefix = f"rds.{reader.environment}"
+        if (
+            config.engine_mode is not None
+            and config.engine_mode not in ENGINE_MODES
+        ):
+            reader.errors.append(
+                f"{prefix}.engine_mode must be one of "
+                f"{', '.join(ENGINE_MODES)}, not {config.engine_mode!r}"
+            )
+        _check_instance_type(
+            reader, f"{prefix}.instance_type", config.instance_type
+        )
+
+        """
+        RDSStack stops the dev instance every evening, which RDS refuses
+        for an instance with read replicas. An Aurora cluster is stopped
+        with its readers.
+        """
+
+        if (
+            reader.environment == "dev"
+            and not config.aurora
+            and config.read_replicas.count
+        ):
+            reader.errors.append(
+                f"{prefix}.read_replicas.count must be 0 in instance mode, as "
+                f"RDS cannot stop the dev instance overnight while it has "
+                f"read replicas"
+            )
+        for key, value in config.parameters.items():
+            if isinstance(value, bool) or not isinstance(
+                value, (str, int, float)
+            ):
+                reader.errors.append(
+                    f"{prefix}.parameters.{key} must be of type str, int or "
+                    f"float, not {type(value).__name__}"
+                )
+            if config.aurora and key in INSTANCE_PARAMETERS:
+                reader.errors.append(
+                    f"{prefix}.parameters.{key} is sized to the capacity of "
+                    f"each instance in {config.engine_mode} mode, and cannot "
+                    f"be set on the cluster"
+                )
+
+        return config
+
+
+@dataclass(frozen=True)
+class TwoTierConfig(EnvironmentConfig):
+    """
+    The configuration of the two tier app for a single environment.
+    """
+
+    __slots__ = (
+        "vpc_id",
+        "domain_name",
+        "config_bucket_name",
+        "logging_bucket_name",
+        "asg_max_capacity",
+        "asg_min_capacity",
+        "binary_temp_path",
+        "binary_path",
+        "rds",
+    )
+
+    STACKS = (
+        "net_stack",
+        "hz_stack",
+        "rds_stack",
+        "storage_stack",
+        "app_stack",
+        "mon_stack",
+        "cd_stack",
+    )
+
+    vpc_id: str
+    domain_name: str
+    config_bucket_name: str
+    logging_bucket_name: str
+    asg_max_capacity: int
+    asg_min_capacity: int
+    binary_temp_path: str
+    binary_path: str
+    rds: RdsConfig
+
+    @classmethod
+    def fields_from_context(cls, reader):
+        return {
+            **super().fields_from_context(reader),
+            "vpc_id": reader.get("vpc", "{environment}", "vpc_id"),
+            "domain_name": reader.get("dns", "{environment}", "domain_name"),
+            "config_bucket_name": reader.get("s3", "config_bucket_name"),
+            "logging_bucket_name": reader.get("s3", "logging_bucket_name"),
+            "asg_max_capacity": reader.get(
+                "asg", "{environment}", "max_capacity", kind=int
+            ),
+            "asg_min_capacity": reader.get(
+                "asg", "{environment}", "min_capacity", kind=int
+            ),
+            "binary_temp_path": reader.get("app_config", "bin_temp_path"),
+            "binary_path": reader.get("app_config", "bin_path"),
+            "rds": RdsConfig.from_context(reader),
+        }
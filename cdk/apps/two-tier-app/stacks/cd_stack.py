@@ -30,15 +30,13 @@ class CodeDeployStack(Stack):
         permissions_boundary = iam.ManagedPolicy.from_managed_policy_name(
             self,
             "Permissions-Boundary",
-            f"{props['account_alias']}-TBC",
+            f"{props.account_alias}-TBC",
         )
 
         iam_role = iam.Role(
             self,
             "Role",
-            role_name=(
-                f"{props['account_alias'].lower()}-app-code-deploy-role"
-            ),
+            role_name=(f"{props.account_alias.lower()}-app-code-deploy-role"),
             description=(
                 "The IAM Role used by CodeDeploy for deployments to the "
                 "App ASG."
@@ -63,8 +61,7 @@ class CodeDeployStack(Stack):
             self,
             "Application",
             application_name=(
-                f"{props['account_alias'].lower()}-app-code-deploy-"
-                f"application"
+                f"{props.account_alias.lower()}-app-code-deploy-application"
             ),
         )
 
@@ -76,7 +73,7 @@ class CodeDeployStack(Stack):
         asg_name = ssm.StringParameter.from_string_parameter_name(
             self,
             "ASG-Full-Name",
-            f"/{props['account_alias']}/App/AppStack/ASG/NAME",
+            f"/{props.account_alias}/App/AppStack/ASG/NAME",
         ).string_value
 
         app_asg = asg.AutoScalingGroup.from_auto_scaling_group_name(
@@ -95,7 +92,7 @@ class CodeDeployStack(Stack):
             self,
             "Deployment-Group",
             deployment_group_name=(
-                f"{props['account_alias'].lower()}-app-code-deploy-"
+                f"{props.account_alias.lower()}-app-code-deploy-"
                 f"deployment-group"
             ),
             application=cd_app,
@@ -4,11 +4,12 @@
 from aws_cdk import (
     aws_route53 as r53,
     aws_certificatemanager as acm,
-    aws_ssm as ssm,
     Stack,
 )
 from constructs import Construct
 
+from shared.parameter_bundle import ParameterBundle
+
 
 class HostedZoneStack(Stack):
     """
@@ -22,7 +23,7 @@ class HostedZoneStack(Stack):
         super().__init__(scope, construct_id, **kwargs)
 
         hosted_zone = r53.HostedZone.from_lookup(
-            self, "Hosted-Zone", domain_name=props["domain_name"]
+            self, "Hosted-Zone", domain_name=props.domain_name
         )
 
         """
@@ -36,49 +37,55 @@ class HostedZoneStack(Stack):
         rsa_cert = acm.CfnCertificate(
             self,
             "RSA-CERT",
-            domain_name=f"app.{props['domain_name']}",
+            domain_name=f"app.{props.domain_name}",
             domain_validation_options=[
                 acm.CfnCertificate.DomainValidationOptionProperty(
-                    domain_name=f"app.{props['domain_name']}",
+                    domain_name=f"app.{props.domain_name}",
                     hosted_zone_id=hosted_zone.hosted_zone_id,
                 )
             ],
             key_algorithm="RSA_2048",
-            subject_alternative_names=[f"*.app.{props['domain_name']}"],
+            subject_alternative_names=[f"*.app.{props.domain_name}"],
             validation_method="DNS",
         )
 
         ecdsa_cert = acm.CfnCertificate(
             self,
             "ECDSA-CERT",
-            domain_name=f"app.{props['domain_name']}",
+            domain_name=f"app.{props.domain_name}",
             domain_validation_options=[
                 acm.CfnCertificate.DomainValidationOptionProperty(
-                    domain_name=f"app.{props['domain_name']}",
+                    domain_name=f"app.{props.domain_name}",
                     hosted_zone_id=hosted_zone.hosted_zone_id,
                 )
             ],
             key_algorithm="EC_prime256v1",
-            subject_alternative_names=[f"*.app.{props['domain_name']}"],
+            subject_alternative_names=[f"*.app.{props.domain_name}"],
             validation_method="DNS",
         )
 
+        # The constructs the application stack is built from.
+        self.outputs = {
+            "hosted_zone": hosted_zone,
+            "ecdsa_cert_arn": ecdsa_cert.ref,
+            "rsa_cert_arn": rsa_cert.ref,
+        }
+
         """
         SSM Parameter store is being used to avoid circular dependencies
-        inherent in CDK Outputs.
+        inherent in CDK Outputs. The values are published as a single
+        JSON-encoded bundle, read by other stacks with one lookup. The values
+        published as a parameter each before are kept as well, until their
+        readers have moved to the bundle.
         """
 
-        ssm_values = {
-            "CERT/ECDSA/ARN": ecdsa_cert.ref,
-            "CERT/RSA/ARN": rsa_cert.ref,
-        }
-
-        for ssm_k, ssm_v in ssm_values.items():
-            ssm.StringParameter(
-                self,
-                f"SSM-Parameter-{ssm_k}",
-                parameter_name=(
-                    f"/{props['account_alias']}/App/HzStack/{ssm_k}"
-                ),
-                string_value=ssm_v,
-            )
+        ParameterBundle(
+            self,
+            "SSM-Bundle",
+            parameter_name=f"/{props.account_alias}/App/HzStack",
+            values={
+                "CERT/ECDSA/ARN": ecdsa_cert.ref,
+                "CERT/RSA/ARN": rsa_cert.ref,
+            },
+            legacy_keys=("CERT/ECDSA/ARN", "CERT/RSA/ARN"),
+        )
@@ -15,6 +15,8 @@ from aws_cdk import (
 )
 from constructs import Construct
 
+from shared.parameter_bundle import ParameterBundle
+
 
 class MonitoringStack(Stack):
     """
@@ -37,8 +39,8 @@ class MonitoringStack(Stack):
         app_sns = sns.Topic(
             self,
             "SNS",
-            topic_name=f"{props['account_alias'].lower()}-app-sns-topic",
-            display_name=(f"{props['account_alias'].lower()}-app-sns-topic"),
+            topic_name=f"{props.account_alias.lower()}-app-sns-topic",
+            display_name=(f"{props.account_alias.lower()}-app-sns-topic"),
         )
 
         topic_policy = sns.TopicPolicy(self, "TopicPolicy", topics=[app_sns])
@@ -64,7 +66,7 @@ class MonitoringStack(Stack):
             self,
             "Subscription",
             topic=app_sns,
-            endpoint=props["slack_email"],
+            endpoint=props.slack_email,
             protocol=sns.SubscriptionProtocol.EMAIL,
         )
 
@@ -78,19 +80,19 @@ class MonitoringStack(Stack):
         alb_full_name = ssm.StringParameter.from_string_parameter_name(
             self,
             f"SSM-ALB-Full-Name",
-            f"/{props['account_alias']}/" f"App/AppStack/ALB/NAME",
+            f"/{props.account_alias}/" f"App/AppStack/ALB/NAME",
         ).string_value
 
         tg_full_name = ssm.StringParameter.from_string_parameter_name(
             self,
             "HTTP-TG-Full-Name",
-            f"/{props['account_alias']}/" f"App/AppStack/TG/HTTP/NAME",
+            f"/{props.account_alias}/" f"App/AppStack/TG/HTTP/NAME",
         ).string_value
 
         http_tg_cw_alarm = cw.Alarm(
             self,
             "TG_HTTP_Host_Unhealthy",
-            alarm_name=(f"{props['account_alias'].lower()}-app-http-tg-alarm"),
+            alarm_name=(f"{props.account_alias.lower()}-app-http-tg-alarm"),
             alarm_description="The HTTP Target Group is in an unhealthy state.",
             metric=cw.Metric(
                 metric_name="HealthyHostCount",
@@ -109,6 +111,114 @@ class MonitoringStack(Stack):
 
         http_tg_cw_alarm.add_alarm_action(cw_actions.SnsAction(app_sns))
 
+        """
+        RDS Read Replica Alerts:
+
+        The following are CloudWatch Alarms on the lag of each read replica
+        behind the primary, named from the configuration as the RDS stack
+        names the replicas. Aurora readers report their lag in milliseconds,
+        as AuroraReplicaLag.
+        """
+
+        replica_config = props.rds.read_replicas
+        lag_metric, lag_unit = (
+            ("AuroraReplicaLag", 1000)
+            if props.rds.aurora
+            else ("ReplicaLag", 1)
+        )
+
+        for index, identifier in enumerate(
+            replica_config.identifiers(props.account_alias), 1
+        ):
+            replica_lag_alarm = cw.Alarm(
+                self,
+                f"RDS_Replica_{index}_Lag",
+                alarm_name=f"{identifier}-lag-alarm",
+                alarm_description=(
+                    f"The read replica {identifier} is over "
+                    f"{replica_config.lag_alarm_seconds}s behind the primary."
+                ),
+                metric=cw.Metric(
+                    metric_name=lag_metric,
+                    namespace="AWS/RDS",
+                    dimensions_map={"DBInstanceIdentifier": identifier},
+                    statistic="Maximum",
+                    period=cdk.Duration.minutes(1),
+                ),
+                comparison_operator=(
+                    cw.ComparisonOperator.GREATER_THAN_THRESHOLD
+                ),
+                threshold=replica_config.lag_alarm_seconds * lag_unit,
+                evaluation_periods=5,
+                treat_missing_data=cw.TreatMissingData.NOT_BREACHING,
+            )
+
+            replica_lag_alarm.add_alarm_action(cw_actions.SnsAction(app_sns))
+
+        """
+        RDS Storage Alerts:
+
+        The following are CloudWatch Alarms on the read and write latency and
+        the disk queue depth of the primary and each read replica, which rise
+        when the storage is undersized for the workload. Latency is reported
+        in seconds.
+        """
+
+        storage_config = props.rds.storage
+        storage_alarms = (
+            (
+                "ReadLatency",
+                storage_config.read_latency_ms / 1000,
+                f"{storage_config.read_latency_ms}ms",
+            ),
+            (
+                "WriteLatency",
+                storage_config.write_latency_ms / 1000,
+                f"{storage_config.write_latency_ms}ms",
+            ),
+            (
+                "DiskQueueDepth",
+                storage_config.disk_queue_depth,
+                f"{storage_config.disk_queue_depth} I/Os",
+            ),
+        )
+        instances = {
+            "Primary": props.rds.instance_identifier(props.account_alias),
+            **{
+                f"Replica_{index}": identifier
+                for index, identifier in enumerate(
+                    replica_config.identifiers(props.account_alias), 1
+                )
+            },
+        }
+
+        for name, identifier in instances.items():
+            for metric_name, threshold, description in storage_alarms:
+                storage_alarm = cw.Alarm(
+                    self,
+                    f"RDS_{name}_{metric_name}",
+                    alarm_name=f"{identifier}-{metric_name.lower()}-alarm",
+                    alarm_description=(
+                        f"The average {metric_name} of {identifier} is over "
+                        f"{description}."
+                    ),
+                    metric=cw.Metric(
+                        metric_name=metric_name,
+                        namespace="AWS/RDS",
+                        dimensions_map={"DBInstanceIdentifier": identifier},
+                        statistic="Average",
+                        period=cdk.Duration.minutes(1),
+                    ),
+                    comparison_operator=(
+                        cw.ComparisonOperator.GREATER_THAN_THRESHOLD
+                    ),
+                    threshold=threshold,
+                    evaluation_periods=5,
+                    datapoints_to_alarm=3,
+                )
+
+                storage_alarm.add_alarm_action(cw_actions.SnsAction(app_sns))
+
         """
         Certificate Alerts:
 
@@ -116,23 +226,22 @@ class MonitoringStack(Stack):
         specific events relating to the ECDSA and RSA certificates.
         """
 
-        rsa_cert_arn = ssm.StringParameter.from_string_parameter_name(
-            self,
-            "RSA-Cert-ARN",
-            f"/{props['account_alias']}/" f"App/HzStack/CERT/RSA/ARN",
-        ).string_value
+        """
+        The certificate ARNs are read from the hosted zone stack's SSM
+        parameter bundle, with a single template parameter.
+        """
 
-        ecdsa_cert_arn = ssm.StringParameter.from_string_parameter_name(
-            self,
-            "ECDSA-Cert-ARN",
-            f"/{props['account_alias']}/App/HzStack/CERT/ECDSA/ARN",
-        ).string_value
+        hz_bundle = ParameterBundle.from_parameter_name(
+            self, f"/{props.account_alias}/App/HzStack"
+        )
+        rsa_cert_arn = hz_bundle.get("CERT/RSA/ARN")
+        ecdsa_cert_arn = hz_bundle.get("CERT/ECDSA/ARN")
 
         events.Rule(
             self,
             "Cert-Renewal-Approaching-Expiration",
             rule_name=(
-                f"{props['account_alias'].lower()}-app-acm-approaching-"
+                f"{props.account_alias.lower()}-app-acm-approaching-"
                 f"expiration"
             ),
             description=(
@@ -150,7 +259,7 @@ class MonitoringStack(Stack):
         events.Rule(
             self,
             "Cert-Renewal-Expired",
-            rule_name=(f"{props['account_alias'].lower()}-app-acm-expired"),
+            rule_name=(f"{props.account_alias.lower()}-app-acm-expired"),
             description=(
                 "This rule listens for ACM events indicating a certificate "
                 "expiration."
@@ -167,7 +276,7 @@ class MonitoringStack(Stack):
             self,
             "Cert-Renewal-Action-Required",
             rule_name=(
-                f"{props['account_alias'].lower()}-app-acm-action-required"
+                f"{props.account_alias.lower()}-app-acm-action-required"
             ),
             description=(
                 "This rule listens for ACM events indicating that a user "
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """ A CDK object for the network stack """
 
-from aws_cdk import aws_ec2 as ec2, aws_ssm as ssm, Stack
+from aws_cdk import aws_ec2 as ec2, Stack
 from constructs import Construct
 
+from shared.parameter_bundle import ParameterBundle
+
 
 class NetworkStack(Stack):
     """
@@ -17,26 +19,37 @@ class NetworkStack(Stack):
         super().__init__(scope, construct_id, **kwargs)
 
         vpc = ec2.Vpc.from_lookup(
-            self, "VPC", vpc_id=props["vpc_id"], is_default=False
+            self, "VPC", vpc_id=props.vpc_id, is_default=False
         )
 
+        # The constructs the RDS and application stacks are built from.
+        self.outputs = {
+            "vpc": vpc,
+            "vpc_cidr_block": vpc.vpc_cidr_block,
+            "private_subnets": vpc.private_subnets,
+            "public_subnets": vpc.public_subnets,
+        }
+
         """
         SSM Parameter store is being used to avoid circular dependencies
-        inherent in CDK Outputs.
+        inherent in CDK Outputs. The values are published as a single
+        JSON-encoded bundle, read by other stacks with one lookup. The values
+        published as a parameter each before are kept as well, until their
+        readers have moved to the bundle.
         """
 
-        ssm_values = {
-            "VPC/CIDR": vpc.vpc_cidr_block,
-            "VPC/PRIVATE/SUBNET": vpc.private_subnets,
-            "VPC/PUBLIC/SUBNET": vpc.public_subnets,
-        }
-
-        for ssm_k, ssm_v in ssm_values.items():
-            ssm.StringParameter(
-                self,
-                f"SSM-Parameter-{ssm_k}",
-                parameter_name=(
-                    f"/{props['account_alias']}/APP/NET/STACK/{ssm_k}"
-                ),
-                string_value=ssm_v,
-            )
+        ParameterBundle(
+            self,
+            "SSM-Bundle",
+            parameter_name=f"/{props.account_alias}/APP/NET/STACK",
+            values={
+                "VPC/CIDR": vpc.vpc_cidr_block,
+                "VPC/PRIVATE/SUBNET": [
+                    subnet.subnet_id for subnet in vpc.private_subnets
+                ],
+                "VPC/PUBLIC/SUBNET": [
+                    subnet.subnet_id for subnet in vpc.public_subnets
+                ],
+            },
+            legacy_keys=("VPC/CIDR",),
+        )
@@ -16,6 +16,9 @@ from aws_cdk import (
 )
 from constructs import Construct
 
+from shared.mysql_parameters import SLOW_LOG, tuned_parameters
+from shared.parameter_bundle import ParameterBundle
+
 
 class RDSStack(Stack):
     """
@@ -36,7 +39,7 @@ class RDSStack(Stack):
         rds_key = kms.Key(
             self,
             "RDS-KMS",
-            alias=f"{props['account_alias'].lower()}-app-rds-key",
+            alias=f"{props.account_alias.lower()}-app-rds-key",
             description=(
                 "A KMS key to be used by the RDS instance for encryption"
             ),
@@ -46,7 +49,7 @@ class RDSStack(Stack):
         rds_mysql_secret = secret.Secret(
             self,
             "Secret",
-            secret_name=f"{props['account_alias'].lower()}-app-rds-secret",
+            secret_name=f"{props.account_alias.lower()}-app-rds-secret",
             description=(
                 "This secret contains all the RDS attributes required to "
                 "connect to the RDS database."
@@ -70,9 +73,7 @@ class RDSStack(Stack):
             description=(
                 "A security group to manage traffic for the RDS instance"
             ),
-            security_group_name=(
-                f"{props['account_alias'].lower()}-app-rds-sg"
-            ),
+            security_group_name=(f"{props.account_alias.lower()}-app-rds-sg"),
         )
 
         """
@@ -81,7 +82,7 @@ class RDSStack(Stack):
         """
 
         cdk.Tags.of(rds_sg).add(
-            "Name", f"{props['account_alias'].lower()}-app-rds-sg"
+            "Name", f"{props.account_alias.lower()}-app-rds-sg"
         )
 
         """
@@ -102,7 +103,7 @@ class RDSStack(Stack):
         permissions_boundary = iam.ManagedPolicy.from_managed_policy_name(
             self,
             "Permissions-Boundary",
-            f"{props['account_alias']}-TBC",
+            f"{props.account_alias}-TBC",
         )
 
         # An IAM Role to be used by RDS for Enhance Monitoring.
@@ -110,7 +111,7 @@ class RDSStack(Stack):
             self,
             "Mon-Role",
             role_name=(
-                f"{props['account_alias'].lower()}-"
+                f"{props.account_alias.lower()}-"
                 f"app-rds-enhanced-monitoring-role"
             ),
             description="The IAM Role used by RDS for enhanced monitoring",
@@ -126,50 +127,224 @@ class RDSStack(Stack):
         )
 
         """
-        * Password is generated and stored in AWS Secrets Manager
-        * performance_insight_retention: Default: 7 this is the free tier
+        The database is either a MySQL instance of a fixed class, with read
+        replicas, or an Aurora MySQL cluster of Serverless v2 instances whose
+        capacity follows the load. Both use the same key, secret, security
+        group and monitoring, and publish the same SSM values.
         """
 
-        rds_mysql = rds.DatabaseInstance(
-            self,
-            "RDS-Instance",
-            engine=rds.DatabaseInstanceEngine.mysql(
+        replica_config = props.rds.read_replicas
+        rds_mysql = None
+        rds_cluster = None
+        rds_replicas = []
+
+        if props.rds.aurora:
+
+            """
+            Aurora sizes the buffer pool and connections to the capacity
+            units in use, so only the slow log and the "parameters" context
+            are set on the cluster.
+            """
+
+            rds_engine = rds.DatabaseClusterEngine.aurora_mysql(
+                version=rds.AuroraMysqlEngineVersion.VER_3_04_0
+            )
+
+            """
+            The readers are named as the replicas are, and scale
+            independently of the writer rather than with it.
+            """
+
+            rds_cluster = rds.DatabaseCluster(
+                self,
+                "RDS-Cluster",
+                engine=rds_engine,
+                parameter_group=rds.ParameterGroup(
+                    self,
+                    "RDS-Cluster-Parameters",
+                    engine=rds_engine,
+                    description="Aurora MySQL parameters",
+                    parameters={
+                        key: str(value)
+                        for key, value in {
+                            **SLOW_LOG,
+                            **props.rds.parameters,
+                        }.items()
+                    },
+                ),
+                default_database_name="db_name",
+                credentials=rds_mysql_credentials,
+                cluster_identifier=(
+                    f"{props.account_alias.lower()}-app-rds-cluster"
+                ),
+                writer=rds.ClusterInstance.serverless_v2(
+                    "Writer",
+                    instance_identifier=props.rds.instance_identifier(
+                        props.account_alias
+                    ),
+                    enable_performance_insights=True,
+                    performance_insight_encryption_key=rds_key,
+                ),
+                readers=[
+                    rds.ClusterInstance.serverless_v2(
+                        f"Reader-{index}",
+                        instance_identifier=identifier,
+                        scale_with_writer=False,
+                        enable_performance_insights=True,
+                        performance_insight_encryption_key=rds_key,
+                    )
+                    for index, identifier in enumerate(
+                        replica_config.identifiers(props.account_alias), 1
+                    )
+                ],
+                serverless_v2_min_capacity=props.rds.serverless.min_capacity,
+                serverless_v2_max_capacity=props.rds.serverless.max_capacity,
+                vpc=net_props["vpc"],
+                vpc_subnets=ec2.SubnetSelection(
+                    subnets=net_props["private_subnets"]
+                ),
+                port=3306,
+                storage_encryption_key=rds_key,
+                security_groups=[rds_sg],
+                backup=rds.BackupProps(retention=cdk.Duration.days(7)),
+                monitoring_interval=Duration.seconds(15),
+                monitoring_role=rds_role,
+                removal_policy=RemovalPolicy.SNAPSHOT,
+            )
+
+        else:
+
+            """
+            The MySQL parameters are derived from the memory and vCPUs of
+            the instance class and the IOPS of the storage, so that resizing
+            either rescales them, with the "parameters" context replacing
+            any of them. Replicas of another instance class get a parameter
+            group of their own.
+            """
+
+            rds_engine = rds.DatabaseInstanceEngine.mysql(
                 version=rds.MysqlEngineVersion.VER_8_0_33
-            ),
-            database_name="db_name",
-            credentials=rds_mysql_credentials,
-            instance_identifier=(
-                f"{props['account_alias'].lower()}-app-rds-instance"
-            ),
-            vpc=net_props["vpc"],
-            vpc_subnets=ec2.SubnetSelection(
-                subnets=net_props["private_subnets"]
-            ),
-            port=3306,
-            instance_type=ec2.InstanceType.of(
-                ec2.InstanceClass.MEMORY4,
-                ec2.InstanceSize.LARGE,
-            ),
-            storage_encryption_key=rds_key,
-            security_groups=[rds_sg],
-            max_allocated_storage=200,
-            backup_retention=cdk.Duration.days(7),
-            enable_performance_insights=True,
-            performance_insight_encryption_key=rds_key,
-            # User for Enhanced Monitoring
-            monitoring_interval=Duration.seconds(15),
-            monitoring_role=rds_role,
-            ca_certificate=rds.CaCertificate.of("rds-ca-rsa2048-g1"),
-            removal_policy=RemovalPolicy.SNAPSHOT,
-        )
+            )
+            storage_config = props.rds.storage
+            parameter_groups = {}
+
+            def parameter_group(instance_type):
+                if instance_type not in parameter_groups:
+                    parameter_groups[instance_type] = rds.ParameterGroup(
+                        self,
+                        f"RDS-Parameters-{instance_type}",
+                        engine=rds_engine,
+                        description=(
+                            f"MySQL parameters tuned for db.{instance_type}"
+                        ),
+                        parameters=tuned_parameters(
+                            instance_type,
+                            props.rds.parameters,
+                            storage_config.sustained_iops,
+                        ),
+                    )
+                return parameter_groups[instance_type]
 
-        if props["environment"] == "dev":
+            """
+            * Password is generated and stored in AWS Secrets Manager
+            * performance_insight_retention: Default: 7 this is the free tier
+            """
+
+            rds_mysql = rds.DatabaseInstance(
+                self,
+                "RDS-Instance",
+                engine=rds_engine,
+                parameter_group=parameter_group(props.rds.instance_type),
+                database_name="db_name",
+                credentials=rds_mysql_credentials,
+                instance_identifier=props.rds.instance_identifier(
+                    props.account_alias
+                ),
+                vpc=net_props["vpc"],
+                vpc_subnets=ec2.SubnetSelection(
+                    subnets=net_props["private_subnets"]
+                ),
+                port=3306,
+                instance_type=ec2.InstanceType(props.rds.instance_type),
+                storage_encryption_key=rds_key,
+                security_groups=[rds_sg],
+                storage_type=rds.StorageType(
+                    storage_config.storage_type.upper()
+                ),
+                allocated_storage=storage_config.allocated_gb,
+                max_allocated_storage=storage_config.max_allocated_gb,
+                iops=storage_config.iops,
+                storage_throughput=storage_config.throughput,
+                backup_retention=cdk.Duration.days(7),
+                enable_performance_insights=True,
+                performance_insight_encryption_key=rds_key,
+                # User for Enhanced Monitoring
+                monitoring_interval=Duration.seconds(15),
+                monitoring_role=rds_role,
+                ca_certificate=rds.CaCertificate.of("rds-ca-rsa2048-g1"),
+                removal_policy=RemovalPolicy.SNAPSHOT,
+            )
+
+            """
+            Read replicas, so that reads scale out across instances rather than
+            the primary scaling up. They share the primary's key, security group
+            and monitoring, and are deleted without a final snapshot, as RDS
+            does not snapshot read replicas.
+            """
+
+            availability_zones = replica_config.availability_zones
+
+            for index, identifier in enumerate(
+                replica_config.identifiers(props.account_alias)
+            ):
+                rds_replicas.append(
+                    rds.DatabaseInstanceReadReplica(
+                        self,
+                        f"RDS-Replica-{index + 1}",
+                        source_database_instance=rds_mysql,
+                        instance_identifier=identifier,
+                        instance_type=ec2.InstanceType(
+                            replica_config.instance_type
+                        ),
+                        parameter_group=parameter_group(
+                            replica_config.instance_type
+                        ),
+                        availability_zone=(
+                            availability_zones[index % len(availability_zones)]
+                            if availability_zones
+                            else None
+                        ),
+                        vpc=net_props["vpc"],
+                        vpc_subnets=ec2.SubnetSelection(
+                            subnets=net_props["private_subnets"]
+                        ),
+                        port=3306,
+                        storage_encryption_key=rds_key,
+                        security_groups=[rds_sg],
+                        storage_type=rds.StorageType(
+                            storage_config.storage_type.upper()
+                        ),
+                        max_allocated_storage=storage_config.max_allocated_gb,
+                        iops=storage_config.iops,
+                        storage_throughput=storage_config.throughput,
+                        enable_performance_insights=True,
+                        performance_insight_encryption_key=rds_key,
+                        monitoring_interval=Duration.seconds(15),
+                        monitoring_role=rds_role,
+                        ca_certificate=rds.CaCertificate.of(
+                            "rds-ca-rsa2048-g1"
+                        ),
+                        removal_policy=RemovalPolicy.DESTROY,
+                    )
+                )
+
+        if props.environment == "dev":
 
             ssm_role = iam.Role(
                 self,
                 "Role",
                 role_name=(
-                    f"{props['account_alias'].lower()}-app-ssm-rds-"
+                    f"{props.account_alias.lower()}-app-ssm-rds-"
                     f"management-role"
                 ),
                 description=(
@@ -188,67 +363,170 @@ class RDSStack(Stack):
                         "rds:Stop*",
                         "rds:Reboot*",
                     ],
-                    resources=["arn:aws:rds:eu-west-2:*:db:*"],
+                    resources=[
+                        "arn:aws:rds:eu-west-2:*:cluster:*"
+                        if rds_cluster
+                        else "arn:aws:rds:eu-west-2:*:db:*"
+                    ],
                 )
             )
 
-            ssm_stop = ssm.CfnAssociation(
-                self,
-                "SSM-STOP-RDS-Association",
-                association_name="App-STOP-RDS-Instance",
-                name="AWS-StopRdsInstance",
-                apply_only_at_cron_interval=True,
-                schedule_expression="cron(30 19 ? * * *)",
-            )
-
             """
-            SSM Properties are add via "add_override" as an escape hatch due to
-            an issue raised here: https://github.com/aws/aws-cdk/issues/4057
+            An Aurora cluster is started and stopped as a whole, rather than
+            by instance, with one runbook taking the action as a parameter.
             """
 
-            ssm_stop.add_override(
-                "Properties.Parameters.InstanceId",
-                [rds_mysql.instance_identifier],
-            )
-            ssm_stop.add_override(
-                "Properties.Parameters.AutomationAssumeRole",
-                [ssm_role.role_arn],
-            )
+            if rds_cluster:
+                resource = "Cluster"
+                cluster_name = [rds_cluster.cluster_identifier]
+                runbooks = {
+                    "STOP": (
+                        "AWS-StartStopAuroraCluster",
+                        {"ClusterName": cluster_name, "Action": ["Stop"]},
+                    ),
+                    "START": (
+                        "AWS-StartStopAuroraCluster",
+                        {"ClusterName": cluster_name, "Action": ["Start"]},
+                    ),
+                }
+            else:
+                resource = "Instance"
+                instance_id = [rds_mysql.instance_identifier]
+                runbooks = {
+                    "STOP": (
+                        "AWS-StopRdsInstance",
+                        {"InstanceId": instance_id},
+                    ),
+                    "START": (
+                        "AWS-StartRdsInstance",
+                        {"InstanceId": instance_id},
+                    ),
+                }
+
+            schedules = {
+                "STOP": "cron(30 19 ? * * *)",
+                "START": "cron(0 6 ? * * *)",
+            }
+
+            for action, (runbook, parameters) in runbooks.items():
+                association = ssm.CfnAssociation(
+                    self,
+                    f"SSM-{action}-RDS-Association",
+                    association_name=f"App-{action}-RDS-{resource}",
+                    name=runbook,
+                    apply_only_at_cron_interval=True,
+                    schedule_expression=schedules[action],
+                )
+
+                """
+                SSM Properties are add via "add_override" as an escape hatch
+                due to an issue raised here:
+                https://github.com/aws/aws-cdk/issues/4057
+                """
+
+                parameters["AutomationAssumeRole"] = [ssm_role.role_arn]
+                for parameter, value in parameters.items():
+                    association.add_override(
+                        f"Properties.Parameters.{parameter}", value
+                    )
+
+        """
+        An optional RDS Proxy, so that the application instances share a
+        bounded pool of database connections rather than opening their own on
+        every scale-out. It authenticates with the database secret and sits in
+        the database security group, whose ingress rule already allows the
+        VPC CIDR.
+        """
 
-            ssm_start = ssm.CfnAssociation(
+        proxy_config = props.rds.proxy
+        rds_proxy = None
+
+        if proxy_config.enabled:
+
+            # Granted read access to the secret by the proxy.
+            proxy_role = iam.Role(
                 self,
-                "SSM-START-RDS-Association",
-                association_name="App-START-RDS-Instance",
-                name="AWS-StartRdsInstance",
-                apply_only_at_cron_interval=True,
-                schedule_expression="cron(0 6 ? * * *)",
+                "Proxy-Role",
+                role_name=f"{props.account_alias.lower()}-app-rds-proxy-role",
+                description="The IAM Role used by RDS Proxy to read the secret",
+                assumed_by=iam.ServicePrincipal("rds.amazonaws.com"),
+                permissions_boundary=permissions_boundary,
             )
 
-            ssm_start.add_override(
-                "Properties.Parameters.InstanceId",
-                [rds_mysql.instance_identifier],
-            )
-            ssm_start.add_override(
-                "Properties.Parameters.AutomationAssumeRole",
-                [ssm_role.role_arn],
+            rds_proxy = rds.DatabaseProxy(
+                self,
+                "RDS-Proxy",
+                proxy_target=(
+                    rds.ProxyTarget.from_cluster(rds_cluster)
+                    if rds_cluster
+                    else rds.ProxyTarget.from_instance(rds_mysql)
+                ),
+                secrets=[rds_mysql_secret],
+                vpc=net_props["vpc"],
+                vpc_subnets=ec2.SubnetSelection(
+                    subnets=net_props["private_subnets"]
+                ),
+                security_groups=[rds_sg],
+                role=proxy_role,
+                db_proxy_name=f"{props.account_alias.lower()}-app-rds-proxy",
+                borrow_timeout=Duration.seconds(proxy_config.borrow_timeout),
+                max_connections_percent=proxy_config.max_connections_percent,
+                max_idle_connections_percent=(
+                    proxy_config.max_idle_connections_percent
+                ),
+                session_pinning_filters=[
+                    rds.SessionPinningFilter.of(pinning_filter)
+                    for pinning_filter in proxy_config.session_pinning_filters
+                ],
+                require_tls=True,
             )
 
+        # The constructs the application stack is built from.
+        self.outputs = {
+            "instance": rds_mysql,
+            "cluster": rds_cluster,
+            "secret": rds_mysql_secret,
+            "security_group": rds_sg,
+            "proxy": rds_proxy,
+            "replicas": rds_replicas,
+        }
+
         """
         SSM Parameter store is being used to avoid circular dependencies
-        inherent in CDK Outputs.
+        inherent in CDK Outputs. The values are published as a single
+        JSON-encoded bundle, read by other stacks with one lookup. The values
+        published as a parameter each before are kept as well, until their
+        readers have moved to the bundle.
         """
 
-        ssm_values = {
-            "ARN": rds_mysql.instance_arn,
+        bundle = {
+            "ARN": (
+                self.format_arn(
+                    service="rds",
+                    resource="cluster",
+                    resource_name=rds_cluster.cluster_identifier,
+                    arn_format=cdk.ArnFormat.COLON_RESOURCE_NAME,
+                )
+                if rds_cluster
+                else rds_mysql.instance_arn
+            ),
             "SECRET": rds_mysql_secret.secret_name,
         }
-
-        for ssm_k, ssm_v in ssm_values.items():
-            ssm.StringParameter(
-                self,
-                f"SSM-Parameter-{ssm_k}",
-                parameter_name=(
-                    f"/{props['account_alias']}/APP/RDS/STACK/{ssm_k}"
-                ),
-                string_value=ssm_v,
-            )
+        if rds_proxy:
+            bundle["PROXY/ENDPOINT"] = rds_proxy.endpoint
+        if rds_replicas:
+            bundle["REPLICA/ENDPOINTS"] = [
+                replica.db_instance_endpoint_address for replica in rds_replicas
+            ]
+        if rds_cluster and replica_config.count:
+            bundle["REPLICA/ENDPOINTS"] = [
+                rds_cluster.cluster_read_endpoint.hostname
+            ]
+
+        ParameterBundle(
+            self,
+            "SSM-Bundle",
+            parameter_name=f"/{props.account_alias}/APP/RDS/STACK",
+            values=bundle,
+            legacy_keys=("ARN", "SECRET"),
+        )
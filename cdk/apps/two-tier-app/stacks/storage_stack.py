@@ -5,12 +5,13 @@ import aws_cdk as cdk
 
 from aws_cdk import (
     aws_s3 as s3,
-    aws_ssm as ssm,
     Stack,
     Duration,
 )
 from constructs import Construct
 
+from shared.parameter_bundle import ParameterBundle
+
 
 class StorageStack(Stack):
     """
@@ -31,9 +32,9 @@ class StorageStack(Stack):
             self,
             "Config-S3-Bucket",
             bucket_name=(
-                f"{props['account_alias'].lower()}-"
-                f"{props['config_bucket_name']}-"
-                f"{props['region']}"
+                f"{props.account_alias.lower()}-"
+                f"{props.config_bucket_name}-"
+                f"{props.region}"
             ),
             encryption=s3.BucketEncryption.S3_MANAGED,
             removal_policy=cdk.RemovalPolicy.DESTROY,
@@ -47,9 +48,9 @@ class StorageStack(Stack):
             self,
             "Logging-S3-Bucket",
             bucket_name=(
-                f"{props['account_alias'].lower()}-"
-                f"{props['logging_bucket_name']}-"
-                f"{props['region']}"
+                f"{props.account_alias.lower()}-"
+                f"{props.logging_bucket_name}-"
+                f"{props.region}"
             ),
             encryption=s3.BucketEncryption.S3_MANAGED,
             lifecycle_rules=[s3.LifecycleRule(expiration=Duration.days(30))],
@@ -58,20 +59,19 @@ class StorageStack(Stack):
 
         """
         SSM Parameter store is being used to avoid circular dependencies
-        inherent in CDK Outputs.
+        inherent in CDK Outputs. The values are published as a single
+        JSON-encoded bundle, read by other stacks with one lookup. The values
+        published as a parameter each before are kept as well, until their
+        readers have moved to the bundle.
         """
 
-        ssm_values = {
-            "S3/CONFIG/ARN": config_bucket.bucket_arn,
-            "S3/LOGGING/ARN": logging_bucket.bucket_arn,
-        }
-
-        for ssm_k, ssm_v in ssm_values.items():
-            ssm.StringParameter(
-                self,
-                f"SSM-Parameter-{ssm_k}",
-                parameter_name=(
-                    f"/{props['account_alias']}/APP/STORAGE/STACK/{ssm_k}"
-                ),
-                string_value=ssm_v,
-            )
+        ParameterBundle(
+            self,
+            "SSM-Bundle",
+            parameter_name=f"/{props.account_alias}/APP/STORAGE/STACK",
+            values={
+                "S3/CONFIG/ARN": config_bucket.bucket_arn,
+                "S3/LOGGING/ARN": logging_bucket.bucket_arn,
+            },
+            legacy_keys=("S3/CONFIG/ARN", "S3/LOGGING/ARN"),
+        )
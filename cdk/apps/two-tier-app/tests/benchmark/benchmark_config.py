@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+"""
+A benchmark of the jsii round trips made to build the app configuration.
+
+The benchmark counts the requests sent to the jsii kernel, and the wall time
+taken, by the typed load_config against the previous props dict, which read
+every key with its own app.node.try_get_context lookup.
+
+Run from the root of the two-tier-app:
+python -m tests.benchmark.benchmark_config --runs 20
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import aws_cdk as cdk
+
+from config import TwoTierConfig, load_config
+from shared.profiler import KernelCalls
+
+CONTEXT_FILE = Path(__file__).parents[2] / "cdk.context.json"
+
+
+def props_from_context(app, environment):
+    """
+    The previous props dict, with a jsii round trip per lookup. Kept here as
+    the benchmark baseline.
+
+    :param app: The cdk.App
+    :param environment: The environment
+    :return: The props dict
+    """
+
+    return {
+        "environment": environment,
+        "dev_account_alias": app.node.try_get_context("account")["dev"][
+            "account_alias"
+        ],
+        "uat_account_alias": app.node.try_get_context("account")["uat"][
+            "account_alias"
+        ],
+        "prod_account_alias": app.node.try_get_context("account")["prod"][
+            "account_alias"
+        ],
+        "dev_account_id": app.node.try_get_context("account")["dev"][
+            "account_id"
+        ],
+        "uat_account_id": app.node.try_get_context("account")["uat"][
+            "account_id"
+        ],
+        "prod_account_id": app.node.try_get_context("account")["prod"][
+            "account_id"
+        ],
+        "account_alias": app.node.try_get_context("account")[environment][
+            "account_alias"
+        ],
+        "account_id": app.node.try_get_context("account")[environment][
+            "account_id"
+        ],
+        "region": app.node.try_get_context("account")[environment]["region"],
+        "net_stack_name": app.node.try_get_context("stack")["net_stack"][
+            "name"
+        ],
+        "net_stack_description": app.node.try_get_context("stack")["net_stack"][
+            "description"
+        ],
+        "hz_stack_name": app.node.try_get_context("stack")["hz_stack"]["name"],
+        "hz_stack_description": app.node.try_get_context("stack")["hz_stack"][
+            "description"
+        ],
+        "rds_stack_name": app.node.try_get_context("stack")["rds_stack"][
+            "name"
+        ],
+        "rds_stack_description": app.node.try_get_context("stack")["rds_stack"][
+            "description"
+        ],
+        "storage_stack_name": app.node.try_get_context("stack")[
+            "storage_stack"
+        ]["name"],
+        "storage_stack_description": app.node.try_get_context("stack")[
+            "storage_stack"
+        ]["description"],
+        "app_stack_name": app.node.try_get_context("stack")["app_stack"][
+            "name"
+        ],
+        "app_stack_description": app.node.try_get_context("stack")["app_stack"][
+            "description"
+        ],
+        "mon_stack_name": app.node.try_get_context("stack")["mon_stack"][
+            "name"
+        ],
+        "mon_stack_description": app.node.try_get_context("stack")["mon_stack"][
+            "description"
+        ],
+        "cd_stack_name": app.node.try_get_context("stack")["cd_stack"]["name"],
+        "cd_stack_description": app.node.try_get_context("stack")["cd_stack"][
+            "description"
+        ],
+        "asset_bucket_name": app.node.try_get_context("s3")[
+            "asset_bucket_name"
+        ],
+        "vpc_id": app.node.try_get_context("vpc")[environment]["vpc_id"],
+        "domain_name": app.node.try_get_context("dns")[environment][
+            "domain_name"
+        ],
+        "config_bucket_name": app.node.try_get_context("s3")[
+            "config_bucket_name"
+        ],
+        "logging_bucket_name": app.node.try_get_context("s3")[
+            "logging_bucket_name"
+        ],
+        "asg_max_capacity": app.node.try_get_context("asg")[environment][
+            "max_capacity"
+        ],
+        "asg_min_capacity": app.node.try_get_context("asg")[environment][
+            "min_capacity"
+        ],
+        "binary_temp_path": app.node.try_get_context("app_config")[
+            "bin_temp_path"
+        ],
+        "binary_path": app.node.try_get_context("app_config")["bin_path"],
+        "slack_email": app.node.try_get_context("slack_config")[environment][
+            "email"
+        ],
+        "tags": app.node.try_get_context("tags"),
+    }
+
+
+def measure(func, app, runs):
+    """
+    A function to measure the kernel calls and wall time of building the
+    configuration.
+
+    :param func: The callable to measure
+    :param app: The cdk.App to read the context from
+    :param runs: The number of runs
+    :return: A tuple of the kernel calls per run and the median milliseconds
+    """
+
+    timings = []
+    with KernelCalls() as calls:
+        for _ in range(runs):
+            started = time.perf_counter()
+            func(app, "dev")
+            timings.append((time.perf_counter() - started) * 1000)
+
+    return calls.count // runs, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(CONTEXT_FILE, encoding="utf8") as fp:
+        app = cdk.App(context=json.load(fp))
+
+    for label, func in (
+        ("props", props_from_context),
+        ("config", lambda app, env: load_config(app, TwoTierConfig, env)),
+    ):
+        calls, elapsed = measure(func, app, args.runs)
+        print(f"{label:>8}: {calls} jsii calls, {elapsed:.2f}ms median")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+A collection of tests for the typed configuration of the two tier app.
+"""
+
+import dataclasses
+import json
+from pathlib import Path
+
+import aws_cdk as cdk
+import pytest
+
+from config import ConfigError, TwoTierConfig, load_config
+
+CONTEXT_FILE = Path(__file__).parents[2] / "cdk.context.json"
+
+
+def context():
+    with open(CONTEXT_FILE) as file:
+        context_file = json.load(file)
+
+    return context_file
+
+
+def test_load_config():
+    """
+    Test that the context is loaded into the typed configuration of the
+    requested environment.
+    """
+
+    config = load_config(cdk.App(context=context()), TwoTierConfig, "dev")
+
+    assert config.environment == "dev"
+    assert config.region == "eu-west-2"
+    assert config.asg_max_capacity == 1
+    assert config.stacks["net_stack"].name == "{INSERT_APP_NAME}-Network-Stack"
+    assert set(config.accounts) == {"dev", "uat", "prod"}
+    assert config.tags["created_by"] == "cdk"
+
+
+def test_config_is_frozen():
+    """
+    Test that the configuration cannot be changed once loaded, and that its
+    dataclasses are slotted.
+    """
+
+    config = load_config(cdk.App(context=context()), TwoTierConfig, "dev")
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        config.vpc_id = "vpc-00000000"
+    with pytest.raises(TypeError):
+        config.tags["created_by"] = "console"
+
+    assert not hasattr(config, "__dict__")
+    assert not hasattr(config.account, "__dict__")
+
+
+def test_load_config_reports_every_error():
+    """
+    Test that every missing or mistyped key is reported in a single error,
+    rather than failing on the first one.
+    """
+
+    invalid = context()
+    del invalid["dns"]["uat"]
+    invalid["asg"]["uat"]["max_capacity"] = "1"
+
+    with pytest.raises(ConfigError) as error:
+        load_config(cdk.App(context=invalid), TwoTierConfig, "uat")
+
+    assert error.value.errors == [
+        "dns.uat.domain_name is missing",
+        "asg.uat.max_capacity must be of type int, not str",
+    ]
+
+
+def test_load_config_rds_proxy():
+    """
+    Test that the proxy is off unless an environment opts in, that its
+    settings are read, and that settings RDS would reject are reported.
+    """
+
+    config = load_config(cdk.App(context=context()), TwoTierConfig, "uat")
+
+    assert config.rds.proxy.enabled is False
+
+    opted_in = context()
+    opted_in["rds"]["uat"]["proxy"]["enabled"] = True
+    config = load_config(cdk.App(context=opted_in), TwoTierConfig, "uat")
+
+    assert config.rds.proxy.enabled is True
+    assert config.rds.proxy.session_pinning_filters == (
+        "EXCLUDE_VARIABLE_SETS",
+    )
+
+    omitted = context()
+    del omitted["rds"]["uat"]["proxy"]["enabled"]
+    config = load_config(cdk.App(context=omitted), TwoTierConfig, "uat")
+
+    assert config.rds.proxy.enabled is False
+
+    invalid = context()
+    invalid["rds"]["uat"]["proxy"].update(
+        max_connections_percent=40,
+        max_idle_connections_percent=50,
+        session_pinning_filters=["EXCLUDE_EVERYTHING"],
+    )
+
+    with pytest.raises(ConfigError) as error:
+        load_config(cdk.App(context=invalid), TwoTierConfig, "uat")
+
+    assert error.value.errors == [
+        "rds.uat.proxy.max_idle_connections_percent must be from 0 to "
+        "max_connections_percent",
+        "rds.uat.proxy.session_pinning_filters must be of "
+        "EXCLUDE_VARIABLE_SETS, not 'EXCLUDE_EVERYTHING'",
+    ]
+
+
+def test_load_config_rds_read_replicas():
+    """
+    Test that there are no replicas unless an environment opts in, that they
+    are named from the account alias, and that a count or instance type RDS
+    would reject is reported.
+    """
+
+    config = load_config(cdk.App(context=context()), TwoTierConfig, "uat")
+
+    assert config.rds.read_replicas.identifiers("Example") == []
+
+    opted_in = context()
+    opted_in["rds"]["uat"]["read_replicas"]["count"] = 1
+    config = load_config(cdk.App(context=opted_in), TwoTierConfig, "uat")
+
+    assert config.rds.read_replicas.instance_type == "r4.large"
+    assert config.rds.read_replicas.identifiers("Example") == [
+        "example-app-rds-replica-1"
+    ]
+
+    invalid = context()
+    invalid["rds"]["uat"]["read_replicas"].update(
+        count=16, instance_type="db.r5.large"
+    )
+
+    with pytest.raises(ConfigError) as error:
+        load_config(cdk.App(context=invalid), TwoTierConfig, "uat")
+
+    assert error.value.errors == [
+        "rds.uat.read_replicas.count must be from 0 to 15",
+        "rds.uat.read_replicas.instance_type must be an instance type such "
+        "as r5.large, not 'db.r5.large'",
+    ]
+
+
+def test_load_config_rds_read_replicas_dev():
+    """
+    Test that replicas of the dev instance, which is stopped overnight, are
+    reported, but that readers of a dev Aurora cluster are not.
+    """
+
+    invalid = context()
+    invalid["rds"]["dev"]["read_replicas"]["count"] = 1
+
+    with pytest.raises(ConfigError) as error:
+        load_config(cdk.App(context=invalid), TwoTierConfig, "dev")
+
+    assert error.value.errors == [
+        "rds.dev.read_replicas.count must be 0 in instance mode, as RDS "
+        "cannot stop the dev instance overnight while it has read replicas",
+    ]
+
+    invalid["rds"]["dev"]["engine_mode"] = "aurora-serverless-v2"
+    config = load_config(cdk.App(context=invalid), TwoTierConfig, "dev")
+
+    assert config.rds.read_replicas.count == 1
+
+
+def test_load_config_rds_parameters():
+    """
+    Test that an instance class with no known memory, and a parameter RDS
+    cannot take as a string, are reported.
+    """
+
+    invalid = context()
+    invalid["rds"]["uat"].update(
+        instance_type="x1.large", parameters={"slow_query_log": True}
+    )
+
+    with pytest.raises(ConfigError) as error:
+        load_config(cdk.App(context=invalid), TwoTierConfig, "uat")
+
+    assert error.value.errors == [
+        "rds.uat.instance_type 'x1.large' is not in "
+        "shared.mysql_parameters.INSTANCE_CLASSES",
+        "rds.uat.parameters.slow_query_log must be of type str, int or "
+        "float, not bool",
+    ]
+
+
+def test_load_config_rds_engine_mode():
+    """
+    Test that an unknown engine mode, a capacity range Aurora would reject,
+    and an instance parameter set on an Aurora cluster, are reported.
+    """
+
+    invalid = context()
+    invalid["rds"]["uat"].update(
+        engine_mode="aurora-serverless-v1",
+        serverless={"min_capacity": 8, "max_capacity": 4.25},
+    )
+
+    with pytest.raises(ConfigError) as error:
+        load_config(cdk.App(context=invalid), TwoTierConfig, "uat")
+
+    assert error.value.errors == [
+        "rds.uat.serverless.max_capacity must be from 0.5 to 128 in steps of "
+        "0.5",
+        "rds.uat.serverless.min_capacity must not be over max_capacity",
+        "rds.uat.engine_mode must be one of instance, aurora-serverless-v2, "
+        "not 'aurora-serverless-v1'",
+    ]
+
+    aurora = context()
+    aurora["rds"]["uat"].update(
+        engine_mode="aurora-serverless-v2",
+        parameters={
+            "innodb_buffer_pool_size": 1073741824,
+            "long_query_time": 2,
+        },
+    )
+
+    with pytest.raises(ConfigError) as error:
+        load_config(cdk.App(context=aurora), TwoTierConfig, "uat")
+
+    assert error.value.errors == [
+        "rds.uat.parameters.innodb_buffer_pool_size is sized to the capacity "
+        "of each instance in aurora-serverless-v2 mode, and cannot be set on "
+        "the cluster",
+    ]
+
+
+def test_load_config_rds_storage():
+    """
+    Test that a storage profile RDS would reject, and a storage autoscaling
+    ceiling under the allocation, are reported.
+    """
+
+    invalid = context()
+    invalid["rds"]["uat"]["storage"].update(
+        allocated_gb=300, max_allocated_gb=200, iops=6000
+    )
+
+    with pytest.raises(ConfigError) as error:
+        load_config(cdk.App(context=invalid), TwoTierConfig, "uat")
+
+    assert error.value.errors == [
+        "rds.uat.storage: gp3 storage under 400 GiB for mysql has a fixed "
+        "baseline, and cannot have iops or throughput set",
+        "rds.uat.storage.max_allocated_gb must not be under allocated_gb",
+    ]
+
+
+def test_load_config_unknown_environment():
+    """
+    Test that an unset or unknown environment is rejected before the context
+    is read.
+    """
+
+    with pytest.raises(ConfigError, match="CDK_ENVIRONMENT must be one of"):
+        load_config(cdk.App(context=context()), TwoTierConfig, "test")
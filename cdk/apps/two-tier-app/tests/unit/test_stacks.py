@@ -0,0 +1,624 @@
+"""
+A collection of tests which synthesise every stack of the two tier app
+offline, from the fixture context with its lookups stubbed.
+
+The templates are compared with the snapshots in tests/unit/snapshots. Set
+UPDATE_SNAPSHOTS=true to update the snapshots, and the synth budget, after
+an intended change.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+from aws_cdk.assertions import Match, Template
+
+from config import load_config  # noqa: F401, puts shared on the path
+from shared.testing import assert_snapshot, assert_synth_budget, synth_fixture
+
+APP_DIR = Path(__file__).parents[2]
+UNIT_DIR = Path(__file__).parent
+SNAPSHOT_DIR = UNIT_DIR / "snapshots"
+
+STACKS = [
+    "example-Network-Stack",
+    "example-HostedZone-Stack",
+    "example-RDS-Stack",
+    "example-Storage-Stack",
+    "example-Application-Stack",
+    "example-Monitoring-Stack",
+    "example-CodeDeploy-Stack",
+]
+
+
+@pytest.fixture(name="synthesised", scope="module")
+def fixture_synthesised(tmp_path_factory):
+    return synth_fixture(
+        APP_DIR,
+        "dev",
+        tmp_path_factory.mktemp("cdk.out"),
+        UNIT_DIR / "context" / "synth_lookups.json",
+    )
+
+
+def opted_in_rds():
+    """
+    The RDS context with uat opted in to the proxy and a read replica, which
+    every environment leaves off by default.
+    """
+
+    with open(APP_DIR / "cdk.context.json", encoding="utf8") as fp:
+        rds = json.load(fp)["rds"]
+    rds["uat"]["proxy"]["enabled"] = True
+    rds["uat"]["read_replicas"]["count"] = 1
+
+    return rds
+
+
+@pytest.fixture(name="synthesised_uat", scope="module")
+def fixture_synthesised_uat(tmp_path_factory):
+    """
+    The uat environment, opted in to the options dev leaves off.
+    """
+
+    return synth_fixture(
+        APP_DIR,
+        "uat",
+        tmp_path_factory.mktemp("cdk.out"),
+        UNIT_DIR / "context" / "synth_lookups.json",
+        {"rds": opted_in_rds()},
+    )
+
+
+@pytest.fixture(name="synthesised_aurora", scope="module")
+def fixture_synthesised_aurora(tmp_path_factory):
+    """
+    The uat environment with the database as an Aurora Serverless v2
+    cluster.
+    """
+
+    rds = opted_in_rds()
+    rds["uat"]["engine_mode"] = "aurora-serverless-v2"
+
+    return synth_fixture(
+        APP_DIR,
+        "uat",
+        tmp_path_factory.mktemp("cdk.out"),
+        UNIT_DIR / "context" / "synth_lookups.json",
+        {"rds": rds},
+    )
+
+
+@pytest.fixture(name="synthesised_aurora_dev", scope="module")
+def fixture_synthesised_aurora_dev(tmp_path_factory):
+    """
+    The dev environment, which is stopped overnight, with the database as an
+    Aurora Serverless v2 cluster.
+    """
+
+    rds = opted_in_rds()
+    rds["dev"]["engine_mode"] = "aurora-serverless-v2"
+
+    return synth_fixture(
+        APP_DIR,
+        "dev",
+        tmp_path_factory.mktemp("cdk.out"),
+        UNIT_DIR / "context" / "synth_lookups.json",
+        {"rds": rds},
+    )
+
+
+def template(synthesised, stack):
+    return Template.from_json(synthesised[1][stack])
+
+
+def ssm_parameter(stack_template, name):
+    (parameter,) = stack_template.find_resources(
+        "AWS::SSM::Parameter", {"Properties": {"Name": name}}
+    ).values()
+
+    return parameter
+
+
+def test_every_stack_is_synthesised(synthesised):
+    """
+    Test that every stack is synthesised, within the synth time budget.
+    """
+
+    result, _ = synthesised
+
+    assert sorted(result["stacks"]) == sorted(STACKS)
+    assert_synth_budget(result["seconds"], SNAPSHOT_DIR / "synth-budget.json")
+
+
+@pytest.mark.parametrize("stack", STACKS)
+def test_snapshot(synthesised, stack):
+    """
+    Test that each template matches its snapshot.
+    """
+
+    assert_snapshot(
+        synthesised[1][stack], SNAPSHOT_DIR / f"{stack}.template.json"
+    )
+
+
+def test_network_stack(synthesised):
+    """
+    Test that the network values are published as one bundle, with the
+    subnets as lists of IDs, and that the CIDR is still published as the
+    parameter of its own it was before, under the same logical ID.
+    """
+
+    network = template(synthesised, "example-Network-Stack")
+    network.resource_count_is("AWS::SSM::Parameter", 2)
+    assert network.find_resources(
+        "AWS::SSM::Parameter",
+        {
+            "Properties": {
+                "Name": "/example/APP/NET/STACK/VPC/CIDR",
+                "Value": "10.0.0.0/16",
+            }
+        },
+    ).keys() == {"SSMParameterVPCCIDRD59EECB8"}
+
+    parameter = ssm_parameter(network, "/example/APP/NET/STACK")
+    assert json.loads(parameter["Properties"]["Value"]) == {
+        "VPC/CIDR": "10.0.0.0/16",
+        "VPC/PRIVATE/SUBNET": [
+            "subnet-0000000000000000a",
+            "subnet-0000000000000000b",
+        ],
+        "VPC/PUBLIC/SUBNET": [
+            "subnet-0000000000000000c",
+            "subnet-0000000000000000d",
+        ],
+    }
+
+
+def test_hosted_zone_stack(synthesised):
+    """
+    Test that an RSA and an ECDSA certificate are validated by DNS.
+    """
+
+    hosted_zone = template(synthesised, "example-HostedZone-Stack")
+    hosted_zone.resource_count_is("AWS::CertificateManager::Certificate", 2)
+
+    for algorithm in ("RSA_2048", "EC_prime256v1"):
+        hosted_zone.has_resource_properties(
+            "AWS::CertificateManager::Certificate",
+            {"KeyAlgorithm": algorithm, "ValidationMethod": "DNS"},
+        )
+
+
+def test_rds_stack(synthesised):
+    """
+    Test that the database is encrypted, backed up and snapshotted on
+    deletion, in the private subnets.
+    """
+
+    rds = template(synthesised, "example-RDS-Stack")
+    rds.has_resource(
+        "AWS::RDS::DBInstance",
+        {
+            "Properties": Match.object_like(
+                {
+                    "Engine": "mysql",
+                    "EngineVersion": "8.0.33",
+                    "StorageEncrypted": True,
+                    "BackupRetentionPeriod": 7,
+                    "EnablePerformanceInsights": True,
+                    "MonitoringInterval": 15,
+                }
+            ),
+            "DeletionPolicy": "Snapshot",
+        },
+    )
+    rds.has_resource_properties(
+        "AWS::RDS::DBSubnetGroup",
+        {
+            "SubnetIds": [
+                "subnet-0000000000000000a",
+                "subnet-0000000000000000b",
+            ]
+        },
+    )
+    rds.has_resource_properties(
+        "AWS::EC2::SecurityGroup",
+        {
+            "SecurityGroupIngress": [
+                Match.object_like({"CidrIp": "10.0.0.0/16", "FromPort": 3306})
+            ]
+        },
+    )
+
+
+def test_rds_parameter_group(synthesised):
+    """
+    Test that the database runs on a parameter group tuned to its instance
+    class.
+    """
+
+    rds = template(synthesised, "example-RDS-Stack")
+    (parameter_group,) = rds.find_resources("AWS::RDS::DBParameterGroup")
+
+    rds.has_resource_properties(
+        "AWS::RDS::DBParameterGroup",
+        {
+            "Family": "mysql8.0",
+            "Parameters": Match.object_like(
+                {
+                    "innodb_buffer_pool_size": "11811160064",
+                    "max_connections": "1301",
+                    "slow_query_log": "1",
+                }
+            ),
+        },
+    )
+    rds.has_resource_properties(
+        "AWS::RDS::DBInstance",
+        {
+            "DBInstanceClass": "db.r4.large",
+            "DBParameterGroupName": {"Ref": parameter_group},
+        },
+    )
+
+
+def test_rds_proxy(synthesised, synthesised_uat):
+    """
+    Test that the proxy pools connections to the instance with the database
+    secret and security group, and that its endpoint is published. dev has
+    no proxy.
+    """
+
+    template(synthesised, "example-RDS-Stack").resource_count_is(
+        "AWS::RDS::DBProxy", 0
+    )
+
+    rds = template(synthesised_uat, "example-RDS-Stack")
+    (secret,) = rds.find_resources("AWS::SecretsManager::Secret")
+    (security_group,) = rds.find_resources("AWS::EC2::SecurityGroup")
+    (instance,) = rds.find_resources(
+        "AWS::RDS::DBInstance",
+        {"Properties": {"DBInstanceIdentifier": "example-app-rds-instance"}},
+    )
+
+    rds.has_resource_properties(
+        "AWS::RDS::DBProxy",
+        {
+            "Auth": [Match.object_like({"SecretArn": {"Ref": secret}})],
+            "EngineFamily": "MYSQL",
+            "RequireTLS": True,
+            "VpcSecurityGroupIds": [
+                {"Fn::GetAtt": [security_group, "GroupId"]}
+            ],
+        },
+    )
+    rds.has_resource_properties(
+        "AWS::RDS::DBProxyTargetGroup",
+        {
+            "ConnectionPoolConfigurationInfo": {
+                "ConnectionBorrowTimeout": 30,
+                "MaxConnectionsPercent": 90,
+                "MaxIdleConnectionsPercent": 50,
+                "SessionPinningFilters": ["EXCLUDE_VARIABLE_SETS"],
+            },
+            "DBInstanceIdentifiers": [{"Ref": instance}],
+        },
+    )
+    rds.has_resource_properties(
+        "AWS::IAM::Role",
+        {
+            "AssumeRolePolicyDocument": Match.object_like(
+                {
+                    "Statement": [
+                        Match.object_like(
+                            {"Principal": {"Service": "rds.amazonaws.com"}}
+                        )
+                    ]
+                }
+            ),
+            "PermissionsBoundary": Match.any_value(),
+        },
+    )
+
+    parameter = ssm_parameter(rds, "/example/APP/RDS/STACK")
+    assert "PROXY/ENDPOINT" in json.dumps(parameter["Properties"]["Value"])
+
+
+def test_rds_read_replicas(synthesised, synthesised_uat):
+    """
+    Test that each read replica copies the primary with the configured
+    instance class, that its endpoint is published and that its lag is
+    alarmed on. dev has no replicas.
+    """
+
+    template(synthesised, "example-RDS-Stack").resource_count_is(
+        "AWS::RDS::DBInstance", 1
+    )
+
+    rds = template(synthesised_uat, "example-RDS-Stack")
+    rds.resource_count_is("AWS::RDS::DBInstance", 2)
+    rds.has_resource(
+        "AWS::RDS::DBInstance",
+        {
+            "Properties": Match.object_like(
+                {
+                    "DBInstanceClass": "db.r4.large",
+                    "DBInstanceIdentifier": "example-app-rds-replica-1",
+                    "DBParameterGroupName": Match.object_like(
+                        {"Ref": Match.string_like_regexp("^RDSParameters")}
+                    ),
+                    "SourceDBInstanceIdentifier": Match.any_value(),
+                    "StorageEncrypted": True,
+                }
+            ),
+            "DeletionPolicy": "Delete",
+        },
+    )
+
+    parameter = ssm_parameter(rds, "/example/APP/RDS/STACK")
+    assert "REPLICA/ENDPOINTS" in json.dumps(parameter["Properties"]["Value"])
+
+    monitoring = template(synthesised_uat, "example-Monitoring-Stack")
+    monitoring.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "AlarmActions": [Match.any_value()],
+            "Dimensions": [
+                {
+                    "Name": "DBInstanceIdentifier",
+                    "Value": "example-app-rds-replica-1",
+                }
+            ],
+            "MetricName": "ReplicaLag",
+            "Threshold": 60,
+            "TreatMissingData": "notBreaching",
+        },
+    )
+
+
+def test_rds_storage(synthesised):
+    """
+    Test that the instance takes the configured gp3 storage, that the I/O
+    capacity follows its baseline IOPS and that its latency and queue depth
+    are alarmed on.
+    """
+
+    rds = template(synthesised, "example-RDS-Stack")
+    rds.has_resource_properties(
+        "AWS::RDS::DBInstance",
+        {
+            "AllocatedStorage": "100",
+            "MaxAllocatedStorage": 200,
+            "StorageType": "gp3",
+            "Iops": Match.absent(),
+            "StorageThroughput": Match.absent(),
+        },
+    )
+    rds.has_resource_properties(
+        "AWS::RDS::DBParameterGroup",
+        {
+            "Parameters": Match.object_like(
+                {"innodb_io_capacity": "1500", "innodb_io_capacity_max": "3000"}
+            )
+        },
+    )
+
+    monitoring = template(synthesised, "example-Monitoring-Stack")
+    for metric_name, threshold in (
+        ("ReadLatency", 0.02),
+        ("WriteLatency", 0.02),
+        ("DiskQueueDepth", 10),
+    ):
+        monitoring.has_resource_properties(
+            "AWS::CloudWatch::Alarm",
+            {
+                "AlarmActions": [Match.any_value()],
+                "Dimensions": [
+                    {
+                        "Name": "DBInstanceIdentifier",
+                        "Value": "example-app-rds-instance",
+                    }
+                ],
+                "MetricName": metric_name,
+                "Statistic": "Average",
+                "Threshold": threshold,
+                "EvaluationPeriods": 5,
+                "DatapointsToAlarm": 3,
+            },
+        )
+
+
+def test_rds_aurora_serverless(synthesised_aurora):
+    """
+    Test that the Aurora cluster scales between the configured capacities,
+    with a reader scaling on its own, behind the proxy, and that the same
+    SSM values are published.
+    """
+
+    rds = template(synthesised_aurora, "example-RDS-Stack")
+    rds.resource_count_is("AWS::RDS::DBInstance", 2)
+    (cluster,) = rds.find_resources("AWS::RDS::DBCluster")
+    (secret,) = rds.find_resources("AWS::SecretsManager::Secret")
+    (key,) = rds.find_resources("AWS::KMS::Key")
+
+    rds.has_resource(
+        "AWS::RDS::DBCluster",
+        {
+            "Properties": Match.object_like(
+                {
+                    "Engine": "aurora-mysql",
+                    "KmsKeyId": {"Fn::GetAtt": [key, "Arn"]},
+                    "ServerlessV2ScalingConfiguration": {
+                        "MinCapacity": 0.5,
+                        "MaxCapacity": 4,
+                    },
+                    "StorageEncrypted": True,
+                }
+            ),
+            "DeletionPolicy": "Snapshot",
+        },
+    )
+    rds.has_resource_properties(
+        "AWS::RDS::DBInstance",
+        {
+            "DBClusterIdentifier": {"Ref": cluster},
+            "DBInstanceClass": "db.serverless",
+            "DBInstanceIdentifier": "example-app-rds-replica-1",
+            "PromotionTier": 2,
+        },
+    )
+    rds.has_resource_properties(
+        "AWS::RDS::DBProxyTargetGroup",
+        {"DBClusterIdentifiers": [{"Ref": cluster}]},
+    )
+    rds.has_resource_properties(
+        "AWS::RDS::DBProxy",
+        {"Auth": [Match.object_like({"SecretArn": {"Ref": secret}})]},
+    )
+
+    parameter = ssm_parameter(rds, "/example/APP/RDS/STACK")
+    value = json.dumps(parameter["Properties"]["Value"])
+    for key in ("ARN", "SECRET", "PROXY/ENDPOINT", "REPLICA/ENDPOINTS"):
+        assert f'\\"{key}\\"' in value
+    assert ":cluster:" in value
+
+    template(
+        synthesised_aurora, "example-Monitoring-Stack"
+    ).has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {"MetricName": "AuroraReplicaLag", "Threshold": 60000},
+    )
+
+
+def test_rds_start_stop_schedule(synthesised, synthesised_aurora_dev):
+    """
+    Test that the dev database is stopped in the evening and started in the
+    morning, by instance, or as a whole cluster in Aurora mode.
+    """
+
+    rds = template(synthesised, "example-RDS-Stack")
+    (instance,) = rds.find_resources("AWS::RDS::DBInstance")
+    for runbook, schedule in (
+        ("AWS-StopRdsInstance", "cron(30 19 ? * * *)"),
+        ("AWS-StartRdsInstance", "cron(0 6 ? * * *)"),
+    ):
+        rds.has_resource_properties(
+            "AWS::SSM::Association",
+            {
+                "Name": runbook,
+                "ScheduleExpression": schedule,
+                "Parameters": Match.object_like(
+                    {"InstanceId": [{"Ref": instance}]}
+                ),
+            },
+        )
+
+    aurora = template(synthesised_aurora_dev, "example-RDS-Stack")
+    (cluster,) = aurora.find_resources("AWS::RDS::DBCluster")
+    aurora.resource_count_is("AWS::SSM::Association", 2)
+    for action, schedule in (
+        ("Stop", "cron(30 19 ? * * *)"),
+        ("Start", "cron(0 6 ? * * *)"),
+    ):
+        aurora.has_resource_properties(
+            "AWS::SSM::Association",
+            {
+                "Name": "AWS-StartStopAuroraCluster",
+                "ScheduleExpression": schedule,
+                "Parameters": Match.object_like(
+                    {"ClusterName": [{"Ref": cluster}], "Action": [action]}
+                ),
+            },
+        )
+    aurora.has_resource_properties(
+        "AWS::IAM::Policy",
+        {
+            "PolicyDocument": {
+                "Statement": [
+                    Match.object_like(
+                        {"Resource": "arn:aws:rds:eu-west-2:*:cluster:*"}
+                    )
+                ],
+                "Version": "2012-10-17",
+            }
+        },
+    )
+
+
+def test_storage_stack(synthesised):
+    """
+    Test that both buckets are encrypted, and that logs expire.
+    """
+
+    storage = template(synthesised, "example-Storage-Stack")
+    storage.resource_count_is("AWS::S3::Bucket", 2)
+    storage.all_resources_properties(
+        "AWS::S3::Bucket",
+        {
+            "BucketEncryption": {
+                "ServerSideEncryptionConfiguration": [
+                    {
+                        "ServerSideEncryptionByDefault": {
+                            "SSEAlgorithm": "AES256"
+                        }
+                    }
+                ]
+            }
+        },
+    )
+    storage.has_resource_properties(
+        "AWS::S3::Bucket",
+        {
+            "LifecycleConfiguration": {
+                "Rules": [{"ExpirationInDays": 30, "Status": "Enabled"}]
+            }
+        },
+    )
+
+
+def test_monitoring_stack(synthesised):
+    """
+    Test that the certificate rules read the hosted zone bundle at deploy
+    time, through one template parameter rather than one per value.
+    """
+
+    stack = synthesised[1]["example-Monitoring-Stack"]
+    monitoring = template(synthesised, "example-Monitoring-Stack")
+    monitoring.resource_count_is("AWS::Events::Rule", 3)
+
+    (bundle,) = [
+        name
+        for name, parameter in stack["Parameters"].items()
+        if parameter.get("Default") == "/example/App/HzStack"
+    ]
+    assert stack["Parameters"][bundle]["Type"] == (
+        "AWS::SSM::Parameter::Value<String>"
+    )
+
+    rules = json.dumps(monitoring.find_resources("AWS::Events::Rule"))
+    assert json.dumps({"Ref": bundle}) in rules
+    for key in ("CERT/RSA/ARN", "CERT/ECDSA/ARN"):
+        assert json.dumps(f'"{key}":"') in rules
+
+
+def test_code_deploy_stack(synthesised):
+    """
+    Test that the deployment group deploys in place to the application ASG.
+    """
+
+    code_deploy = template(synthesised, "example-CodeDeploy-Stack")
+    (asg_name,) = [
+        name
+        for name, parameter in synthesised[1]["example-CodeDeploy-Stack"][
+            "Parameters"
+        ].items()
+        if parameter.get("Default") == "/example/App/AppStack/ASG/NAME"
+    ]
+    code_deploy.has_resource_properties(
+        "AWS::CodeDeploy::DeploymentGroup",
+        {
+            "AutoScalingGroups": [{"Ref": asg_name}],
+            "DeploymentConfigName": "CodeDeployDefault.AllAtOnce",
+        },
+    )
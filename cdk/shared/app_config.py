@@ -0,0 +1,229 @@
+""" A typed configuration loader shared by the CDK apps """
+
+import os
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+ENVIRONMENTS = ("dev", "uat", "prod")
+
+# The default of a context value which is required.
+REQUIRED = object()
+
+
+class ConfigError(ValueError):
+    """
+    Raised once with every problem found in the context, rather than on the
+    first missing key.
+    """
+
+    def __init__(self, environment, errors):
+        self.environment = environment
+        self.errors = errors
+        super().__init__(
+            f"Invalid CDK context for environment {environment!r}:\n"
+            + "\n".join(f"  - {error}" for error in errors)
+        )
+
+
+class ContextReader:
+    """
+    A class to read typed values out of a plain copy of the context tree,
+    recording an error for each missing or mistyped key instead of raising.
+    """
+
+    def __init__(self, context, environment):
+        self.context = context
+        self.environment = environment
+        self.errors = []
+
+    def get(self, *path, kind=str, default=REQUIRED):
+        """
+        A function to read a value from the context tree.
+
+        The string "{environment}" in the path is replaced by the environment
+        being loaded. The context drops null values, so an optional value is
+        left out of the context and given a default here.
+
+        :param path: The keys leading to the value
+        :param kind: The expected type, or a tuple of types
+        :param default: The value of an optional key which is missing
+        :return: The value, or None when it is missing or mistyped
+        """
+
+        keys = [key.format(environment=self.environment) for key in path]
+        value = self.context
+
+        for key in keys:
+            if not isinstance(value, Mapping) or key not in value:
+                if default is not REQUIRED:
+                    return default
+                self.errors.append(f"{'.'.join(keys)} is missing")
+                return None
+            value = value[key]
+
+        if not isinstance(value, kind) or (
+            isinstance(value, bool) and bool not in _as_tuple(kind)
+        ):
+            self.errors.append(
+                f"{'.'.join(keys)} must be of type "
+                f"{' or '.join(k.__name__ for k in _as_tuple(kind))}, "
+                f"not {type(value).__name__}"
+            )
+            return None
+
+        return value
+
+
+def _as_tuple(kind):
+    return kind if isinstance(kind, tuple) else (kind,)
+
+
+@dataclass(frozen=True)
+class Account:
+    """
+    The account an environment is deployed to.
+    """
+
+    __slots__ = ("account_alias", "account_id", "region")
+
+    account_alias: str
+    account_id: str
+    region: str
+
+    @classmethod
+    def from_context(cls, reader, environment):
+        return cls(
+            account_alias=reader.get("account", environment, "account_alias"),
+            account_id=reader.get("account", environment, "account_id"),
+            region=reader.get("account", environment, "region"),
+        )
+
+
+@dataclass(frozen=True)
+class StackConfig:
+    """
+    The construct ID and description of a stack.
+    """
+
+    __slots__ = ("name", "description")
+
+    name: str
+    description: str
+
+
+@dataclass(frozen=True)
+class EnvironmentConfig:
+    """
+    The configuration every app shares, for a single environment.
+
+    Apps subclass this with their own fields, extending fields_from_context and
+    listing their stacks in STACKS.
+    """
+
+    __slots__ = (
+        "environment",
+        "account",
+        "accounts",
+        "stacks",
+        "asset_bucket_name",
+        "slack_email",
+        "tags",
+    )
+
+    STACKS = ()
+
+    environment: str
+    account: Account
+    accounts: Mapping[str, Account]
+    stacks: Mapping[str, StackConfig]
+    asset_bucket_name: str
+    slack_email: str
+    tags: Mapping[str, str]
+
+    @property
+    def account_alias(self):
+        return self.account.account_alias
+
+    @property
+    def account_id(self):
+        return self.account.account_id
+
+    @property
+    def region(self):
+        return self.account.region
+
+    def stack_name(self, stack):
+        """
+        A function to get the CloudFormation stack name of a stack, prefixed
+        with the account alias.
+
+        :param stack: The key of the stack in the "stack" context
+        :return: The stack name
+        """
+
+        return f"{self.account_alias.lower()}-{self.stacks[stack].name}"
+
+    @classmethod
+    def fields_from_context(cls, reader):
+        """
+        A function to read the shared fields, which subclasses extend with
+        their own.
+
+        :param reader: The ContextReader of the environment
+        :return: The keyword arguments of the dataclass
+        """
+
+        accounts = {
+            environment: Account.from_context(reader, environment)
+            for environment in ENVIRONMENTS
+        }
+
+        return {
+            "environment": reader.environment,
+            "account": accounts[reader.environment],
+            "accounts": MappingProxyType(accounts),
+            "stacks": MappingProxyType(
+                {
+                    stack: StackConfig(
+                        name=reader.get("stack", stack, "name"),
+                        description=reader.get("stack", stack, "description"),
+                    )
+                    for stack in cls.STACKS
+                }
+            ),
+            "asset_bucket_name": reader.get("s3", "asset_bucket_name"),
+            "slack_email": reader.get("slack_config", "{environment}", "email"),
+            "tags": MappingProxyType(reader.get("tags", kind=dict) or {}),
+        }
+
+
+def load_config(app, config_class, environment=None):
+    """
+    A function to build and validate the configuration of an app.
+
+    The whole context tree is copied out of the app in one call, rather than
+    one jsii round trip per key, and every key is checked before any stack
+    is created.
+
+    :param app: The cdk.App
+    :param config_class: The EnvironmentConfig subclass of the app
+    :param environment: The environment, defaulting to CDK_ENVIRONMENT
+    :return: An instance of config_class
+    """
+
+    environment = environment or os.getenv("CDK_ENVIRONMENT")
+
+    if environment not in ENVIRONMENTS:
+        raise ConfigError(
+            environment,
+            [f"CDK_ENVIRONMENT must be one of {', '.join(ENVIRONMENTS)}"],
+        )
+
+    reader = ContextReader(app.node.get_all_context(), environment)
+    config = config_class(**config_class.fields_from_context(reader))
+
+    if reader.errors:
+        raise ConfigError(environment, reader.errors)
+
+    return config
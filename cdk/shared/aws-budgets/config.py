@@ -0,0 +1,38 @@
+""" The typed configuration of the budgets app """
+
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+# The shared package lives two directories above the app, under cdk/.
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from shared.app_config import (  # noqa: E402
+    ConfigError,
+    EnvironmentConfig,
+    load_config,
+)
+
+__all__ = ["BudgetConfig", "ConfigError", "load_config"]
+
+
+@dataclass(frozen=True)
+class BudgetConfig(EnvironmentConfig):
+    """
+    The configuration of the budgets app for a single environment.
+    """
+
+    __slots__ = ("budget_threshold",)
+
+    STACKS = ("budget_stack",)
+
+    budget_threshold: int
+
+    @classmethod
+    def fields_from_context(cls, reader):
+        return {
+            **super().fields_from_context(reader),
+            "budget_threshold": reader.get(
+                "budget_threshold", "{environment}", "threshold", kind=int
+            ),
+        }
@@ -27,8 +27,8 @@ class BudgetStack(Stack):
         app_sns = sns.Topic(
             self,
             "SNS",
-            topic_name=f"{props['account_alias'].lower()}-budget-sns-topic",
-            display_name=(f"{props['account_alias'].lower()}-budget-sns-topic"),
+            topic_name=f"{props.account_alias.lower()}-budget-sns-topic",
+            display_name=(f"{props.account_alias.lower()}-budget-sns-topic"),
         )
 
         topic_policy = sns.TopicPolicy(self, "TopicPolicy", topics=[app_sns])
@@ -54,7 +54,7 @@ class BudgetStack(Stack):
             self,
             "Subscription",
             topic=app_sns,
-            endpoint=props["slack_email"],
+            endpoint=props.slack_email,
             protocol=sns.SubscriptionProtocol.EMAIL,
         )
 
@@ -74,12 +74,12 @@ class BudgetStack(Stack):
             "Budget",
             budget=budgets.CfnBudget.BudgetDataProperty(
                 budget_name=(
-                    f"{props['account_alias']}-monthly-budget-notification"
+                    f"{props.account_alias}-monthly-budget-notification"
                 ),
                 budget_type="COST",
                 time_unit="MONTHLY",
                 budget_limit=budgets.CfnBudget.SpendProperty(
-                    amount=props["budget_threshold"], unit="USD"
+                    amount=props.budget_threshold, unit="USD"
                 ),
             ),
             notifications_with_subscribers=[
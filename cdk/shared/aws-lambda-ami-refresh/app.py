@@ -31,6 +31,11 @@ props = {
         "lambda_stack"
     ]["description"],
     "asset_bucket_name": app.node.try_get_context("s3")["asset_bucket_name"],
+    "ami_manifest": app.node.try_get_context("ami_manifest"),
+    "lambda_config": app.node.try_get_context("lambda_config"),
+    "trigger": app.node.try_get_context("trigger"),
+    "metrics": app.node.try_get_context("metrics"),
+    "instance_refresh": app.node.try_get_context("instance_refresh"),
     "tags": app.node.try_get_context("tags"),
 }
 
@@ -2,6 +2,7 @@
 
 """ A CDK object for the Lambda AMI stack """
 
+import json
 from pathlib import Path
 
 from aws_cdk import (
@@ -11,9 +12,20 @@ from aws_cdk import (
     aws_events as events,
     aws_events_targets as targets,
     aws_iam as iam,
+    aws_sns as sns,
+    aws_sns_subscriptions as subs,
+    aws_cloudwatch as cw,
+    aws_cloudwatch_actions as cw_actions,
 )
 from constructs import Construct
 
+SRC_PATH = Path(__file__).parent / "src"
+
+ARCHITECTURES = {
+    "arm64": _lambda.Architecture.ARM_64,
+    "x86_64": _lambda.Architecture.X86_64,
+}
+
 
 class AmiLambdaStack(Stack):
     """
@@ -52,7 +64,7 @@ class AmiLambdaStack(Stack):
             permissions_boundary=permissions_boundary,
         )
 
-        iam.ManagedPolicy(
+        policy = iam.ManagedPolicy(
             self,
             "Policy",
             managed_policy_name=(
@@ -88,9 +100,11 @@ class AmiLambdaStack(Stack):
                         "ssm:AddTagsToResource",
                     ],
                     resources=[
-                        f"arn:aws:ssm:eu-west-2:{props['account_id']}:"
+                        f"arn:aws:ssm:{entry['region']}:{props['account_id']}:"
                         f"parameter/{props['account_alias']}/"
-                        f"IMAGE/RHEL8/LATEST/AMI_ID",
+                        f"{entry['parameter']}{suffix}"
+                        for entry in props["ami_manifest"]
+                        for suffix in ["", "_WATERMARK"]
                     ],
                 ),
                 iam.PolicyStatement(
@@ -113,34 +127,106 @@ class AmiLambdaStack(Stack):
             roles=[lambda_role],
         )
 
-        with open(
-            Path.cwd() / "stacks/src/lambda_handler.py", encoding="utf8"
-        ) as fp:
-            handler_code = fp.read()
+        """
+        The instance refresh stage may only start refreshes of the Auto
+        Scaling Groups listed in the manifest.
+        """
+
+        asg_arns = [
+            f"arn:aws:autoscaling:{entry['region']}:{props['account_id']}:"
+            f"autoScalingGroup:*:autoScalingGroupName/{group}"
+            for entry in props["ami_manifest"]
+            for group in entry.get("auto_scaling_groups", [])
+        ]
+
+        if props["instance_refresh"]["enabled"] and asg_arns:
+            policy.add_statements(
+                iam.PolicyStatement(
+                    sid="AsgDescribe",
+                    actions=["autoscaling:DescribeInstanceRefreshes"],
+                    resources=["*"],
+                ),
+                iam.PolicyStatement(
+                    sid="AsgInstanceRefresh",
+                    actions=["autoscaling:StartInstanceRefresh"],
+                    resources=asg_arns,
+                ),
+            )
+
+        """
+        The "asset" packaging mode ships the handler module as a zip asset,
+        while "inline" embeds its source in the template. Both resolve the
+        source relative to this file, so synth works from any directory.
+        Only the handler module is packaged, boto3 is provided by the runtime.
+        """
+
+        lambda_config = props["lambda_config"]
+        instance_refresh = props["instance_refresh"]
+
+        if lambda_config["packaging"] == "inline":
+            with open(SRC_PATH / "lambda_handler.py", encoding="utf8") as fp:
+                code = _lambda.InlineCode(fp.read())
+            handler = "index.lambda_handler"
+        else:
+            code = _lambda.Code.from_asset(
+                str(SRC_PATH), exclude=["__init__.py", "__pycache__", "*.pyc"]
+            )
+            handler = "lambda_handler.lambda_handler"
 
         lambda_function = _lambda.Function(
             self,
             "AMI-Lambda-Function",
             function_name=lambda_function_name,
             description=(
-                "A lambda function to query for the latest RHEL8 AMI and "
-                "update the SSM parameter."
+                "A lambda function to query for the latest AMIs and update "
+                "the SSM parameters."
             ),
             role=lambda_role,
-            code=_lambda.InlineCode(handler_code),
-            handler="index.lambda_handler",
-            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=code,
+            handler=handler,
+            runtime=_lambda.Runtime(
+                lambda_config["runtime"],
+                _lambda.RuntimeFamily.PYTHON,
+                supports_inline_code=True,
+            ),
+            architecture=ARCHITECTURES[lambda_config["architecture"]],
             timeout=Duration.seconds(180),
             environment={
                 "ACCOUNT_ALIAS": f"{props['account_alias']}",
-                "AMI_NAME": "TBC",
+                "MANIFEST": json.dumps(props["ami_manifest"]),
+                "MAX_WORKERS": f"{lambda_config['max_workers']}",
+                "RETRY_MODE": f"{lambda_config['retry_mode']}",
+                "MAX_ATTEMPTS": f"{lambda_config['max_attempts']}",
+                "CONNECT_TIMEOUT": f"{lambda_config['connect_timeout']}",
+                "READ_TIMEOUT": f"{lambda_config['read_timeout']}",
+                "INCREMENTAL": (
+                    "true" if lambda_config["incremental"] else "false"
+                ),
                 "REGION": f"{props['region']}",
+                "METRICS_NAMESPACE": f"{props['metrics']['namespace']}",
+                "INSTANCE_REFRESH": (
+                    "true" if instance_refresh["enabled"] else "false"
+                ),
+                "MIN_HEALTHY_PERCENTAGE": (
+                    f"{instance_refresh['min_healthy_percentage']}"
+                ),
+                "INSTANCE_WARMUP": f"{instance_refresh['instance_warmup']}",
+                "CHECKPOINT_PERCENTAGES": json.dumps(
+                    instance_refresh["checkpoint_percentages"]
+                ),
+                "CHECKPOINT_DELAY": f"{instance_refresh['checkpoint_delay']}",
+                "POLL_INTERVAL": f"{instance_refresh['poll_interval']}",
+                "POLL_BUDGET": f"{instance_refresh['poll_budget']}",
+                "POLL_MARGIN": f"{instance_refresh['poll_margin']}",
             },
         )
 
         """
         Run every day at 11PM UTC
         Cron "0 23 * * ? *"
+
+        When image events are enabled this acts as a reconciliation fallback
+        for any image event that was missed.
         """
 
         rule = events.Rule(
@@ -151,3 +237,102 @@ class AmiLambdaStack(Stack):
             ),
         )
         rule.add_target(targets.LambdaFunction(lambda_function))
+
+        """
+        Image Events:
+
+        Optionally refresh as soon as a new image becomes available, rather
+        than waiting for the daily run. The handler reads the AMI ID from the
+        event and skips the describe_images scan.
+        """
+
+        if props["trigger"]["image_events"]:
+            events.Rule(
+                self,
+                "Image-Available-Rule",
+                description=(
+                    "This rule listens for EC2 events indicating that a new "
+                    "AMI is available."
+                ),
+                targets=[targets.LambdaFunction(lambda_function)],
+                event_pattern=events.EventPattern(
+                    source=["aws.ec2"],
+                    detail_type=["EC2 AMI State Change"],
+                    detail={"State": ["available"]},
+                ),
+            )
+
+        if props["trigger"]["image_topic_arn"]:
+            sns.Topic.from_topic_arn(
+                self, "Image-Topic", props["trigger"]["image_topic_arn"]
+            ).add_subscription(subs.LambdaSubscription(lambda_function))
+
+        """
+        Duration Alarms:
+
+        The following are CloudWatch Alarms on the function duration and on
+        the per-phase latencies and retry counts the handler publishes in
+        Embedded Metric Format, so API slowdowns and throttling are caught
+        before the function reaches its timeout.
+        """
+
+        alarm_metrics = {
+            "Duration": (
+                lambda_function.metric_duration(
+                    statistic="Maximum", period=Duration.hours(1)
+                ),
+                props["metrics"]["duration_alarm_ms"],
+            ),
+            "Retry-Attempts": (
+                cw.Metric(
+                    metric_name="RetryAttempts",
+                    namespace=props["metrics"]["namespace"],
+                    dimensions_map={"FunctionName": lambda_function_name},
+                    statistic="Sum",
+                    period=Duration.hours(1),
+                ),
+                props["metrics"]["retry_alarm_count"],
+            ),
+        }
+
+        for phase in ["DescribeImages", "GetParameters", "PutParameter"]:
+            alarm_metrics[f"{phase}-Latency"] = (
+                cw.Metric(
+                    metric_name=f"{phase}Latency",
+                    namespace=props["metrics"]["namespace"],
+                    dimensions_map={"FunctionName": lambda_function_name},
+                    statistic="Maximum",
+                    period=Duration.hours(1),
+                ),
+                props["metrics"]["phase_alarm_ms"],
+            )
+
+        alarm_topic = None
+        if props["metrics"]["alarm_topic_arn"]:
+            alarm_topic = sns.Topic.from_topic_arn(
+                self, "Alarm-Topic", props["metrics"]["alarm_topic_arn"]
+            )
+
+        for alarm_id, (metric, threshold) in alarm_metrics.items():
+            alarm = cw.Alarm(
+                self,
+                f"{alarm_id}-Alarm",
+                alarm_name=(
+                    f"{props['account_alias'].lower()}-ami-refresh-"
+                    f"{alarm_id.lower()}-alarm"
+                ),
+                alarm_description=(
+                    f"The AMI refresh Lambda {alarm_id} has exceeded "
+                    f"{threshold}."
+                ),
+                metric=metric,
+                comparison_operator=(
+                    cw.ComparisonOperator.GREATER_THAN_THRESHOLD
+                ),
+                threshold=threshold,
+                evaluation_periods=1,
+                treat_missing_data=cw.TreatMissingData.NOT_BREACHING,
+            )
+
+            if alarm_topic:
+                alarm.add_alarm_action(cw_actions.SnsAction(alarm_topic))
@@ -5,9 +5,19 @@ A Lambda function to query the latest AMI and update an SSM Parameter for
 consumption by the Launch Templates of the services.
 """
 
+import time
+
+# Captured first, so the init duration includes the imports below.
+INIT_STARTED = time.perf_counter()
+
+import json
 import os
-import boto3
-from botocore.exceptions import ClientError
+import threading
+from datetime import datetime, timedelta, timezone
+from fnmatch import fnmatchcase
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import BotoCoreError, ClientError
 
 # Setting up logging
 import logging
@@ -17,90 +27,1051 @@ logger.setLevel(logging.INFO)
 
 # Lambda function environment variables
 ACCOUNT_ALIAS = os.environ["ACCOUNT_ALIAS"]
-AMI_NAME = os.environ["AMI_NAME"]
+AMI_NAME = os.environ.get("AMI_NAME")
 REGION = os.environ["REGION"]
 
+# A JSON list of {"ami_name", "region", "parameter"} entries to refresh.
+MANIFEST = os.environ.get("MANIFEST")
+
+# The upper bound of manifest entries refreshed concurrently.
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", "8"))
+
+# The describe_images page size, between 5 and 1000 results per call.
+PAGE_SIZE = int(os.environ.get("PAGE_SIZE", "1000"))
+
+# The maximum number of names accepted by a single get_parameters call.
+GET_PARAMETERS_BATCH = 10
+
+# The parameter written when no manifest is supplied.
+DEFAULT_PARAMETER = "IMAGE/RHEL8/LATEST/AMI_ID"
+
+"""
+Incremental discovery keeps the creation date of the latest image in a
+companion parameter, and later runs only ask describe_images for images
+created since then. EC2 filters accept at most 200 values, which bounds how
+far back the creation-date filter can reach.
+"""
+
+INCREMENTAL = os.environ.get("INCREMENTAL", "true") == "true"
+WATERMARK_SUFFIX = "_WATERMARK"
+MAX_FILTER_VALUES = 200
+
+"""
+The optional instance refresh stage, which rolls a changed AMI out to the
+Auto Scaling Groups listed against a manifest entry. Checkpoints pause the
+roll so that capacity can be verified part way through.
+"""
+
+INSTANCE_REFRESH = os.environ.get("INSTANCE_REFRESH", "false") == "true"
+MIN_HEALTHY_PERCENTAGE = int(os.environ.get("MIN_HEALTHY_PERCENTAGE", "90"))
+INSTANCE_WARMUP = int(os.environ.get("INSTANCE_WARMUP", "300"))
+CHECKPOINT_PERCENTAGES = json.loads(
+    os.environ.get("CHECKPOINT_PERCENTAGES", "[]")
+)
+CHECKPOINT_DELAY = int(os.environ.get("CHECKPOINT_DELAY", "3600"))
+
+"""
+Seconds between progress polls, the seconds an invocation may spend polling,
+and the time left unused for the return. A refresh takes far longer than an
+invocation, so polling is bounded by its own budget, kept under the duration
+alarm, rather than by the function timeout. A refresh still in progress is
+reported as such and carries on after the function returns.
+"""
+
+POLL_INTERVAL = int(os.environ.get("POLL_INTERVAL", "15"))
+POLL_BUDGET = int(os.environ.get("POLL_BUDGET", "45"))
+POLL_MARGIN = int(os.environ.get("POLL_MARGIN", "10"))
 
-def query_latest_ami():
+INSTANCE_REFRESH_DONE = {
+    "Successful",
+    "Failed",
+    "Cancelled",
+    "RollbackSuccessful",
+    "RollbackFailed",
+}
+
+# The CloudWatch namespace of the embedded metrics.
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "AmiRefresh")
+FUNCTION_NAME = os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "local")
+
+"""
+The botocore configuration shared by every client. Adaptive retries back off
+client side when the EC2 and SSM APIs throttle, and the connection pool is
+sized so that every worker can hold a connection.
+"""
+
+RETRY_MODE = os.environ.get("RETRY_MODE", "adaptive")
+MAX_ATTEMPTS = int(os.environ.get("MAX_ATTEMPTS", "10"))
+CONNECT_TIMEOUT = int(os.environ.get("CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = int(os.environ.get("READ_TIMEOUT", "30"))
+MAX_POOL_CONNECTIONS = int(
+    os.environ.get("MAX_POOL_CONNECTIONS", max(MAX_WORKERS, 10))
+)
+
+"""
+Clients are created lazily and kept for the lifetime of the execution
+environment, so warm invocations skip credential resolution, endpoint
+resolution and the TLS handshake. The default boto3 session is not thread
+safe, so client creation is serialised. The clients themselves are safe to
+share between threads.
+"""
+
+CLIENTS = {}
+CLIENT_LOCK = threading.Lock()
+
+
+def create_client(service, region):
     """
-    A function to query for the latest AMI ID of a given AMI name prefix.
+    A function to get the cached boto3 client for a service and region,
+    creating it on first use.
 
-    :return: The AMI ID
+    boto3 and botocore.config are imported here rather than at module level,
+    as they account for most of the module's import time and are not needed
+    until the first client is created.
+
+    :param service: The AWS service name
+    :param region: The AWS region
+    :return: A boto3 client
+    """
+
+    with CLIENT_LOCK:
+        if (service, region) not in CLIENTS:
+            import boto3
+            from botocore.config import Config
+
+            CLIENTS[(service, region)] = boto3.client(
+                service,
+                region_name=region,
+                config=Config(
+                    retries={"mode": RETRY_MODE, "max_attempts": MAX_ATTEMPTS},
+                    connect_timeout=CONNECT_TIMEOUT,
+                    read_timeout=READ_TIMEOUT,
+                    max_pool_connections=MAX_POOL_CONNECTIONS,
+                ),
+            )
+        return CLIENTS[(service, region)]
+
+
+def reset_clients():
+    """
+    A function to drop every cached client, e.g. between tests.
+
+    :return: null
+    """
+
+    with CLIENT_LOCK:
+        CLIENTS.clear()
+
+
+"""
+Metrics are collected from every worker during an invocation and flushed
+once at the end as a single CloudWatch Embedded Metric Format document.
+"""
+
+METRICS = {}
+METRICS_LOCK = threading.Lock()
+
+
+def put_metric(name, value, unit="Count"):
+    """
+    A function to record a metric value for the current invocation.
+
+    :param name: The metric name
+    :param value: The metric value
+    :param unit: The CloudWatch unit of the metric
+    :return: null
+    """
+
+    with METRICS_LOCK:
+        METRICS.setdefault(name, (unit, []))[1].append(value)
+
+
+def put_latency(name, started):
+    """
+    A function to record the milliseconds elapsed since a perf_counter value.
+
+    :param name: The metric name
+    :param started: The perf_counter value at the start of the phase
+    :return: null
+    """
+
+    put_metric(
+        name, round((time.perf_counter() - started) * 1000, 1), "Milliseconds"
+    )
+
+
+def retry_attempts(response):
+    """
+    A function to read the number of retries botocore made for a call.
+
+    :param response: A boto3 response or ClientError response
+    :return: The number of retries
+    """
+
+    return response.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+
+
+def flush_metrics():
+    """
+    A function to print the metrics recorded during the invocation as an
+    Embedded Metric Format document, which CloudWatch Logs extracts into
+    metrics without any API calls from the function.
+
+    :return: The document, or None if no metrics were recorded
+    """
+
+    with METRICS_LOCK:
+        metrics = dict(METRICS)
+        METRICS.clear()
+
+    if not metrics:
+        return None
+
+    document = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [["FunctionName"]],
+                    "Metrics": [
+                        {"Name": name, "Unit": unit}
+                        for name, (unit, _) in metrics.items()
+                    ],
+                }
+            ],
+        },
+        "FunctionName": FUNCTION_NAME,
+    }
+
+    for name, (_, values) in metrics.items():
+        document[name] = values
+
+    print(json.dumps(document), flush=True)
+
+    return document
+
+
+def load_manifest(event=None):
+    """
+    A function to build the list of images to refresh. An invoking event may
+    supply its own manifest, otherwise the MANIFEST environment variable is
+    used, falling back to the single AMI_NAME/REGION pair.
+
+    :param event: The Lambda event
+    :return: A list of manifest entries
+    """
+
+    if event and event.get("manifest"):
+        return event["manifest"]
+
+    if MANIFEST:
+        return json.loads(MANIFEST)
+
+    return [
+        {
+            "ami_name": AMI_NAME,
+            "region": REGION,
+            "parameter": DEFAULT_PARAMETER,
+        }
+    ]
+
+
+def image_sort_key(image):
+    """
+    A function to build the key used to rank images, where the most recently
+    created image wins and the name is used as a tie-breaker.
+
+    :param image: An image as returned by describe_images
+    :return: A tuple of the creation date and name
+    """
+
+    return image.get("CreationDate", ""), image.get("Name", "")
+
+
+def creation_date_patterns(since, today=None):
     """
+    A function to build the describe_images creation-date filter values that
+    cover every day from a watermark up to today, falling back to whole
+    months when there would be too many days.
 
-    ec2 = boto3.client("ec2", region_name=REGION)
+    :param since: The watermark, an ISO 8601 creation date
+    :param today: The current UTC date
+    :return: A list of wildcard patterns, or None if the watermark cannot be
+        used
+    """
+
+    today = today or datetime.now(timezone.utc).date()
 
     try:
-        response = ec2.describe_images(
-            Filters=[
-                {"Name": "name", "Values": [AMI_NAME]},
-                {"Name": "state", "Values": ["available"]},
-                {"Name": "image-type", "Values": ["machine"]},
-            ]
-        )
+        since_date = datetime.strptime(since[:10], "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+    if since_date > today:
+        return None
+
+    days = (today - since_date).days + 1
 
-        images = response["Images"]
+    if days <= MAX_FILTER_VALUES:
+        return [
+            f"{since_date + timedelta(days=day):%Y-%m-%d}*"
+            for day in range(days)
+        ]
 
-        sorted_images = sorted(images, key=lambda k: k["Name"])
+    months = []
+    month = since_date.replace(day=1)
+    while month <= today:
+        months.append(f"{month:%Y-%m}-*")
+        month = (month + timedelta(days=32)).replace(day=1)
 
-        # The latest AMI will be the last object in the list as it has a
-        # timestamp associated with it.
-        latest_image = sorted_images[-1]
+    return months if len(months) <= MAX_FILTER_VALUES else None
 
-        ami_id = latest_image["ImageId"]
 
-        logger.info(f">> The latest AMI ID is: {ami_id}.")
+def query_latest_image(ami_name=AMI_NAME, region=REGION, since=None):
+    """
+    A function to query for the latest image of a given AMI name prefix.
+
+    The images are streamed page by page and only the running maximum is
+    kept, so memory stays constant regardless of the size of the catalogue.
+    Given a watermark, only images created on or after it are requested.
+
+    :param ami_name: The AMI name filter
+    :param region: The region to query
+    :param since: An optional creation date watermark
+    :return: The image, or None if no image matched
+    """
+
+    filters = [
+        {"Name": "name", "Values": [ami_name]},
+        {"Name": "state", "Values": ["available"]},
+        {"Name": "image-type", "Values": ["machine"]},
+    ]
+
+    if since:
+        patterns = creation_date_patterns(since)
+        if patterns is None:
+            logger.warning(f">> Ignoring unusable watermark: {since}")
+            return None
+        filters.append({"Name": "creation-date", "Values": patterns})
+
+    ec2 = create_client("ec2", region)
+    paginator = ec2.get_paginator("describe_images")
+
+    latest_image = None
+    scanned = 0
+    retries = 0
+    started = time.perf_counter()
+
+    try:
+        pages = paginator.paginate(
+            Filters=filters,
+            PaginationConfig={"PageSize": PAGE_SIZE},
+        )
+
+        for page in pages:
+            retries += retry_attempts(page)
+            for image in page["Images"]:
+                scanned += 1
+                if since and image.get("CreationDate", "") < since:
+                    continue
+                if latest_image is None or image_sort_key(
+                    image
+                ) > image_sort_key(latest_image):
+                    latest_image = image
     except ClientError as err:
         logger.error(f">> Error describing images: {err}")
+        retries += retry_attempts(err.response)
         raise
+    finally:
+        put_latency("DescribeImagesLatency", started)
+        put_metric("ImagesScanned", scanned)
+        put_metric("RetryAttempts", retries)
+        put_metric("IncrementalScans" if since else "FullScans", 1)
+
+    if latest_image:
+        logger.info(
+            f">> The latest AMI ID in {region} is: {latest_image['ImageId']} "
+            f"({scanned} images scanned)."
+        )
+
+    return latest_image
 
-    return ami_id
 
+def query_latest_ami(ami_name=AMI_NAME, region=REGION):
+    """
+    A function to query for the latest AMI ID of a given AMI name prefix.
 
-def ssm_parameter_create(ami):
+    :param ami_name: The AMI name filter
+    :param region: The region to query
+    :return: The AMI ID
+    """
+
+    latest_image = query_latest_image(ami_name, region)
+
+    if latest_image is None:
+        logger.error(f">> No images found matching: {ami_name} in {region}")
+        raise ValueError(f"No images found matching: {ami_name} in {region}")
+
+    return latest_image["ImageId"]
+
+
+def ssm_parameter_current(parameters, region=REGION):
+    """
+    A function to fetch the current values of a set of SSM parameters in a
+    region, batching the names into as few get_parameters calls as possible.
+
+    :param parameters: The parameter paths, relative to the account alias
+    :param region: The region of the parameters
+    :return: A dict of parameter path to current value, missing parameters
+        are omitted
+    """
+
+    ssm = create_client("ssm", region)
+    names = [f"/{ACCOUNT_ALIAS}/{parameter}" for parameter in parameters]
+
+    current = {}
+    started = time.perf_counter()
+
+    try:
+        for index in range(0, len(names), GET_PARAMETERS_BATCH):
+            response = ssm.get_parameters(
+                Names=names[index : index + GET_PARAMETERS_BATCH]
+            )
+            put_metric("RetryAttempts", retry_attempts(response))
+            for parameter in response["Parameters"]:
+                current[parameter["Name"]] = parameter["Value"]
+    except ClientError as err:
+        logger.error(f">> Error getting parameters: {err}")
+        put_metric("RetryAttempts", retry_attempts(err.response))
+        raise
+    finally:
+        put_latency("GetParametersLatency", started)
+
+    return current
+
+
+def ssm_parameter_create(
+    ami,
+    parameter=DEFAULT_PARAMETER,
+    region=REGION,
+    ami_name=AMI_NAME,
+    current=None,
+):
     """
     A function to update the SSM parameter with the latest AMI ID value
-    provided.
+    provided. The write is skipped when the parameter already holds the AMI
+    ID, so unchanged images do not create new parameter versions.
 
     :param ami: An AMI ID
-    :return: null
+    :param parameter: The parameter path, relative to the account alias
+    :param region: The region of the parameter
+    :param ami_name: The AMI name filter the AMI ID was selected by
+    :param current: The current value of the parameter, if known
+    :return: True if the parameter was written, False if it was skipped
     """
 
-    ssm_param = f"/{ACCOUNT_ALIAS}/IMAGE/RHEL8/LATEST/AMI_ID"
+    ssm_param = f"/{ACCOUNT_ALIAS}/{parameter}"
+
+    if current == ami:
+        logger.info(
+            f">> Skipping SSM Parameter: {ssm_param}, already set to latest "
+            f"AMI ID: {ami}."
+        )
+        return False
 
     logger.info(
         f">> Updating SSM Parameter: {ssm_param} with latest AMI ID: {ami}."
     )
 
-    ssm = boto3.client("ssm", region_name=REGION)
+    ssm = create_client("ssm", region)
+    started = time.perf_counter()
 
     try:
-        ssm.put_parameter(
+        response = ssm.put_parameter(
             Name=ssm_param,
             Description=(
-                "An SSM Parameter to store the latest RHEL8 AMI ID supplied by "
-                "the Lambda stack."
+                f"An SSM Parameter to store the latest {ami_name} AMI ID "
+                f"supplied by the Lambda stack."
             ),
             Overwrite=True,
             Value=ami,
             Type="String",
             DataType="aws:ec2:image",
         )
+        put_metric("RetryAttempts", retry_attempts(response))
         logger.info(
             f">> Successfully updated SSM Parameter: {ssm_param} with latest AMI "
             f"ID: {ami}."
         )
     except ClientError as err:
         logger.error(f"Error putting parameter: {err}")
+        put_metric("RetryAttempts", retry_attempts(err.response))
+        raise
+    finally:
+        put_latency("PutParameterLatency", started)
+
+    return True
+
+
+def ssm_watermark_update(parameter, region, creation_date):
+    """
+    A function to store the creation date of the latest image alongside its
+    parameter, for the next run to scan from.
+
+    :param parameter: The parameter path, relative to the account alias
+    :param region: The region of the parameter
+    :param creation_date: The creation date of the latest image
+    :return: null
+    """
+
+    ssm_param = f"/{ACCOUNT_ALIAS}/{parameter}{WATERMARK_SUFFIX}"
+    ssm = create_client("ssm", region)
+
+    try:
+        ssm.put_parameter(
+            Name=ssm_param,
+            Description=(
+                "The creation date of the image in the sibling AMI_ID "
+                "parameter, supplied by the Lambda stack."
+            ),
+            Overwrite=True,
+            Value=creation_date,
+            Type="String",
+        )
+        logger.info(f">> Updated watermark: {ssm_param} to {creation_date}.")
+    except ClientError as err:
+        logger.error(f"Error putting watermark: {err}")
         raise
 
 
+def fetch_current_values(manifest, executor):
+    """
+    A function to fetch the current value of every manifest parameter and
+    its watermark, with one batched lookup per region. A region whose lookup
+    fails, or times out, is left out, so its parameters are written
+    unconditionally.
+
+    :param manifest: A list of manifest entries
+    :param executor: The executor to run the regional lookups on
+    :return: A dict of (region, parameter path) to current value
+    """
+
+    regions = {}
+    for entry in manifest:
+        regions.setdefault(entry["region"], []).append(entry["parameter"])
+        if INCREMENTAL:
+            regions[entry["region"]].append(
+                f"{entry['parameter']}{WATERMARK_SUFFIX}"
+            )
+
+    futures = {
+        region: executor.submit(ssm_parameter_current, parameters, region)
+        for region, parameters in regions.items()
+    }
+
+    current = {}
+    for region, future in futures.items():
+        try:
+            values = future.result()
+        except (ClientError, BotoCoreError):
+            logger.warning(
+                f">> Unable to read current parameters in {region}, "
+                f"writing unconditionally."
+            )
+            continue
+
+        for parameter in regions[region]:
+            name = f"/{ACCOUNT_ALIAS}/{parameter}"
+            if name in values:
+                current[(region, parameter)] = values[name]
+
+    return current
+
+
+def images_from_event(event):
+    """
+    A function to extract the images announced by an image-available event,
+    either an EventBridge "EC2 AMI State Change" event or an SNS notification
+    from an EC2 Image Builder pipeline.
+
+    :param event: The Lambda event
+    :return: A list of {"image_id", "region", "name", "creation_date"} dicts,
+        where the name is None when the event does not carry it and the
+        creation date is None until the image is described
+    """
+
+    images = []
+
+    for record in event.get("Records", []):
+        try:
+            message = json.loads(record["Sns"]["Message"])
+        except (KeyError, TypeError, ValueError):
+            continue
+
+        for ami in message.get("outputResources", {}).get("amis", []):
+            images.append(
+                {
+                    "image_id": ami["image"],
+                    "region": ami["region"],
+                    "name": ami.get("name"),
+                    "creation_date": None,
+                }
+            )
+
+    detail = event.get("detail") or {}
+
+    if (
+        event.get("source") == "aws.ec2"
+        and detail.get("ImageId")
+        and detail.get("State") == "available"
+    ):
+        images.append(
+            {
+                "image_id": detail["ImageId"],
+                "region": event["region"],
+                "name": None,
+                "creation_date": None,
+            }
+        )
+
+    return images
+
+
+def describe_event_images(images):
+    """
+    A function to fill in the names and creation dates of event images,
+    with a single describe_images call by image ID per region rather than a
+    scan of the catalogue. The creation date is what guards a parameter
+    against an older image, e.g. a copy or re-registration, becoming
+    available after a newer one.
+
+    :param images: A list of event images
+    :return: null
+    """
+
+    regions = {}
+    for image in images:
+        regions.setdefault(image["region"], []).append(image)
+
+    for region, region_images in regions.items():
+        ec2 = create_client("ec2", region)
+
+        try:
+            response = ec2.describe_images(
+                ImageIds=[image["image_id"] for image in region_images]
+            )
+        except (ClientError, BotoCoreError) as err:
+            logger.error(f">> Error describing event images: {err}")
+            raise
+
+        described = {image["ImageId"]: image for image in response["Images"]}
+        for image in region_images:
+            found = described.get(image["image_id"], {})
+            image["name"] = image["name"] or found.get("Name")
+            image["creation_date"] = found.get("CreationDate")
+
+
+def describe_image(image_id, region):
+    """
+    A function to describe a single image by ID, e.g. the image a parameter
+    currently holds.
+
+    :param image_id: The AMI ID
+    :param region: The region of the image
+    :return: The image, or None if it does not exist
+    """
+
+    ec2 = create_client("ec2", region)
+
+    try:
+        response = ec2.describe_images(ImageIds=[image_id])
+    except ClientError as err:
+        if err.response["Error"]["Code"] in (
+            "InvalidAMIID.NotFound",
+            "InvalidAMIID.Malformed",
+            "InvalidAMIID.Unavailable",
+        ):
+            return None
+        raise
+
+    return response["Images"][0] if response["Images"] else None
+
+
+def match_event_images(manifest, images):
+    """
+    A function to pair each manifest entry with the newest event image it
+    covers, matched on region and on the entry's name filter. Entries that
+    no described event image matches are left to the scheduled
+    reconciliation.
+
+    :param manifest: A list of manifest entries
+    :param images: A list of described event images
+    :return: A list of (entry, image) pairs, where the image is shaped as
+        describe_images returns it
+    """
+
+    matched = []
+
+    for entry in manifest:
+        candidates = [
+            {
+                "ImageId": image["image_id"],
+                "Name": image["name"],
+                "CreationDate": image["creation_date"],
+            }
+            for image in images
+            if image["region"] == entry["region"]
+            and image["name"]
+            and image["creation_date"]
+            and entry["ami_name"]
+            and fnmatchcase(image["name"], entry["ami_name"])
+        ]
+
+        if candidates:
+            matched.append((entry, max(candidates, key=image_sort_key)))
+
+    return matched
+
+
+def start_instance_refresh(group, region):
+    """
+    A function to start a rolling instance refresh of an Auto Scaling Group,
+    so that its instances are replaced with the AMI now in the parameter.
+
+    :param group: The Auto Scaling Group name
+    :param region: The region of the Auto Scaling Group
+    :return: The state of the instance refresh
+    """
+
+    autoscaling = create_client("autoscaling", region)
+
+    preferences = {
+        "MinHealthyPercentage": MIN_HEALTHY_PERCENTAGE,
+        "InstanceWarmup": INSTANCE_WARMUP,
+    }
+
+    if CHECKPOINT_PERCENTAGES:
+        preferences["CheckpointPercentages"] = CHECKPOINT_PERCENTAGES
+        preferences["CheckpointDelay"] = CHECKPOINT_DELAY
+
+    refresh = {
+        "group": group,
+        "region": region,
+        "refresh_id": None,
+        "status": None,
+        "percentage_complete": None,
+    }
+
+    try:
+        response = autoscaling.start_instance_refresh(
+            AutoScalingGroupName=group,
+            Strategy="Rolling",
+            Preferences=preferences,
+        )
+        refresh["refresh_id"] = response["InstanceRefreshId"]
+        refresh["status"] = "Pending"
+        logger.info(
+            f">> Started instance refresh {refresh['refresh_id']} of {group}."
+        )
+    except ClientError as err:
+        if err.response["Error"]["Code"] == "InstanceRefreshInProgress":
+            logger.warning(f">> An instance refresh of {group} is in progress.")
+            refresh["status"] = "InProgress"
+        else:
+            logger.error(f">> Error starting instance refresh: {err}")
+            refresh["status"] = f"Error: {err}"
+
+    return refresh
+
+
+def poll_instance_refreshes(refreshes, context):
+    """
+    A function to follow the instance refreshes started by this invocation
+    until they finish, the polling budget is spent or the invocation runs
+    short of time. Refreshes carry on after the function returns, so
+    stopping early only stops the reporting.
+
+    :param refreshes: A list of instance refresh states, updated in place
+    :param context: The Lambda context, used for the remaining time
+    :return: null
+    """
+
+    pending = [refresh for refresh in refreshes if refresh["refresh_id"]]
+    deadline = time.monotonic() + POLL_BUDGET
+
+    while pending:
+        for refresh in pending:
+            autoscaling = create_client("autoscaling", refresh["region"])
+
+            try:
+                response = autoscaling.describe_instance_refreshes(
+                    AutoScalingGroupName=refresh["group"],
+                    InstanceRefreshIds=[refresh["refresh_id"]],
+                )
+            except ClientError as err:
+                logger.error(f">> Error describing instance refresh: {err}")
+                continue
+
+            for state in response["InstanceRefreshes"]:
+                refresh["status"] = state["Status"]
+                refresh["percentage_complete"] = state.get("PercentageComplete")
+
+        pending = [
+            refresh
+            for refresh in pending
+            if refresh["status"] not in INSTANCE_REFRESH_DONE
+        ]
+
+        remaining = context.get_remaining_time_in_millis() if context else 0
+
+        if (
+            not pending
+            or time.monotonic() + POLL_INTERVAL > deadline
+            or remaining < (POLL_INTERVAL + POLL_MARGIN) * 1000
+        ):
+            break
+
+        time.sleep(POLL_INTERVAL)
+
+    for refresh in refreshes:
+        logger.info(
+            f">> Instance refresh of {refresh['group']}: {refresh['status']} "
+            f"({refresh['percentage_complete']}% complete)."
+        )
+
+
+def event_image_is_older(entry, event_image, current, watermark):
+    """
+    A function to check whether an event image was created before the image
+    the parameter already holds, judged by the watermark or, without one, by
+    describing the current image.
+
+    :param entry: A manifest entry
+    :param event_image: The image identified by an event
+    :param current: The current value of the entry's parameter, if known
+    :param watermark: The creation date of the current image, if known
+    :return: True if the event image is older than the current image
+    """
+
+    if not current or current == event_image["ImageId"]:
+        return False
+
+    if not watermark:
+        current_image = describe_image(current, entry["region"])
+        watermark = current_image and current_image.get("CreationDate")
+
+    return bool(watermark) and event_image["CreationDate"] < watermark
+
+
+def refresh_image(entry, current=None, event_image=None, watermark=None):
+    """
+    A function to refresh a single manifest entry. Errors are captured in the
+    result so that one failing entry does not affect the others, including
+    the botocore timeouts, connection and parameter validation errors that
+    are raised in place of a ClientError.
+
+    :param entry: A manifest entry
+    :param current: The current value of the entry's parameter, if known
+    :param event_image: The image identified by an event, which skips the
+        describe_images scan, and is skipped itself when it is older than
+        the current image
+    :param watermark: The creation date of the current image, if known
+    :return: The result of the refresh
+    """
+
+    result = {
+        "ami_name": entry["ami_name"],
+        "region": entry["region"],
+        "parameter": entry["parameter"],
+        "ami_id": None,
+        "written": None,
+        "instance_refreshes": [],
+        "error": None,
+    }
+
+    try:
+        image = event_image
+
+        if image and event_image_is_older(entry, image, current, watermark):
+            logger.warning(
+                f">> Skipping event image {image['ImageId']} for {entry}, "
+                f"created before the current image {current}."
+            )
+            result["ami_id"] = current
+            result["written"] = False
+            return result
+
+        if not image:
+            """
+            Scan incrementally when the parameter and its watermark are both
+            set, and fall back to a full scan when that finds nothing, e.g.
+            the watermark is unusable or the current image was deregistered.
+            """
+
+            if INCREMENTAL and current and watermark:
+                image = query_latest_image(
+                    entry["ami_name"], entry["region"], watermark
+                )
+            if image is None:
+                image = query_latest_image(entry["ami_name"], entry["region"])
+            if image is None:
+                raise ValueError(
+                    f"No images found matching: {entry['ami_name']} in "
+                    f"{entry['region']}"
+                )
+
+        result["ami_id"] = image["ImageId"]
+        result["written"] = ssm_parameter_create(
+            result["ami_id"],
+            entry["parameter"],
+            entry["region"],
+            entry["ami_name"],
+            current,
+        )
+        if (
+            INCREMENTAL
+            and image
+            and image.get("CreationDate")
+            and image["CreationDate"] != watermark
+        ):
+            ssm_watermark_update(
+                entry["parameter"], entry["region"], image["CreationDate"]
+            )
+        if INSTANCE_REFRESH and result["written"]:
+            result["instance_refreshes"] = [
+                start_instance_refresh(group, entry["region"])
+                for group in entry.get("auto_scaling_groups", [])
+            ]
+    except (ClientError, BotoCoreError, ValueError) as err:
+        logger.error(f">> Error refreshing {entry}: {err}")
+        result["error"] = str(err)
+
+    return result
+
+
+def timing_report(invoke_started):
+    """
+    A function to report the init and invoke durations of the current
+    invocation. The init duration is only reported on a cold start, as warm
+    invocations reuse the initialised module.
+
+    :param invoke_started: The perf_counter value at the start of the invoke
+    :return: The timing report
+    """
+
+    global COLD_START
+
+    report = {
+        "cold_start": COLD_START,
+        "init_ms": round(INIT_DURATION * 1000, 1) if COLD_START else None,
+        "invoke_ms": round((time.perf_counter() - invoke_started) * 1000, 1),
+    }
+    COLD_START = False
+
+    logger.info(f">> Timing: {json.dumps(report)}")
+
+    return report
+
+
 def lambda_handler(event, context):
     """
     Lambda entrypoint
     """
 
+    invoke_started = time.perf_counter()
+
     logger.info(f">> Lambda function has been invoked by: {event}")
 
-    ami_id = query_latest_ami()
-    ssm_parameter_create(ami_id)
+    manifest = load_manifest(event)
+    event_images = [None] * len(manifest)
+    trigger = "schedule"
+
+    """
+    When the event already identifies the new images, only the manifest
+    entries they match are refreshed and the describe_images scan is skipped.
+    The scheduled run reconciles everything else.
+    """
+
+    images = images_from_event(event)
+
+    if images:
+        trigger = "event"
+        try:
+            describe_event_images(images)
+        except (ClientError, BotoCoreError):
+            logger.warning(">> Falling back to a full refresh.")
+            trigger = "schedule"
+        else:
+            matched = match_event_images(manifest, images)
+            manifest = [entry for entry, _ in matched]
+            event_images = [image for _, image in matched]
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(MAX_WORKERS, len(manifest)))
+    ) as executor:
+        current = fetch_current_values(manifest, executor)
+        results = list(
+            executor.map(
+                refresh_image,
+                manifest,
+                [
+                    current.get((entry["region"], entry["parameter"]))
+                    for entry in manifest
+                ],
+                event_images,
+                [
+                    current.get(
+                        (
+                            entry["region"],
+                            f"{entry['parameter']}{WATERMARK_SUFFIX}",
+                        )
+                    )
+                    for entry in manifest
+                ],
+            )
+        )
+
+    refreshes = [
+        refresh
+        for result in results
+        for refresh in result["instance_refreshes"]
+    ]
+    poll_instance_refreshes(refreshes, context)
+
+    failed = sum(1 for result in results if result["error"])
+    written = sum(1 for result in results if result["written"])
+    skipped = sum(1 for result in results if result["written"] is False)
+
+    logger.info(
+        f">> Refreshed {len(results) - failed} of {len(results)} images, "
+        f"{written} written, {skipped} skipped, {failed} failed."
+    )
+
+    put_metric("ParametersWritten", written)
+    put_metric("ParametersSkipped", skipped)
+    put_metric("RefreshErrors", failed)
+    put_metric(
+        "InstanceRefreshesStarted",
+        sum(1 for refresh in refreshes if refresh["refresh_id"]),
+    )
+
+    timing = timing_report(invoke_started)
+
+    put_metric("InvokeDuration", timing["invoke_ms"], "Milliseconds")
+    flush_metrics()
+
+    return {
+        "trigger": trigger,
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "written": written,
+        "skipped": skipped,
+        "timing": timing,
+    }
+
+
+# Set last, once every module level client and constant has been built.
+COLD_START = True
+INIT_DURATION = time.perf_counter() - INIT_STARTED
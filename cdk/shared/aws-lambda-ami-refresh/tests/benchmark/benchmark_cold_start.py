@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+"""
+A local harness for the cold-start cost of the AMI refresh Lambda handler.
+
+Each run imports the handler module in a fresh interpreter and records the
+wall time of the import and the init duration measured by the module itself,
+along with the time taken to create the first client, which is where the
+deferred boto3 import is paid.
+
+Run from the root of the aws-lambda-ami-refresh app:
+python -m tests.benchmark.benchmark_cold_start --runs 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+from stacks.src import lambda_handler
+imported = time.perf_counter()
+lambda_handler.create_client("ssm", lambda_handler.REGION)
+client = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "init_ms": lambda_handler.INIT_DURATION * 1000,
+    "first_client_ms": (client - imported) * 1000,
+}))
+"""
+
+
+def probe(env):
+    """
+    A function to import the handler in a fresh interpreter.
+
+    :param env: The environment of the interpreter
+    :return: The measured durations
+    """
+
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--output", help="An optional path to write the results to as JSON"
+    )
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "ACCOUNT_ALIAS": "benchmark",
+        "REGION": "eu-west-2",
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+    }
+
+    samples = [probe(env) for _ in range(args.runs)]
+
+    results = {
+        key: {
+            "median": round(statistics.median(s[key] for s in samples), 1),
+            "min": round(min(s[key] for s in samples), 1),
+            "max": round(max(s[key] for s in samples), 1),
+        }
+        for key in samples[0]
+    }
+
+    for key, stats in results.items():
+        print(
+            f"{key:>16}: median {stats['median']}ms, min {stats['min']}ms, "
+            f"max {stats['max']}ms ({args.runs} runs)"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as fp:
+            json.dump(results, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+"""
+A benchmark of the latest AMI selection in query_latest_ami.
+
+describe_images is answered in process with a synthetic image catalogue,
+page by page with a NextToken as EC2 does, since moto returns every image
+in one page. The benchmark reports the wall time, pages and peak traced
+memory of the paginated, single-pass selection against the previous
+single-call, sort-everything approach, which receives the whole catalogue
+in one response.
+
+Run from the root of the aws-lambda-ami-refresh app:
+python -m tests.benchmark.benchmark_query_latest_ami --images 100000
+"""
+
+import argparse
+import os
+import math
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+os.environ.setdefault("ACCOUNT_ALIAS", "benchmark")
+os.environ.setdefault("AMI_NAME", "RHEL-8*")
+os.environ.setdefault("REGION", "eu-west-2")
+os.environ.setdefault("AWS_DEFAULT_REGION", os.environ["REGION"])
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+from botocore.awsrequest import AWSResponse
+from moto.core import DEFAULT_ACCOUNT_ID
+from moto.ec2.models import ec2_backends
+from moto.ec2.models.amis import Ami
+
+from stacks.src import lambda_handler
+
+
+def seed_images(region, count, name_prefix="RHEL-8"):
+    """
+    A function to seed the moto EC2 backend with a synthetic image catalogue.
+
+    The images are inserted straight into the backend, as the public API does
+    not allow the creation date to be set. One image is created a minute up
+    to the present, so the newest images fall inside an incremental scan.
+
+    :param region: The region to seed
+    :param count: The number of images to create
+    :param name_prefix: The prefix of the image names
+    :return: The ID of the newest image
+    """
+
+    backend = ec2_backends[DEFAULT_ACCOUNT_ID][region]
+    start = datetime.utcnow() - timedelta(minutes=count)
+    offsets = list(range(count))
+    random.shuffle(offsets)
+
+    newest = None
+    for index, offset in enumerate(offsets):
+        ami_id = f"ami-{index:017x}"
+        created = start + timedelta(minutes=offset)
+        backend.amis[ami_id] = Ami(
+            backend,
+            ami_id,
+            name=f"{name_prefix}.{created:%Y%m%d%H%M}-x86_64",
+            creation_date=created.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            region_name=region,
+        )
+        if offset == count - 1:
+            newest = ami_id
+
+    return newest
+
+
+class PagedImages:
+    """
+    A class to answer the describe_images calls of a client from a synthetic
+    catalogue, a page of MaxResults images at a time, or every image when
+    MaxResults is not set.
+
+    Calls are answered from the before-call event, as botocore's Stubber
+    answers them, but each page is built when it is requested. Stubber
+    queues every response up front, which would hold the whole catalogue in
+    memory before the measurement starts. The creation dates are spread
+    over the catalogue in a fixed, shuffled order, one a minute up to the
+    present.
+    """
+
+    def __init__(self, client, count, name_prefix="RHEL-8"):
+        self.count = count
+        self.name_prefix = name_prefix
+        self.start = datetime.utcnow() - timedelta(minutes=count)
+        self.stride = next(
+            stride
+            for stride in range(7919, 7919 + count + 1)
+            if math.gcd(stride, count) == 1
+        )
+        self.pages = 0
+        client.meta.events.register(
+            "before-call.ec2.DescribeImages", self.describe_images
+        )
+
+    def image(self, index):
+        created = self.start + timedelta(
+            minutes=index * self.stride % self.count
+        )
+        ami_id = f"ami-{index:017x}"
+
+        return {
+            "Architecture": "x86_64",
+            "BlockDeviceMappings": [
+                {
+                    "DeviceName": "/dev/sda1",
+                    "Ebs": {
+                        "DeleteOnTermination": True,
+                        "SnapshotId": f"snap-{index:017x}",
+                        "VolumeSize": 10,
+                        "VolumeType": "gp3",
+                        "Encrypted": False,
+                    },
+                }
+            ],
+            "CreationDate": created.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "Hypervisor": "xen",
+            "ImageId": ami_id,
+            "ImageLocation": f"123456789012/{ami_id}",
+            "ImageType": "machine",
+            "Name": f"{self.name_prefix}.{created:%Y%m%d%H%M}-x86_64",
+            "OwnerId": "123456789012",
+            "Public": True,
+            "RootDeviceName": "/dev/sda1",
+            "RootDeviceType": "ebs",
+            "State": "available",
+            "VirtualizationType": "hvm",
+        }
+
+    @property
+    def newest(self):
+        """
+        The ID of the image created last.
+        """
+
+        return self.image(
+            next(
+                index
+                for index in range(self.count)
+                if index * self.stride % self.count == self.count - 1
+            )
+        )["ImageId"]
+
+    def describe_images(self, params, **kwargs):
+        body = params["body"]
+        first = int(body.get("NextToken", 0))
+        size = int(body.get("MaxResults", self.count))
+        last = min(first + size, self.count)
+        self.pages += 1
+
+        page = {
+            "Images": [self.image(index) for index in range(first, last)],
+            "ResponseMetadata": {"HTTPStatusCode": 200, "RetryAttempts": 0},
+        }
+        if last < self.count:
+            page["NextToken"] = str(last)
+
+        return AWSResponse(None, 200, {}, None), page
+
+
+def query_latest_ami_sorted():
+    """
+    The previous implementation, a single describe_images call with every
+    image sorted by name. Kept here as the benchmark baseline.
+
+    :return: The AMI ID
+    """
+
+    ec2 = lambda_handler.create_client("ec2", lambda_handler.REGION)
+    response = ec2.describe_images(
+        Filters=[
+            {"Name": "name", "Values": [lambda_handler.AMI_NAME]},
+            {"Name": "state", "Values": ["available"]},
+            {"Name": "image-type", "Values": ["machine"]},
+        ]
+    )
+
+    return sorted(response["Images"], key=lambda k: k["Name"])[-1]["ImageId"]
+
+
+def measure(func):
+    """
+    A function to measure the wall time and peak traced memory of a call.
+
+    :param func: The callable to measure
+    :return: A tuple of the result, the seconds taken and the peak bytes
+    """
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--images", type=int, default=10000)
+    args = parser.parse_args()
+
+    catalogue = PagedImages(
+        lambda_handler.create_client("ec2", lambda_handler.REGION),
+        args.images,
+    )
+    expected = catalogue.newest
+
+    for label, func in (
+        ("sorted", query_latest_ami_sorted),
+        ("streaming", lambda_handler.query_latest_ami),
+    ):
+        catalogue.pages = 0
+        ami_id, elapsed, peak = measure(func)
+        print(
+            f"{label:>10}: {args.images} images, {catalogue.pages} pages, "
+            f"{elapsed:.3f}s, peak {peak / 1024 / 1024:.1f} MiB, {ami_id}"
+            f"{'' if ami_id == expected else ' (MISMATCH)'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
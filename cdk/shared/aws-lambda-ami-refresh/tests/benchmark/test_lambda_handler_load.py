@@ -0,0 +1,153 @@
+"""
+A moto-backed load and benchmark suite for the AMI refresh Lambda handler.
+
+Each case seeds a synthetic image catalogue spread evenly across several
+regions and runs lambda_handler end to end against it, once with full scans
+and once with incremental scans from a stored watermark. Both modes measure
+the steady state of a scheduled run, where every parameter is already
+current. Alongside the wall time, each case records the API calls made per
+operation and the peak memory traced during one further invocation in the
+benchmark's extra_info. moto serves the calls in process, so the peak
+includes its responses, but not the seeded catalogue. moto does not paginate
+describe_images, so the DescribeImages count is one call per scan rather than
+one per page.
+
+The tests are marked "benchmark", which pytest.ini deselects from the unit
+test run. Run them from the root of the aws-lambda-ami-refresh app, saving
+the results to compare between commits:
+python -m pytest tests/benchmark -m benchmark --benchmark-autosave
+python -m pytest tests/benchmark -m benchmark \\
+    --benchmark-compare --benchmark-json=benchmark.json
+
+The catalogue sizes and rounds can be narrowed for a quicker run with the
+AMI_BENCH_SIZES (comma separated) and AMI_BENCH_ROUNDS environment variables.
+"""
+
+import os
+import threading
+import tracemalloc
+from collections import Counter
+
+import boto3
+import pytest
+from moto import mock_ec2, mock_ssm
+
+from stacks.src import lambda_handler
+from tests.benchmark.benchmark_query_latest_ami import seed_images
+
+REGIONS = ("eu-west-2", "eu-west-1", "us-east-1")
+SIZES = [
+    int(size)
+    for size in os.environ.get("AMI_BENCH_SIZES", "1000,10000,100000").split(
+        ","
+    )
+]
+ROUNDS = int(os.environ.get("AMI_BENCH_ROUNDS", "3"))
+
+pytestmark = pytest.mark.benchmark(group="lambda_handler")
+
+
+class ApiCalls:
+    """
+    A counter of the API calls made by every client of the default session,
+    keyed by service and operation, e.g. ec2.DescribeImages.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        boto3.setup_default_session()
+        boto3.DEFAULT_SESSION.events.register("before-call", self.count)
+
+    def count(self, event_name, **kwargs):
+        with self.lock:
+            self.counts[event_name.split(".", 1)[1]] += 1
+
+    def reset(self):
+        """
+        Clear the counts and the handler's cached clients, so the next round
+        starts from a cold client cache.
+        """
+
+        with self.lock:
+            self.counts.clear()
+        lambda_handler.reset_clients()
+
+
+def traced_peak_mib(function, *args):
+    """
+    A function to measure the peak memory allocated while a call runs, from
+    a fresh trace, so earlier cases and the seeding do not count towards it.
+    """
+
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return round(peak / 1024 / 1024, 1)
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda size: f"{size}")
+def catalogue(request):
+    """
+    A mocked catalogue of images spread across the benchmark regions, with a
+    manifest entry per region.
+    """
+
+    with mock_ec2(), mock_ssm():
+        for region in REGIONS:
+            seed_images(region, request.param // len(REGIONS))
+
+        yield {
+            "images": request.param,
+            "manifest": [
+                {
+                    "ami_name": "RHEL-8*",
+                    "region": region,
+                    "parameter": lambda_handler.DEFAULT_PARAMETER,
+                }
+                for region in REGIONS
+            ],
+        }
+
+
+@pytest.mark.parametrize("incremental", [False, True], ids=["full", "incr"])
+def test_lambda_handler(benchmark, monkeypatch, catalogue, incremental):
+    monkeypatch.setattr(lambda_handler, "INCREMENTAL", incremental)
+    event = {"manifest": catalogue["manifest"]}
+    calls = ApiCalls()
+
+    """
+    A first run writes the parameters and watermarks, so the measured rounds
+    see the steady state of a scheduled run.
+    """
+
+    lambda_handler.lambda_handler(event, None)
+
+    results = benchmark.pedantic(
+        lambda_handler.lambda_handler,
+        args=(event, None),
+        setup=calls.reset,
+        rounds=ROUNDS,
+        iterations=1,
+    )
+
+    api_calls = dict(sorted(calls.counts.items()))
+
+    benchmark.extra_info.update(
+        {
+            "images": catalogue["images"],
+            "regions": len(REGIONS),
+            "incremental": incremental,
+            "api_calls": api_calls,
+            "peak_traced_mib": traced_peak_mib(
+                lambda_handler.lambda_handler, event, None
+            ),
+        }
+    )
+
+    assert results["failed"] == 0
+    assert results["skipped"] == len(REGIONS)
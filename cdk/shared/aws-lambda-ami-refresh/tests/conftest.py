@@ -0,0 +1,41 @@
+"""
+Shared fixtures for the AMI refresh Lambda unit tests.
+
+The handler reads its configuration from the environment at import time, so
+the environment is populated here before any test module imports it.
+"""
+
+import os
+
+os.environ.setdefault("ACCOUNT_ALIAS", "test")
+os.environ.setdefault("AMI_NAME", "RHEL-8*")
+os.environ.setdefault("REGION", "eu-west-2")
+os.environ.setdefault("AWS_DEFAULT_REGION", os.environ["REGION"])
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+import pytest
+from moto import mock_ec2, mock_ssm
+
+
+@pytest.fixture(autouse=True)
+def clients():
+    """
+    Drop the handler's cached clients, so no client outlives its test.
+    """
+
+    from stacks.src import lambda_handler
+
+    lambda_handler.reset_clients()
+    yield
+    lambda_handler.reset_clients()
+
+
+@pytest.fixture
+def aws():
+    """
+    Mocked EC2 and SSM endpoints for the duration of a test.
+    """
+
+    with mock_ec2(), mock_ssm():
+        yield
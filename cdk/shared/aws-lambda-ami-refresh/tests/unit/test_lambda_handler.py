@@ -0,0 +1,585 @@
+"""
+A collection of tests for the AMI refresh Lambda function.
+"""
+
+import json
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import boto3
+import pytest
+from botocore.exceptions import ReadTimeoutError
+from botocore.stub import Stubber
+from moto.core import DEFAULT_ACCOUNT_ID
+from moto.ec2.models import ec2_backends
+from moto.ec2.models.amis import Ami
+from moto.events.models import EventPattern
+
+from stacks.src import lambda_handler
+
+CONTEXT_PATH = Path(__file__).parent / "context"
+
+
+def context(path):
+    with open(f"{CONTEXT_PATH}/{path}") as file:
+        context_file = json.load(file)
+
+    return context_file
+
+
+def add_image(ami_id, name, creation_date, region="eu-west-2"):
+    backend = ec2_backends[DEFAULT_ACCOUNT_ID][region]
+    backend.amis[ami_id] = Ami(
+        backend,
+        ami_id,
+        name=name,
+        creation_date=creation_date,
+        region_name=region,
+    )
+
+
+def test_query_latest_ami_uses_creation_date(aws):
+    """
+    Test to ensure that the most recently created image is selected, even when
+    its name does not sort last.
+    """
+
+    add_image("ami-00000000000000001", "RHEL-8.9-z", "2023-01-01T00:00:00.000Z")
+    add_image("ami-00000000000000002", "RHEL-8.9-a", "2024-01-01T00:00:00.000Z")
+    add_image("ami-00000000000000003", "RHEL-9.0-a", "2025-01-01T00:00:00.000Z")
+
+    assert lambda_handler.query_latest_ami() == "ami-00000000000000002"
+
+
+def test_query_latest_ami_breaks_ties_by_name(aws):
+    """
+    Test to ensure that the name is used as a tie-breaker when two images share
+    a creation date.
+    """
+
+    add_image("ami-00000000000000001", "RHEL-8.9-b", "2024-01-01T00:00:00.000Z")
+    add_image("ami-00000000000000002", "RHEL-8.9-a", "2024-01-01T00:00:00.000Z")
+
+    assert lambda_handler.query_latest_ami() == "ami-00000000000000001"
+
+
+def test_query_latest_ami_spans_pages(monkeypatch):
+    """
+    Test to ensure that every page returned by describe_images is scanned.
+    """
+
+    ec2 = boto3.client("ec2", region_name="eu-west-2")
+    stubber = Stubber(ec2)
+    stubber.add_response(
+        "describe_images",
+        {
+            "Images": [
+                {"ImageId": "ami-1", "Name": "a", "CreationDate": "2024"},
+            ],
+            "NextToken": "page-2",
+        },
+    )
+    stubber.add_response(
+        "describe_images",
+        {"Images": [{"ImageId": "ami-2", "Name": "b", "CreationDate": "2025"}]},
+    )
+    monkeypatch.setattr(boto3, "client", lambda *a, **k: ec2)
+
+    with stubber:
+        assert lambda_handler.query_latest_ami() == "ami-2"
+        stubber.assert_no_pending_responses()
+
+
+def test_query_latest_ami_no_match(aws):
+    """
+    Test to ensure that an error is raised when no images match.
+    """
+
+    with pytest.raises(ValueError):
+        lambda_handler.query_latest_ami()
+
+
+def test_lambda_handler_manifest(aws):
+    """
+    Test to ensure that every manifest entry is refreshed in its own region,
+    and that a failing entry is reported without affecting the others.
+    """
+
+    add_image("ami-00000000000000001", "RHEL-8.9", "2024-01-01T00:00:00.000Z")
+    add_image(
+        "ami-00000000000000002",
+        "RHEL-9.3",
+        "2024-01-01T00:00:00.000Z",
+        region="us-east-1",
+    )
+
+    manifest = [
+        {
+            "ami_name": "RHEL-8*",
+            "region": "eu-west-2",
+            "parameter": "IMAGE/RHEL8/LATEST/AMI_ID",
+        },
+        {
+            "ami_name": "RHEL-9*",
+            "region": "us-east-1",
+            "parameter": "IMAGE/RHEL9/LATEST/AMI_ID",
+        },
+        {
+            "ami_name": "RHEL-9*",
+            "region": "eu-west-2",
+            "parameter": "IMAGE/RHEL9/LATEST/AMI_ID",
+        },
+    ]
+
+    response = lambda_handler.lambda_handler({"manifest": manifest}, None)
+
+    assert response["succeeded"] == 2
+    assert response["failed"] == 1
+    assert [result["ami_id"] for result in response["results"]] == [
+        "ami-00000000000000001",
+        "ami-00000000000000002",
+        None,
+    ]
+    assert response["results"][2]["error"]
+
+    ssm = boto3.client("ssm", region_name="us-east-1")
+    parameter = ssm.get_parameter(Name="/test/IMAGE/RHEL9/LATEST/AMI_ID")
+    assert parameter["Parameter"]["Value"] == "ami-00000000000000002"
+
+
+class TimingOutClient:
+    """
+    A client whose every call times out, as a client with the handler's read
+    timeout would against an unresponsive endpoint.
+    """
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            raise ReadTimeoutError(endpoint_url="https://example.com")
+
+        return call
+
+
+def test_lambda_handler_isolates_botocore_errors(aws):
+    """
+    Test to ensure that botocore errors other than a ClientError, a timed
+    out region or an entry without an AMI name, only fail their own entries.
+    """
+
+    add_image("ami-00000000000000001", "RHEL-8.9", "2024-01-01T00:00:00.000Z")
+
+    lambda_handler.CLIENTS[("ec2", "us-east-1")] = TimingOutClient()
+    lambda_handler.CLIENTS[("ssm", "us-east-1")] = TimingOutClient()
+
+    manifest = [
+        {
+            "ami_name": "RHEL-8*",
+            "region": "eu-west-2",
+            "parameter": "IMAGE/RHEL8/LATEST/AMI_ID",
+        },
+        {
+            "ami_name": "RHEL-8*",
+            "region": "us-east-1",
+            "parameter": "IMAGE/RHEL8/LATEST/AMI_ID",
+        },
+        {
+            "ami_name": None,
+            "region": "eu-west-2",
+            "parameter": "IMAGE/UNNAMED/LATEST/AMI_ID",
+        },
+    ]
+
+    response = lambda_handler.lambda_handler({"manifest": manifest}, None)
+
+    assert (response["succeeded"], response["failed"]) == (1, 2)
+    assert response["results"][0]["ami_id"] == "ami-00000000000000001"
+    assert "timeout" in response["results"][1]["error"].lower()
+    assert "validation" in response["results"][2]["error"].lower()
+
+
+def test_lambda_handler_skips_unchanged(aws):
+    """
+    Test to ensure that a parameter already holding the latest AMI ID is not
+    written again, and that a new image is written on the following run.
+    """
+
+    add_image("ami-00000000000000001", "RHEL-8.9", "2024-01-01T00:00:00.000Z")
+
+    first = lambda_handler.lambda_handler({}, None)
+    second = lambda_handler.lambda_handler({}, None)
+
+    add_image("ami-00000000000000002", "RHEL-8.9", "2025-01-01T00:00:00.000Z")
+
+    third = lambda_handler.lambda_handler({}, None)
+
+    assert (first["written"], first["skipped"]) == (1, 0)
+    assert (second["written"], second["skipped"]) == (0, 1)
+    assert (third["written"], third["skipped"]) == (1, 0)
+
+    ssm = boto3.client("ssm", region_name="eu-west-2")
+    parameter = ssm.get_parameter(Name="/test/IMAGE/RHEL8/LATEST/AMI_ID")
+    assert parameter["Parameter"]["Version"] == 2
+
+
+def test_clients_are_reused():
+    """
+    Test to ensure that clients are created once per service and region, with
+    the shared botocore configuration.
+    """
+
+    ssm = lambda_handler.create_client("ssm", "eu-west-2")
+
+    assert lambda_handler.create_client("ssm", "eu-west-2") is ssm
+    assert lambda_handler.create_client("ssm", "us-east-1") is not ssm
+    assert ssm.meta.config.retries["mode"] == "adaptive"
+
+
+def test_lambda_handler_timing(aws):
+    """
+    Test to ensure that warm invocations report an invoke duration without an
+    init duration.
+    """
+
+    add_image("ami-00000000000000001", "RHEL-8.9", "2024-01-01T00:00:00.000Z")
+
+    lambda_handler.lambda_handler({}, None)
+    timing = lambda_handler.lambda_handler({}, None)["timing"]
+
+    assert timing["cold_start"] is False
+    assert timing["init_ms"] is None
+    assert timing["invoke_ms"] > 0
+
+
+def test_event_pattern_image_available():
+    """
+    Test to ensure that the "EC2 AMI State Change" event pattern used in the
+    EventBridge rule only matches images that have become available.
+    """
+
+    event_pattern = context("ami_event_pattern_available.json")
+    event = context("ami_event_available.json")
+    negative = context("ami_event_negative.json")
+
+    pattern = EventPattern.load(json.dumps(event_pattern))
+    assert pattern.matches_event(event)
+    assert not pattern.matches_event(negative)
+
+
+def test_lambda_handler_ami_event(aws):
+    """
+    Test to ensure that an EC2 AMI event refreshes the parameter with the
+    announced image rather than the result of a catalogue scan.
+    """
+
+    add_image("ami-00000000000000002", "RHEL-8.9", "2024-01-01T00:00:00.000Z")
+    add_image("ami-00000000000000003", "RHEL-8.9", "2025-01-01T00:00:00.000Z")
+
+    response = lambda_handler.lambda_handler(
+        context("ami_event_available.json"), None
+    )
+
+    assert response["trigger"] == "event"
+    assert response["written"] == 1
+    assert response["results"][0]["ami_id"] == "ami-00000000000000002"
+
+
+@pytest.mark.parametrize("incremental", [True, False])
+def test_lambda_handler_older_event_image(aws, monkeypatch, incremental):
+    """
+    Test to ensure that an event for an image created before the current
+    one, e.g. a copy of an older AMI, does not move the parameter back, with
+    or without a watermark to compare against.
+    """
+
+    monkeypatch.setattr(lambda_handler, "INCREMENTAL", incremental)
+
+    add_image("ami-00000000000000002", "RHEL-8.9", "2024-01-01T00:00:00.000Z")
+    add_image("ami-00000000000000003", "RHEL-8.9", "2025-01-01T00:00:00.000Z")
+
+    lambda_handler.lambda_handler({}, None)
+    response = lambda_handler.lambda_handler(
+        context("ami_event_available.json"), None
+    )
+
+    assert response["trigger"] == "event"
+    assert (response["written"], response["skipped"]) == (0, 1)
+    assert response["results"][0]["ami_id"] == "ami-00000000000000003"
+
+    ssm = boto3.client("ssm", region_name="eu-west-2")
+    parameter = ssm.get_parameter(Name="/test/IMAGE/RHEL8/LATEST/AMI_ID")
+    assert parameter["Parameter"]["Value"] == "ami-00000000000000003"
+
+
+def test_lambda_handler_image_builder_event(aws):
+    """
+    Test to ensure that an Image Builder notification refreshes only the
+    manifest entries its images match, without a catalogue scan.
+    """
+
+    add_image(
+        "ami-00000000000000002",
+        "RHEL-8.10-golden",
+        "2024-01-01T00:00:00.000Z",
+    )
+    add_image(
+        "ami-00000000000000003",
+        "RHEL-8.10-golden",
+        "2024-01-01T00:00:00.000Z",
+        region="us-east-1",
+    )
+
+    event = context("image_builder_sns_event.json")
+    event["manifest"] = [
+        {
+            "ami_name": "RHEL-8*",
+            "region": "eu-west-2",
+            "parameter": "IMAGE/RHEL8/LATEST/AMI_ID",
+        },
+        {
+            "ami_name": "RHEL-8*",
+            "region": "us-east-1",
+            "parameter": "IMAGE/RHEL8/LATEST/AMI_ID",
+        },
+        {
+            "ami_name": "RHEL-9*",
+            "region": "eu-west-2",
+            "parameter": "IMAGE/RHEL9/LATEST/AMI_ID",
+        },
+    ]
+
+    response = lambda_handler.lambda_handler(event, None)
+
+    assert response["trigger"] == "event"
+    assert [
+        (result["region"], result["ami_id"]) for result in response["results"]
+    ] == [
+        ("eu-west-2", "ami-00000000000000002"),
+        ("us-east-1", "ami-00000000000000003"),
+    ]
+
+
+def test_lambda_handler_metrics(aws, capsys):
+    """
+    Test to ensure that each invocation prints a single Embedded Metric Format
+    document with the per-phase latencies and counts.
+    """
+
+    add_image("ami-00000000000000001", "RHEL-8.9", "2024-01-01T00:00:00.000Z")
+    add_image("ami-00000000000000002", "RHEL-8.9", "2025-01-01T00:00:00.000Z")
+
+    lambda_handler.lambda_handler({}, None)
+
+    documents = [
+        json.loads(line)
+        for line in capsys.readouterr().out.splitlines()
+        if line.startswith('{"_aws"')
+    ]
+
+    assert len(documents) == 1
+    document = documents[0]
+    names = {
+        metric["Name"]
+        for metric in document["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+    }
+    assert {
+        "DescribeImagesLatency",
+        "GetParametersLatency",
+        "PutParameterLatency",
+        "ImagesScanned",
+        "RetryAttempts",
+        "InvokeDuration",
+    } <= names
+    assert document["ImagesScanned"] == [2]
+    assert document["ParametersWritten"] == [1]
+
+
+class FakeContext:
+    def get_remaining_time_in_millis(self):
+        return 180000
+
+
+def test_lambda_handler_instance_refresh(aws, monkeypatch):
+    """
+    Test to ensure that a changed AMI starts an instance refresh of the
+    entry's Auto Scaling Groups, and that its progress is polled until done.
+    """
+
+    add_image("ami-00000000000000001", "RHEL-8.9", "2024-01-01T00:00:00.000Z")
+
+    monkeypatch.setattr(lambda_handler, "INSTANCE_REFRESH", True)
+    monkeypatch.setattr(lambda_handler, "CHECKPOINT_PERCENTAGES", [50, 100])
+    monkeypatch.setattr(lambda_handler, "POLL_INTERVAL", 0)
+
+    autoscaling = boto3.client("autoscaling", region_name="eu-west-2")
+    stubber = Stubber(autoscaling)
+    stubber.add_response(
+        "start_instance_refresh",
+        {"InstanceRefreshId": "refresh-1"},
+        {
+            "AutoScalingGroupName": "app-asg",
+            "Strategy": "Rolling",
+            "Preferences": {
+                "MinHealthyPercentage": 90,
+                "InstanceWarmup": 300,
+                "CheckpointPercentages": [50, 100],
+                "CheckpointDelay": 3600,
+            },
+        },
+    )
+    for status, percentage in (("InProgress", 50), ("Successful", 100)):
+        stubber.add_response(
+            "describe_instance_refreshes",
+            {
+                "InstanceRefreshes": [
+                    {
+                        "InstanceRefreshId": "refresh-1",
+                        "Status": status,
+                        "PercentageComplete": percentage,
+                    }
+                ]
+            },
+        )
+    lambda_handler.CLIENTS[("autoscaling", "eu-west-2")] = autoscaling
+
+    event = {
+        "manifest": [
+            {
+                "ami_name": "RHEL-8*",
+                "region": "eu-west-2",
+                "parameter": "IMAGE/RHEL8/LATEST/AMI_ID",
+                "auto_scaling_groups": ["app-asg"],
+            }
+        ]
+    }
+
+    with stubber:
+        response = lambda_handler.lambda_handler(event, FakeContext())
+        stubber.assert_no_pending_responses()
+
+    refresh = response["results"][0]["instance_refreshes"][0]
+    assert refresh["status"] == "Successful"
+    assert refresh["percentage_complete"] == 100
+
+
+def test_poll_instance_refreshes_budget(monkeypatch):
+    """
+    Test to ensure that polling stops once its budget is spent, well before
+    the function timeout, leaving an unfinished refresh reported as such.
+    """
+
+    monkeypatch.setattr(lambda_handler, "POLL_INTERVAL", 0)
+    monkeypatch.setattr(lambda_handler, "POLL_BUDGET", 0)
+
+    autoscaling = boto3.client("autoscaling", region_name="eu-west-2")
+    stubber = Stubber(autoscaling)
+    stubber.add_response(
+        "describe_instance_refreshes",
+        {
+            "InstanceRefreshes": [
+                {
+                    "InstanceRefreshId": "refresh-1",
+                    "Status": "InProgress",
+                    "PercentageComplete": 10,
+                }
+            ]
+        },
+    )
+    lambda_handler.CLIENTS[("autoscaling", "eu-west-2")] = autoscaling
+
+    refreshes = [
+        {
+            "group": "app-asg",
+            "region": "eu-west-2",
+            "refresh_id": "refresh-1",
+            "status": "Pending",
+            "percentage_complete": None,
+        }
+    ]
+
+    with stubber:
+        lambda_handler.poll_instance_refreshes(refreshes, FakeContext())
+        stubber.assert_no_pending_responses()
+
+    assert refreshes[0]["status"] == "InProgress"
+    assert refreshes[0]["percentage_complete"] == 10
+
+
+def test_creation_date_patterns():
+    """
+    Test to ensure that the creation-date filter covers every day since the
+    watermark, coarsening to months and then giving up as the gap grows.
+    """
+
+    today = date(2024, 3, 2)
+
+    assert lambda_handler.creation_date_patterns(
+        "2024-02-28T10:00:00.000Z", today
+    ) == ["2024-02-28*", "2024-02-29*", "2024-03-01*", "2024-03-02*"]
+    assert lambda_handler.creation_date_patterns(
+        "2022-01-15T10:00:00.000Z", today
+    ) == [
+        f"{year}-{month:02d}-*"
+        for year in (2022, 2023)
+        for month in range(1, 13)
+    ] + [
+        "2024-01-*",
+        "2024-02-*",
+        "2024-03-*",
+    ]
+    assert lambda_handler.creation_date_patterns("2000-01-01", today) is None
+    assert lambda_handler.creation_date_patterns("2025-01-01", today) is None
+    assert lambda_handler.creation_date_patterns("garbage", today) is None
+
+
+def test_lambda_handler_incremental(aws, capsys):
+    """
+    Test to ensure that once a watermark is stored, later runs only scan the
+    images created since, and that an unusable watermark falls back to a
+    full scan.
+    """
+
+    today = datetime.now(timezone.utc)
+    add_image(
+        "ami-00000000000000001",
+        "RHEL-8.9",
+        f"{today - timedelta(days=400):%Y-%m-%d}T00:00:00.000Z",
+    )
+    add_image(
+        "ami-00000000000000002",
+        "RHEL-8.9",
+        f"{today - timedelta(days=2):%Y-%m-%d}T00:00:00.000Z",
+    )
+
+    lambda_handler.lambda_handler({}, None)
+    capsys.readouterr()
+
+    add_image(
+        "ami-00000000000000003",
+        "RHEL-8.9",
+        f"{today:%Y-%m-%d}T00:00:00.000Z",
+    )
+
+    response = lambda_handler.lambda_handler({}, None)
+    document = json.loads(capsys.readouterr().out.splitlines()[-1])
+
+    assert response["results"][0]["ami_id"] == "ami-00000000000000003"
+    assert document["IncrementalScans"] == [1]
+    assert document["ImagesScanned"] == [2]
+
+    ssm = boto3.client("ssm", region_name="eu-west-2")
+    ssm.put_parameter(
+        Name="/test/IMAGE/RHEL8/LATEST/AMI_ID_WATERMARK",
+        Value="garbage",
+        Type="String",
+        Overwrite=True,
+    )
+
+    lambda_handler.lambda_handler({}, None)
+    document = json.loads(capsys.readouterr().out.splitlines()[-1])
+
+    assert document["FullScans"] == [1]
+    assert document["ImagesScanned"] == [3]
+    watermark = ssm.get_parameter(
+        Name="/test/IMAGE/RHEL8/LATEST/AMI_ID_WATERMARK"
+    )
+    assert watermark["Parameter"]["Value"].startswith(f"{today:%Y-%m-%d}")
@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+
+"""
+Deploy the stacks of a CDK app in dependency waves.
+
+The app is synthesised for the environment, and the stack dependencies it
+declares with add_dependency are read back from the cloud assembly. Stacks
+are deployed a wave at a time, each wave holding the stacks whose
+dependencies have all been deployed, with up to --concurrency stacks of a
+wave in flight. The bootstrap stack is only deployed when its template or
+parameters have changed since the last run.
+
+Before deploying, the assembly is compared with the assembly of the last
+successful deploy from this machine, and the deploy is stopped if it would
+replace a stateful or capacity-bearing resource which is not allowed with
+--allow-replacement.
+
+Run from the cdk directory:
+python -m shared.deploy -a deploy -e dev -t app -s two-tier-app
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import boto3
+from botocore.exceptions import ClientError
+
+from shared.replacement import check_replacements
+from shared.synth import synth
+
+CDK_DIR = Path(__file__).resolve().parents[1]
+BOOTSTRAP_DIR = CDK_DIR / "bootstrap"
+BOOTSTRAP_TEMPLATE = BOOTSTRAP_DIR / "bootstrap-template.yaml"
+BOOTSTRAP_HASH_TAG = "bootstrap-template-hash"
+
+REGION = "eu-west-2"
+PROFILES = {
+    "dev": "{INSERT_AWS_PROFILE}",
+    "uat": "{INSERT_AWS_PROFILE}",
+    "prod": "{INSERT_AWS_PROFILE}",
+}
+
+# The largest template CloudFormation accepts inline, rather than from S3.
+TEMPLATE_BODY_LIMIT = 51200
+CAPABILITIES = [
+    "CAPABILITY_IAM",
+    "CAPABILITY_NAMED_IAM",
+    "CAPABILITY_AUTO_EXPAND",
+]
+COMPLETE = ("CREATE_COMPLETE", "UPDATE_COMPLETE")
+
+
+def load_stacks(assembly_dir):
+    """
+    A function to read the stacks of a cloud assembly and the stacks each
+    depends on.
+
+    :param assembly_dir: The directory of the cloud assembly
+    :return: The stacks, by artifact ID
+    """
+
+    with open(Path(assembly_dir) / "manifest.json", encoding="utf8") as fp:
+        artifacts = json.load(fp)["artifacts"]
+
+    stack_ids = {
+        artifact_id
+        for artifact_id, artifact in artifacts.items()
+        if artifact["type"] == "aws:cloudformation:stack"
+    }
+
+    return {
+        artifact_id: {
+            "stack_name": artifacts[artifact_id]["properties"].get(
+                "stackName", artifact_id
+            ),
+            "template_file": artifacts[artifact_id]["properties"][
+                "templateFile"
+            ],
+            "tags": artifacts[artifact_id]["properties"].get("tags", {}),
+            "dependencies": sorted(
+                set(artifacts[artifact_id].get("dependencies", [])) & stack_ids
+            ),
+        }
+        for artifact_id in sorted(stack_ids)
+    }
+
+
+def deployment_waves(dependencies):
+    """
+    A function to group stacks into waves, each holding the stacks whose
+    dependencies are all in earlier waves.
+
+    :param dependencies: The stacks each stack depends on, by stack
+    :return: A list of waves, each a sorted list of stacks
+    """
+
+    remaining = {stack: set(deps) for stack, deps in dependencies.items()}
+    deployed = set()
+    waves = []
+
+    while remaining:
+        wave = sorted(
+            stack for stack, deps in remaining.items() if deps <= deployed
+        )
+        if not wave:
+            raise ValueError(
+                f"The stack dependencies contain a cycle: {sorted(remaining)}"
+            )
+        waves.append(wave)
+        deployed.update(wave)
+        for stack in wave:
+            del remaining[stack]
+
+    return waves
+
+
+def run_waves(waves, action, concurrency):
+    """
+    A function to run an action on every stack, a wave at a time.
+
+    A wave always runs to completion, but no further wave is started once a
+    stack has failed.
+
+    :param waves: The waves of stacks
+    :param action: A callable taking a stack and returning its status
+    :param concurrency: The most stacks of a wave to run at once
+    :return: The results of the stacks, in the order they were run
+    """
+
+    results = []
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for index, wave in enumerate(waves, 1):
+            print(f">> Wave {index}/{len(waves)}: {', '.join(wave)}")
+
+            def timed(stack):
+                started = time.perf_counter()
+                try:
+                    status, error = action(stack), None
+                except Exception as err:  # pylint: disable=broad-except
+                    status, error = "FAILED", str(err)
+                return {
+                    "stack": stack,
+                    "wave": index,
+                    "status": status,
+                    "error": error,
+                    "seconds": round(time.perf_counter() - started, 1),
+                }
+
+            wave_results = list(executor.map(timed, wave))
+            results.extend(wave_results)
+
+            for result in wave_results:
+                print(
+                    f">> {result['stack']}: {result['status']} "
+                    f"({result['seconds']}s)"
+                    + (f" - {result['error']}" if result["error"] else "")
+                )
+
+            if any(result["error"] for result in wave_results):
+                print(">> Stopping, as a stack in this wave failed.")
+                break
+
+    return results
+
+
+def bootstrap_hash(template_file, params_file):
+    """
+    A function to hash the bootstrap template and its parameters.
+
+    :param template_file: The path of the bootstrap template
+    :param params_file: The path of the parameters file
+    :return: The hex digest
+    """
+
+    digest = hashlib.sha256(Path(template_file).read_bytes())
+    digest.update(Path(params_file).read_bytes())
+
+    return digest.hexdigest()
+
+
+class CloudFormationDeployer:
+    """
+    A class to deploy templates straight to CloudFormation.
+
+    Used for the bootstrap stack, and as a stack backend against a local
+    CloudFormation stand-in such as moto or LocalStack. It deploys the
+    synthesised templates only and does not publish file assets, which the
+    cdk backend does.
+    """
+
+    def __init__(self, session, endpoint_url=None, delay=10):
+        self.cloudformation = session.client(
+            "cloudformation", endpoint_url=endpoint_url
+        )
+        self.delay = delay
+
+    def stack_status(self, stack_name):
+        """
+        A function to describe a stack.
+
+        :param stack_name: The name of the stack
+        :return: The stack, or None when it does not exist
+        """
+
+        try:
+            return self.cloudformation.describe_stacks(StackName=stack_name)[
+                "Stacks"
+            ][0]
+        except ClientError as err:
+            if "does not exist" in err.response["Error"]["Message"]:
+                return None
+            raise
+
+    def deploy(self, stack_name, template_body, tags=None, parameters=None):
+        """
+        A function to create or update a stack and wait for it to finish.
+
+        :param stack_name: The name of the stack
+        :param template_body: The template
+        :param tags: The stack tags
+        :param parameters: The stack parameters
+        :return: The final stack status, or NO_CHANGES
+        """
+
+        if len(template_body.encode("utf8")) > TEMPLATE_BODY_LIMIT:
+            raise ValueError(
+                f"The template of {stack_name} is too large to deploy inline, "
+                f"use the cdk backend to publish it as an asset."
+            )
+
+        request = {
+            "StackName": stack_name,
+            "TemplateBody": template_body,
+            "Parameters": parameters or [],
+            "Tags": [
+                {"Key": key, "Value": value}
+                for key, value in (tags or {}).items()
+            ],
+            "Capabilities": CAPABILITIES,
+        }
+
+        if self.stack_status(stack_name) is None:
+            self.cloudformation.create_stack(**request)
+            waiter = "stack_create_complete"
+        else:
+            try:
+                self.cloudformation.update_stack(**request)
+            except ClientError as err:
+                if "No updates are to be performed" in str(err):
+                    return "NO_CHANGES"
+                raise
+            waiter = "stack_update_complete"
+
+        self.cloudformation.get_waiter(waiter).wait(
+            StackName=stack_name,
+            WaiterConfig={"Delay": self.delay, "MaxAttempts": 360},
+        )
+
+        return self.stack_status(stack_name)["StackStatus"]
+
+    def destroy(self, stack_name):
+        """
+        A function to delete a stack and wait for it to be deleted.
+
+        :param stack_name: The name of the stack
+        :return: DELETE_COMPLETE
+        """
+
+        self.cloudformation.delete_stack(StackName=stack_name)
+        self.cloudformation.get_waiter("stack_delete_complete").wait(
+            StackName=stack_name,
+            WaiterConfig={"Delay": self.delay, "MaxAttempts": 360},
+        )
+
+        return "DELETE_COMPLETE"
+
+    def deploy_stack(self, assembly_dir, stack):
+        """
+        A function to deploy a synthesised stack of a cloud assembly.
+
+        :param assembly_dir: The directory of the cloud assembly
+        :param stack: The stack, as returned by load_stacks
+        :return: The final stack status
+        """
+
+        template = (Path(assembly_dir) / stack["template_file"]).read_text(
+            encoding="utf8"
+        )
+
+        return self.deploy(stack["stack_name"], template, stack["tags"])
+
+    def bootstrap(self, stack_name, template_file, params_file):
+        """
+        A function to deploy the bootstrap stack, unless the hash of its
+        template and parameters matches the tag left by the last deploy.
+
+        :param stack_name: The name of the bootstrap stack
+        :param template_file: The path of the bootstrap template
+        :param params_file: The path of the parameters file
+        :return: SKIPPED, or the final stack status
+        """
+
+        template_hash = bootstrap_hash(template_file, params_file)
+        current = self.stack_status(stack_name)
+
+        if current and current["StackStatus"] in COMPLETE:
+            tags = {tag["Key"]: tag["Value"] for tag in current.get("Tags", [])}
+            if tags.get(BOOTSTRAP_HASH_TAG) == template_hash:
+                return "SKIPPED"
+
+        with open(params_file, encoding="utf8") as fp:
+            parameters = json.load(fp)
+
+        return self.deploy(
+            stack_name,
+            Path(template_file).read_text(encoding="utf8"),
+            {BOOTSTRAP_HASH_TAG: template_hash},
+            parameters,
+        )
+
+
+class CdkDeployer:
+    """
+    A class to deploy the stacks of a cloud assembly one at a time with the
+    CDK CLI, which publishes their assets first.
+    """
+
+    def __init__(self, profile, cdk="cdk"):
+        self.profile = profile
+        self.cdk = cdk
+
+    def run(self, action, assembly_dir, stack_ids, *args):
+        subprocess.run(
+            [
+                self.cdk,
+                action,
+                "--app",
+                str(assembly_dir),
+                "--profile",
+                self.profile,
+                *args,
+                *stack_ids,
+            ],
+            check=True,
+        )
+
+    def deploy_stack(self, assembly_dir, stack_id):
+        self.run(
+            "deploy",
+            assembly_dir,
+            [stack_id],
+            "--exclusively",
+            "--require-approval",
+            "never",
+        )
+        return "DEPLOYED"
+
+    def destroy_stack(self, assembly_dir, stack_id):
+        self.run(
+            "destroy", assembly_dir, [stack_id], "--exclusively", "--force"
+        )
+        return "DESTROYED"
+
+
+def synth_problem(result, profile):
+    """
+    A function to report why a synthesised assembly cannot be deployed.
+
+    Either the app failed, or it made context lookups, such as the VPC and
+    hosted zone lookups, which are not cached in cdk.context.json. The
+    assembly is then built on the dummy values CDK returns for them, and
+    each parallel cdk deploy would make the lookups itself, racing to write
+    cdk.context.json, so they are made once with cdk synth instead.
+
+    :param result: The result of the environment from shared.synth
+    :param profile: The AWS profile of the environment
+    :return: The problem, or None if the assembly can be deployed
+    """
+
+    if result["error"]:
+        return result["error"]
+    if result["missing"]:
+        return (
+            f"Missing context, run CDK_ENVIRONMENT={result['environment']} "
+            f"cdk synth --profile {profile} once in the app directory to "
+            f"look up and cache: {', '.join(result['missing'])}"
+        )
+
+    return None
+
+
+def pipeline_environment():
+    """
+    Set the tag values the apps read from the pipeline, as local_deploy.sh
+    did, unless they are already set.
+    """
+
+    def git(*args):
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=False
+        ).stdout.strip()
+
+    os.environ.setdefault("PIPELINE_RUN_ID", "run_manually")
+    os.environ.setdefault("BRANCH_NAME", git("symbolic-ref", "--short", "HEAD"))
+    os.environ.setdefault("COMMIT_ID", git("rev-parse", "--verify", "HEAD"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-a", "--action", default="deploy")
+    parser.add_argument(
+        "-e", "--environment", required=True, choices=sorted(PROFILES)
+    )
+    parser.add_argument(
+        "-t", "--type", dest="stack_type", choices=["app", "shared"]
+    )
+    parser.add_argument("-s", "--stack", required=True, help="The CDK app")
+    parser.add_argument("--profile", help="Defaults to the environment's")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--backend", choices=["cdk", "cloudformation"], default="cdk"
+    )
+    parser.add_argument(
+        "--endpoint-url", help="A local CloudFormation stand-in to deploy to"
+    )
+    parser.add_argument(
+        "--skip-bootstrap", action="store_true", help="Never deploy bootstrap"
+    )
+    parser.add_argument(
+        "--baseline",
+        help="The deployed cloud assembly to check for replacements against, "
+        "defaults to the assembly of the last successful deploy",
+    )
+    parser.add_argument(
+        "--allow-replacement",
+        action="append",
+        default=[],
+        help='A "stack/logical ID" pattern allowed to be replaced',
+    )
+    parser.add_argument("--report", help="A path to write the results to")
+    args = parser.parse_args()
+
+    profile = args.profile or PROFILES[args.environment]
+    app_dir = CDK_DIR / ("shared" if args.stack_type == "shared" else "apps")
+    app_dir = app_dir / args.stack
+
+    pipeline_environment()
+    session = boto3.Session(profile_name=profile, region_name=REGION)
+    cloudformation = CloudFormationDeployer(session, args.endpoint_url)
+
+    if not args.skip_bootstrap:
+        print(">> Checking the CDK bootstrap stack")
+        status = cloudformation.bootstrap(
+            f"{profile[:7]}-CDKToolkit-{{INSERT_APP_NAME}}",
+            BOOTSTRAP_TEMPLATE,
+            BOOTSTRAP_DIR / f"{args.environment}-params.json",
+        )
+        print(f">> Bootstrap: {status}")
+
+    print(f">> Synthesising {args.stack} for {args.environment}")
+    (result,), _ = synth(app_dir, [args.environment])
+    problem = synth_problem(result, profile)
+    if problem:
+        print(problem)
+        sys.exit(1)
+    assembly_dir = Path(result["outdir"])
+    baseline = Path(
+        args.baseline or app_dir / "cdk.out" / "deployed" / args.environment
+    )
+
+    if args.action == "deploy" and (baseline / "manifest.json").exists():
+        print(f">> Checking for replacements against {baseline}")
+        if check_replacements(baseline, assembly_dir, args.allow_replacement):
+            sys.exit(1)
+
+    stacks = load_stacks(assembly_dir)
+    waves = deployment_waves(
+        {stack_id: stack["dependencies"] for stack_id, stack in stacks.items()}
+    )
+
+    if args.backend == "cdk":
+        deployer = CdkDeployer(profile)
+        deploy = lambda stack_id: deployer.deploy_stack(  # noqa: E731
+            assembly_dir, stack_id
+        )
+        destroy = lambda stack_id: deployer.destroy_stack(  # noqa: E731
+            assembly_dir, stack_id
+        )
+    else:
+        deploy = lambda stack_id: cloudformation.deploy_stack(  # noqa: E731
+            assembly_dir, stacks[stack_id]
+        )
+        destroy = lambda stack_id: cloudformation.destroy(  # noqa: E731
+            stacks[stack_id]["stack_name"]
+        )
+
+    if args.action == "deploy":
+        results = run_waves(waves, deploy, args.concurrency)
+    elif args.action == "destroy":
+        results = run_waves(waves[::-1], destroy, args.concurrency)
+    else:
+        CdkDeployer(profile).run(args.action, assembly_dir, ["--all"])
+        results = []
+
+    if args.report:
+        with open(args.report, "w", encoding="utf8") as fp:
+            json.dump({"waves": waves, "results": results}, fp, indent=2)
+
+    failed = any(result["error"] for result in results)
+
+    """
+    The assembly becomes the baseline of the next deploy only once every
+    stack of it has been deployed.
+    """
+
+    if args.action == "deploy" and not failed and not args.baseline:
+        shutil.rmtree(baseline, ignore_errors=True)
+        shutil.copytree(assembly_dir, baseline)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
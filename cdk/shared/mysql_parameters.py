@@ -0,0 +1,142 @@
+""" MySQL parameters tuned to the memory and vCPUs of an RDS instance class """
+
+GIB = 1024**3
+MIB = 1024**2
+
+# The vCPUs of each size of the instance families below.
+SIZES = {
+    "large": 2,
+    "xlarge": 4,
+    "2xlarge": 8,
+    "4xlarge": 16,
+    "8xlarge": 32,
+    "12xlarge": 48,
+    "16xlarge": 64,
+}
+
+# The GiB of memory per vCPU of each general purpose and memory optimised
+# instance family.
+MEMORY_PER_VCPU = {
+    "m5": 4,
+    "m6g": 4,
+    "m6i": 4,
+    "m7g": 4,
+    "r4": 7.625,
+    "r5": 8,
+    "r6g": 8,
+    "r6i": 8,
+    "r7g": 8,
+}
+
+# The memory in GiB and the vCPUs of each instance type, as RDS names them
+# without the "db." prefix.
+INSTANCE_CLASSES = {
+    **{
+        f"{family}.{size}": (memory * vcpus, vcpus)
+        for family, memory in MEMORY_PER_VCPU.items()
+        for size, vcpus in SIZES.items()
+    },
+    **{
+        f"{family}.{size}": resources
+        for family in ("t3", "t4g")
+        for size, resources in {
+            "micro": (1, 2),
+            "small": (2, 2),
+            "medium": (4, 2),
+            "large": (8, 2),
+            "xlarge": (16, 4),
+            "2xlarge": (32, 8),
+        }.items()
+    },
+}
+
+# The memory RDS budgets per connection in its default max_connections.
+CONNECTION_MEMORY = 12582880
+MAX_CONNECTIONS = 16000
+
+# InnoDB sizes its buffer pool in chunks of this size per instance.
+BUFFER_POOL_CHUNK = 128 * MIB
+
+# The parameters sized to an instance, which Aurora sets on each instance
+# from its capacity units and does not accept on the cluster.
+INSTANCE_PARAMETERS = (
+    "innodb_buffer_pool_size",
+    "innodb_buffer_pool_instances",
+    "max_connections",
+    "innodb_io_capacity",
+    "innodb_io_capacity_max",
+    "table_open_cache",
+    "table_open_cache_instances",
+)
+
+SLOW_LOG = {
+    "slow_query_log": "1",
+    "long_query_time": "1",
+    "log_output": "FILE",
+    "log_slow_admin_statements": "1",
+}
+
+
+def instance_resources(instance_type):
+    """
+    A function to look up the memory and vCPUs of an instance type.
+
+    :param instance_type: The instance type, such as "r5.large"
+    :return: A tuple of the memory in bytes and the vCPUs
+    """
+
+    instance_type = instance_type.removeprefix("db.")
+    if instance_type not in INSTANCE_CLASSES:
+        raise ValueError(
+            f"No memory and vCPUs are known for the instance type "
+            f"{instance_type!r}, add it to INSTANCE_CLASSES"
+        )
+    memory, vcpus = INSTANCE_CLASSES[instance_type]
+
+    return int(memory * GIB), vcpus
+
+
+def tuned_parameters(instance_type, overrides=None, iops=None):
+    """
+    A function to derive the MySQL parameters of an instance class.
+
+    The buffer pool takes three quarters of the memory, or half on
+    instances under 4 GiB, leaving the rest to connections and the OS.
+    max_connections follows the RDS formula for the memory, and the table
+    cache instances scale with the vCPUs. The I/O capacity is half the IOPS
+    of the storage, up to all of it when flushing falls behind, or scales
+    with the vCPUs when the IOPS are not known. The slow query log records
+    statements taking over a second.
+
+    :param instance_type: The instance type, such as "r5.large"
+    :param overrides: Parameters replacing or adding to the derived ones
+    :param iops: The IOPS the storage sustains
+    :return: The parameters, as strings
+    """
+
+    memory, vcpus = instance_resources(instance_type)
+
+    buffer_pool = memory * 3 // 4 if memory >= 4 * GIB else memory // 2
+    buffer_pool_instances = min(max(buffer_pool // GIB, 1), 64)
+    chunk = BUFFER_POOL_CHUNK * buffer_pool_instances
+    buffer_pool = max(buffer_pool // chunk, 1) * chunk
+    max_connections = min(memory // CONNECTION_MEMORY, MAX_CONNECTIONS)
+    if iops:
+        io_capacity, io_capacity_max = max(iops // 2, 100), max(iops, 200)
+    else:
+        io_capacity = min(max(200 * vcpus, 200), 2000)
+        io_capacity_max = io_capacity * 2
+
+    parameters = {
+        "innodb_buffer_pool_size": buffer_pool,
+        "innodb_buffer_pool_instances": buffer_pool_instances,
+        "max_connections": max_connections,
+        "innodb_io_capacity": io_capacity,
+        "innodb_io_capacity_max": io_capacity_max,
+        "table_open_cache": min(max(max_connections * 2, 4000), 16384),
+        "table_open_cache_instances": min(vcpus, 16),
+        **SLOW_LOG,
+        **(overrides or {}),
+    }
+
+    return {key: str(value) for key, value in parameters.items()}
@@ -0,0 +1,194 @@
+""" A publish/consume pair of JSON-encoded SSM parameter bundles """
+
+import json
+
+import aws_cdk as cdk
+from aws_cdk import aws_ssm as ssm
+from constructs import Construct
+
+# The most characters a standard tier SSM parameter value can hold.
+MAX_VALUE_LENGTH = 4096
+
+# The characters a token is counted at until it is resolved at deploy time,
+# those of a long ARN.
+TOKEN_LENGTH = 256
+
+
+class ParameterBundle(Construct):
+    """
+    A class to publish the values a stack shares with other stacks as a
+    single JSON-encoded SSM parameter, rather than one parameter per value.
+
+    Values may be strings, including tokens such as ARNs and refs, or
+    non-empty lists of strings, e.g. subnet IDs. Lists are encoded as JSON
+    arrays, so they are read back as lists rather than a joined string.
+    Consumers cut values out of the JSON at deploy time, so a string may not
+    hold a quote or backslash.
+
+    The legacy_keys are also published as a parameter of their own, named
+    "<parameter_name>/<key>" with the logical ID "SSM-Parameter-<key>" in
+    the stack, as they were before bundles. Readers of those names keep
+    working while they move to the bundle, and CloudFormation updates the
+    parameters in place rather than recreating them under a new logical ID.
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        parameter_name: str,
+        values: dict,
+        description: str = None,
+        legacy_keys: tuple = (),
+    ) -> None:
+
+        super().__init__(scope, construct_id)
+
+        items = {}
+        for key, value in values.items():
+            if not (
+                isinstance(value, str)
+                or (
+                    isinstance(value, (list, tuple))
+                    and all(isinstance(item, str) for item in value)
+                )
+            ):
+                raise TypeError(
+                    f"The value of {key} in the {parameter_name} bundle must "
+                    f"be a string or a list of strings, not "
+                    f"{type(value).__name__}"
+                )
+            if not value:
+                raise ValueError(
+                    f"The value of {key} in the {parameter_name} bundle is "
+                    f"empty, leave the key out instead"
+                )
+            items[key] = [value] if isinstance(value, str) else list(value)
+            if any('"' in item or "\\" in item for item in items[key]):
+                raise ValueError(
+                    f"The value of {key} in the {parameter_name} bundle "
+                    f"holds a quote or backslash, which cannot be read back "
+                    f"at deploy time"
+                )
+
+        """
+        The tokens are only resolved at deploy time, so the length of the
+        value is estimated with each counted at TOKEN_LENGTH.
+        """
+
+        length = len(
+            json.dumps(
+                {
+                    key: [
+                        "x" * (len(item) + TOKEN_LENGTH)
+                        if cdk.Token.is_unresolved(item)
+                        else item
+                        for item in key_items
+                    ]
+                    for key, key_items in items.items()
+                },
+                separators=(",", ":"),
+            )
+        )
+        if length > MAX_VALUE_LENGTH:
+            raise ValueError(
+                f"The {parameter_name} bundle may be up to {length} "
+                f"characters, over the {MAX_VALUE_LENGTH} an SSM parameter "
+                f"holds, split it into several bundles"
+            )
+
+        self.parameter_name = parameter_name
+        self.parameter = ssm.StringParameter(
+            self,
+            "Parameter",
+            parameter_name=parameter_name,
+            description=description,
+            string_value=cdk.Stack.of(self).to_json_string(
+                {key: values[key] for key in sorted(values)}
+            ),
+        )
+
+        self.legacy_parameters = {}
+        for key in legacy_keys:
+            props = {
+                "parameter_name": f"{parameter_name}/{key}",
+                "description": description,
+            }
+            self.legacy_parameters[key] = (
+                ssm.StringParameter(
+                    scope,
+                    f"SSM-Parameter-{key}",
+                    string_value=values[key],
+                    **props,
+                )
+                if isinstance(values[key], str)
+                else ssm.StringListParameter(
+                    scope,
+                    f"SSM-Parameter-{key}",
+                    string_list_value=list(values[key]),
+                    **props,
+                )
+            )
+
+    @staticmethod
+    def from_parameter_name(scope: Construct, parameter_name: str):
+        """
+        A function to read a bundle published by another stack.
+
+        The parameter is read at deploy time, through a single template
+        parameter however many of its values are used, so the values are
+        those of the last deploy of the publishing stack, which has to be
+        deployed first. A key the bundle does not have fails the deploy.
+
+        :param scope: The construct reading the bundle
+        :param parameter_name: The name of the bundle's SSM parameter
+        :return: A BundleValues
+        """
+
+        return BundleValues(
+            parameter_name,
+            ssm.StringParameter.value_for_string_parameter(
+                scope, parameter_name
+            ),
+        )
+
+
+class BundleValues:
+    """
+    A class to represent the values of a bundle read by ParameterBundle.
+
+    CloudFormation cannot parse JSON, so each value is cut out of the
+    bundle with Fn::Split and Fn::Select, between its key and the closing
+    quote or bracket.
+    """
+
+    __slots__ = ("parameter_name", "value")
+
+    def __init__(self, parameter_name, value):
+        self.parameter_name = parameter_name
+        self.value = value
+
+    def _after(self, key, opening):
+        return cdk.Fn.select(1, cdk.Fn.split(f'"{key}":{opening}', self.value))
+
+    def get(self, key):
+        """
+        A function to read a string value of the bundle.
+
+        :param key: The key of the value
+        :return: The value, as a token
+        """
+
+        return cdk.Fn.select(0, cdk.Fn.split('"', self._after(key, '"')))
+
+    def get_list(self, key):
+        """
+        A function to read a list value of the bundle.
+
+        :param key: The key of the value
+        :return: The list of values, as a token
+        """
+
+        return cdk.Fn.split(
+            '","', cdk.Fn.select(0, cdk.Fn.split('"]', self._after(key, '["')))
+        )
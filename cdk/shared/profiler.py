@@ -0,0 +1,218 @@
+""" An opt-in profiler of stack construction and synthesis """
+
+import json
+import os
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+import aws_cdk as cdk
+
+# Set CDK_PROFILE=true, or pass "-c profile=true" to cdk synth, to profile.
+PROFILE_ENV = "CDK_PROFILE"
+PROFILE_CONTEXT = "profile"
+
+REPORT_FILE = "synth-profile.json"
+FOLDED_FILE = "synth-profile.folded"
+
+
+class KernelCalls:
+    """
+    A context manager to count every request sent to the jsii kernel, i.e.
+    every round trip between Python and the Node process, by wrapping the
+    private _NodeProcess.send for as long as it is open. The count carries
+    on across reopening it.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._send = None
+
+    def __enter__(self):
+        from jsii._kernel.providers.process import _NodeProcess
+
+        send = self._send = _NodeProcess.send
+        counter = self
+
+        def counted_send(process, request, response_type):
+            counter.count += 1
+            return send(process, request, response_type)
+
+        _NodeProcess.send = counted_send
+        return self
+
+    def __exit__(self, *args):
+        from jsii._kernel.providers.process import _NodeProcess
+
+        _NodeProcess.send = self._send
+        self._send = None
+
+
+class SynthProfiler:
+    """
+    A class to record the wall time and jsii calls of each stack's
+    construction and of app.synth(), along with the construct count and
+    template size of each stack.
+
+    When profiling is not enabled every method is a no-op, so app.py can
+    wrap its stacks unconditionally. When it is, jsii calls are counted from
+    the first profiled phase until report(), or the end of a with block.
+    """
+
+    def __init__(self, app, enabled):
+        self.app = app
+        self.enabled = enabled
+        self.phases = []
+        self._kernel_calls = KernelCalls()
+        self._counting = None
+
+    @property
+    def calls(self):
+        return self._kernel_calls.count
+
+    def __enter__(self):
+        self._start_counting()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop_counting()
+
+    @classmethod
+    def for_app(cls, app):
+        """
+        A function to create the profiler of an app, enabled by the
+        CDK_PROFILE environment variable or the "profile" context flag.
+
+        :param app: The cdk.App
+        :return: A SynthProfiler
+        """
+
+        enabled = str(os.getenv(PROFILE_ENV, "")).lower() in ("1", "true")
+        enabled = enabled or str(
+            app.node.try_get_context(PROFILE_CONTEXT)
+        ).lower() in ("1", "true")
+
+        return cls(app, enabled)
+
+    def _start_counting(self):
+        if self.enabled and self._counting is None:
+            self._counting = ExitStack()
+            self._counting.enter_context(self._kernel_calls)
+
+    def _stop_counting(self):
+        if self._counting is not None:
+            self._counting.close()
+            self._counting = None
+
+    def _stacks(self):
+        return {
+            child.node.id: child
+            for child in self.app.node.children
+            if cdk.Stack.is_stack(child)
+        }
+
+    @contextmanager
+    def stack(self, name):
+        """
+        A context manager to profile the construction of a stack.
+
+        :param name: The name of the stack in the report
+        """
+
+        if not self.enabled:
+            yield
+            return
+
+        before = set(self._stacks())
+        with self._phase(name, "stack") as phase:
+            yield
+        phase["stacks"] = sorted(set(self._stacks()) - before)
+
+    @contextmanager
+    def synth(self):
+        """
+        A context manager to profile app.synth(), where aspects such as tags
+        are applied and the templates are written.
+        """
+
+        if not self.enabled:
+            yield
+            return
+
+        with self._phase("synth", "synth"):
+            yield
+
+    @contextmanager
+    def _phase(self, name, kind):
+        self._start_counting()
+        phase = {"name": name, "kind": kind}
+        calls = self.calls
+        started = time.perf_counter()
+        try:
+            yield phase
+        finally:
+            phase["seconds"] = round(time.perf_counter() - started, 4)
+            phase["jsii_calls"] = self.calls - calls
+            self.phases.append(phase)
+
+    def report(self, assembly):
+        """
+        A function to write the profile next to the synthesised templates, as
+        JSON and in the folded format read by flamegraph.pl and speedscope.
+        jsii calls are no longer counted once the report is written.
+
+        :param assembly: The CloudAssembly returned by app.synth()
+        :return: The report, or None when profiling is not enabled
+        """
+
+        if not self.enabled:
+            return None
+
+        self._stop_counting()
+        stacks = self._stacks()
+        outdir = Path(assembly.directory)
+
+        for phase in self.phases:
+            for construct_id in phase.pop("stacks", []):
+                stack = stacks[construct_id]
+                phase.setdefault("stack_names", []).append(stack.stack_name)
+                phase["constructs"] = phase.get("constructs", 0) + len(
+                    stack.node.find_all()
+                )
+                phase["template_bytes"] = phase.get(
+                    "template_bytes", 0
+                ) + os.path.getsize(outdir / stack.template_file)
+
+        report = {
+            "seconds": round(sum(p["seconds"] for p in self.phases), 4),
+            "jsii_calls": sum(p["jsii_calls"] for p in self.phases),
+            "phases": self.phases,
+        }
+
+        with open(outdir / REPORT_FILE, "w", encoding="utf8") as fp:
+            json.dump(report, fp, indent=2)
+
+        with open(outdir / FOLDED_FILE, "w", encoding="utf8") as fp:
+            for phase in self.phases:
+                fp.write(
+                    f"app;{phase['kind']};{phase['name']} "
+                    f"{round(phase['seconds'] * 1000000)}\n"
+                )
+
+        for phase in sorted(
+            self.phases, key=lambda p: p["seconds"], reverse=True
+        ):
+            print(
+                f">> {phase['name']:>14}: {phase['seconds']:.3f}s, "
+                f"{phase['jsii_calls']} jsii calls"
+                + (
+                    f", {phase['constructs']} constructs, "
+                    f"{phase['template_bytes']} template bytes"
+                    if "constructs" in phase
+                    else ""
+                ),
+                file=sys.stderr,
+            )
+
+        return report
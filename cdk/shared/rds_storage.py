@@ -0,0 +1,137 @@
+""" The storage types, sizes and IOPS RDS accepts for an instance """
+
+STORAGE_TYPES = ("gp2", "gp3", "io1")
+
+# The GiB of storage each storage type can be allocated.
+SIZE_LIMITS = {"gp2": (20, 65536), "gp3": (20, 65536), "io1": (100, 65536)}
+
+# The GiB of gp3 storage from which IOPS and throughput can be provisioned
+# above the baseline, by engine, as listed under "gp3 storage" in the
+# "Amazon RDS DB instance storage" page of the RDS User Guide.
+GP3_THRESHOLDS = {"mariadb": 400, "mysql": 400, "oracle": 200, "postgres": 400}
+
+# The IOPS and MiB/s of gp3 storage below and above the engine's threshold,
+# and the range either can be provisioned in above it.
+GP3_BASELINE = (3000, 125)
+GP3_PROVISIONED_BASELINE = (12000, 500)
+GP3_IOPS = (12000, 64000)
+GP3_THROUGHPUT = (500, 4000)
+GP3_THROUGHPUT_PER_IOPS = 0.25
+GP3_IOPS_PER_GB = 500
+
+IO1_IOPS = (1000, 256000)
+IO1_IOPS_PER_GB = (0.5, 50)
+
+# gp2 earns 3 IOPS per GiB, from 100 to 16000.
+GP2_IOPS_PER_GB = 3
+GP2_IOPS = (100, 16000)
+
+
+def validate_storage(
+    engine, storage_type, allocated_gb, iops=None, throughput=None
+):
+    """
+    A function to check a storage profile against the limits RDS applies.
+
+    :param engine: The engine, such as "mysql"
+    :param storage_type: One of STORAGE_TYPES
+    :param allocated_gb: The GiB of storage allocated
+    :param iops: The provisioned IOPS, if any
+    :param throughput: The provisioned throughput in MiB/s, if any
+    :return: A list of errors, empty when the profile is valid
+    """
+
+    if engine not in GP3_THRESHOLDS:
+        return [
+            f"engine must be one of {', '.join(GP3_THRESHOLDS)}, not "
+            f"{engine!r}"
+        ]
+    if storage_type not in STORAGE_TYPES:
+        return [
+            f"type must be one of {', '.join(STORAGE_TYPES)}, not "
+            f"{storage_type!r}"
+        ]
+
+    errors = []
+    low, high = SIZE_LIMITS[storage_type]
+    if not low <= allocated_gb <= high:
+        errors.append(
+            f"allocated_gb must be from {low} to {high} for {storage_type}"
+        )
+
+    if storage_type == "gp2":
+        if iops is not None or throughput is not None:
+            errors.append("gp2 storage cannot have iops or throughput set")
+
+    elif storage_type == "io1":
+        if throughput is not None:
+            errors.append("io1 storage cannot have throughput set")
+        if iops is None:
+            errors.append("io1 storage must have iops set")
+        else:
+            low, high = IO1_IOPS
+            if not low <= iops <= high:
+                errors.append(f"iops must be from {low} to {high} for io1")
+            low, high = IO1_IOPS_PER_GB
+            if not low <= iops / allocated_gb <= high:
+                errors.append(
+                    f"iops must be from {low} to {high} per GiB of io1 "
+                    f"storage, not {iops / allocated_gb:g}"
+                )
+
+    elif allocated_gb < GP3_THRESHOLDS[engine]:
+        if iops is not None or throughput is not None:
+            errors.append(
+                f"gp3 storage under {GP3_THRESHOLDS[engine]} GiB for {engine} "
+                f"has a fixed baseline, and cannot have iops or throughput set"
+            )
+
+    else:
+        if iops is not None:
+            low, high = GP3_IOPS
+            if not low <= iops <= high:
+                errors.append(f"iops must be from {low} to {high} for gp3")
+            if iops / allocated_gb > GP3_IOPS_PER_GB:
+                errors.append(
+                    f"iops must be at most {GP3_IOPS_PER_GB} per GiB of gp3 "
+                    f"storage, not {iops / allocated_gb:g}"
+                )
+        if throughput is not None:
+            low, high = GP3_THROUGHPUT
+            if not low <= throughput <= high:
+                errors.append(
+                    f"throughput must be from {low} to {high} MiB/s for gp3"
+                )
+        if (
+            throughput is not None
+            and throughput
+            > (iops or GP3_PROVISIONED_BASELINE[0]) * GP3_THROUGHPUT_PER_IOPS
+        ):
+            errors.append(
+                f"throughput must be at most {GP3_THROUGHPUT_PER_IOPS} MiB/s "
+                f"per IOPS for gp3"
+            )
+
+    return errors
+
+
+def storage_iops(engine, storage_type, allocated_gb, iops=None):
+    """
+    A function to find the IOPS a storage profile sustains.
+
+    :param engine: The engine, such as "mysql"
+    :param storage_type: One of STORAGE_TYPES
+    :param allocated_gb: The GiB of storage allocated
+    :param iops: The provisioned IOPS, if any
+    :return: The IOPS
+    """
+
+    if iops is not None:
+        return iops
+    if storage_type == "gp2":
+        low, high = GP2_IOPS
+        return min(max(allocated_gb * GP2_IOPS_PER_GB, low), high)
+    if allocated_gb < GP3_THRESHOLDS[engine]:
+        return GP3_BASELINE[0]
+
+    return GP3_PROVISIONED_BASELINE[0]
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+"""
+Classify the changes between two synthesised cloud assemblies.
+
+Every resource of every stack is compared by its logical ID, and each
+changed property is classified as in-place, interruption or replacement
+from the property behaviour table bundled in replacement_behaviour.json.
+A resource whose logical ID has changed is removed and created afresh, so
+a removed resource counts as a replacement, unless the template budget
+merged it into an identical policy of the same stack. Replacing or removing
+a stateful or capacity-bearing resource is blocked unless it is allowed.
+
+Run from the cdk directory:
+python -m shared.replacement old/cdk.out new/cdk.out --allow "Stack/Id"
+"""
+
+import argparse
+import fnmatch
+import json
+import sys
+from pathlib import Path
+
+from shared.template_budget import MERGED_METADATA
+
+BEHAVIOUR_FILE = Path(__file__).resolve().parent / "replacement_behaviour.json"
+
+# The impacts of a change, from least to most disruptive.
+IMPACTS = ("none", "in-place", "unknown", "interruption", "replacement")
+
+# The attributes of a resource which only change how CloudFormation handles
+# it, rather than the resource itself.
+IN_PLACE_ATTRIBUTES = (
+    "CreationPolicy",
+    "DeletionPolicy",
+    "DependsOn",
+    "Metadata",
+    "UpdatePolicy",
+    "UpdateReplacePolicy",
+)
+
+
+def load_behaviour(behaviour_file=BEHAVIOUR_FILE):
+    """
+    A function to load the property behaviour table.
+
+    :param behaviour_file: The path of the JSON table
+    :return: The behaviour of each resource type, by type
+    """
+
+    with open(behaviour_file, encoding="utf8") as fp:
+        return json.load(fp)
+
+
+def load_templates(assembly_dir):
+    """
+    A function to read the template of each stack of a cloud assembly.
+
+    :param assembly_dir: The directory of the cloud assembly
+    :return: The templates, by stack artifact ID
+    """
+
+    assembly_dir = Path(assembly_dir)
+    with open(assembly_dir / "manifest.json", encoding="utf8") as fp:
+        artifacts = json.load(fp)["artifacts"]
+
+    templates = {}
+    for artifact_id, artifact in sorted(artifacts.items()):
+        if artifact["type"] != "aws:cloudformation:stack":
+            continue
+        with open(
+            assembly_dir / artifact["properties"]["templateFile"],
+            encoding="utf8",
+        ) as fp:
+            templates[artifact_id] = json.load(fp)
+
+    return templates
+
+
+def classify_property(behaviour, resource_type, prop):
+    """
+    A function to classify a change of one property.
+
+    Properties of a type in the table which it does not list update in
+    place. Nothing is known of the properties of types outside the table.
+
+    :param behaviour: The property behaviour table
+    :param resource_type: The CloudFormation resource type
+    :param prop: The name of the top level property
+    :return: The impact of the change
+    """
+
+    if resource_type not in behaviour:
+        return "unknown"
+    if prop in behaviour[resource_type].get("replacement", []):
+        return "replacement"
+    if prop in behaviour[resource_type].get("interruption", []):
+        return "interruption"
+
+    return "in-place"
+
+
+def _worst(impacts):
+    return max(impacts, key=IMPACTS.index, default="none")
+
+
+def compare_resource(behaviour, old, new):
+    """
+    A function to classify the changes to a resource kept under the same
+    logical ID.
+
+    :param behaviour: The property behaviour table
+    :param old: The resource in the old template
+    :param new: The resource in the new template
+    :return: A tuple of the impact and the changed properties with theirs
+    """
+
+    if old["Type"] != new["Type"]:
+        return "replacement", {"Type": "replacement"}
+
+    changes = {}
+    old_props = old.get("Properties", {})
+    new_props = new.get("Properties", {})
+    for prop in sorted(set(old_props) | set(new_props)):
+        if old_props.get(prop) != new_props.get(prop):
+            changes[prop] = classify_property(behaviour, new["Type"], prop)
+
+    for attribute in sorted((set(old) | set(new)) - {"Type", "Properties"}):
+        if old.get(attribute) != new.get(attribute):
+            changes[attribute] = (
+                "in-place" if attribute in IN_PLACE_ATTRIBUTES else "unknown"
+            )
+
+    return _worst(changes.values()), changes
+
+
+def compare_assemblies(old_templates, new_templates, behaviour):
+    """
+    A function to classify every changed resource between two assemblies.
+
+    :param old_templates: The old templates, by stack artifact ID
+    :param new_templates: The new templates, by stack artifact ID
+    :param behaviour: The property behaviour table
+    :return: A list of changes, each a dict of the stack, logical ID, type,
+        action, impact, changed properties and whether the type is stateful
+        or capacity-bearing
+    """
+
+    changes = []
+    for stack in sorted(set(old_templates) | set(new_templates)):
+        old_resources = old_templates.get(stack, {}).get("Resources", {})
+        new_resources = new_templates.get(stack, {}).get("Resources", {})
+        merged = (
+            new_templates.get(stack, {})
+            .get("Metadata", {})
+            .get(MERGED_METADATA, {})
+        )
+
+        for logical_id in sorted(set(old_resources) | set(new_resources)):
+            old = old_resources.get(logical_id)
+            new = new_resources.get(logical_id)
+
+            if old is None:
+                action, impact, properties = "add", "none", {}
+            elif new is None and merged.get(logical_id) in new_resources:
+                action, impact, properties = "merge", "in-place", {}
+            elif new is None:
+                action, impact, properties = "remove", "replacement", {}
+            else:
+                impact, properties = compare_resource(behaviour, old, new)
+                if not properties:
+                    continue
+                action = "modify"
+
+            resource_type = (new or old)["Type"]
+            flags = behaviour.get(resource_type, {})
+            changes.append(
+                {
+                    "stack": stack,
+                    "logical_id": logical_id,
+                    "type": resource_type,
+                    "action": action,
+                    "impact": impact,
+                    "properties": properties,
+                    "protected": bool(
+                        flags.get("stateful") or flags.get("capacity")
+                    ),
+                }
+            )
+
+    return changes
+
+
+def blocked_changes(changes, allow=()):
+    """
+    A function to find the replacements and removals of stateful or
+    capacity-bearing resources which have not been allowed.
+
+    :param changes: The changes, as returned by compare_assemblies
+    :param allow: Patterns of "stack/logical ID" allowed to be replaced,
+        matched with fnmatch
+    :return: The blocked changes
+    """
+
+    return [
+        change
+        for change in changes
+        if change["protected"]
+        and change["impact"] == "replacement"
+        and not any(
+            fnmatch.fnmatchcase(
+                f"{change['stack']}/{change['logical_id']}", pattern
+            )
+            for pattern in allow
+        )
+    ]
+
+
+def print_changes(changes, blocked):
+    """
+    Print each change with its impact, marking those which are blocked.
+    """
+
+    blocked_ids = {
+        (change["stack"], change["logical_id"]) for change in blocked
+    }
+
+    for change in changes:
+        properties = ", ".join(
+            f"{prop} ({impact})"
+            for prop, impact in change["properties"].items()
+        )
+        marker = (
+            "BLOCKED "
+            if (change["stack"], change["logical_id"]) in blocked_ids
+            else ""
+        )
+        print(
+            f">> {marker}{change['stack']}/{change['logical_id']} "
+            f"[{change['type']}]: {change['action']}, {change['impact']}"
+            + (f" - {properties}" if properties else "")
+        )
+
+    print(
+        f">> {len(changes)} resources changed, "
+        f"{sum(change['impact'] == 'replacement' for change in changes)} "
+        f"replaced or removed, {len(blocked)} blocked"
+    )
+
+
+def check_replacements(old_assembly, new_assembly, allow=(), report=None):
+    """
+    A function to compare two assemblies, print the changes and return
+    those which are blocked.
+
+    :param old_assembly: The directory of the deployed cloud assembly
+    :param new_assembly: The directory of the cloud assembly to deploy
+    :param allow: Patterns of "stack/logical ID" allowed to be replaced
+    :param report: A path to write the changes to as JSON
+    :return: The blocked changes
+    """
+
+    changes = compare_assemblies(
+        load_templates(old_assembly),
+        load_templates(new_assembly),
+        load_behaviour(),
+    )
+    blocked = blocked_changes(changes, allow)
+    print_changes(changes, blocked)
+
+    if report:
+        with open(report, "w", encoding="utf8") as fp:
+            json.dump({"changes": changes, "blocked": blocked}, fp, indent=2)
+
+    if blocked:
+        print(
+            ">> Allow an intended replacement with --allow "
+            '"<stack>/<logical ID>"'
+        )
+
+    return blocked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("old", help="The deployed cloud assembly")
+    parser.add_argument("new", help="The cloud assembly to deploy")
+    parser.add_argument(
+        "--allow",
+        action="append",
+        default=[],
+        help='A "stack/logical ID" pattern allowed to be replaced',
+    )
+    parser.add_argument("--report", help="A path to write the changes to")
+    args = parser.parse_args()
+
+    blocked = check_replacements(args.old, args.new, args.allow, args.report)
+    sys.exit(1 if blocked else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Synthesise several environments of a CDK app in parallel.
+
+Each environment is synthesised in its own process, with CDK_ENVIRONMENT set,
+into its own cloud assembly under cdk.out/<environment>. The assemblies can
+then be deployed with "cdk deploy --app cdk.out/<environment>".
+
+Run from the cdk directory:
+python -m shared.synth apps/two-tier-app --environments dev uat prod
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import runpy
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ENVIRONMENTS = ("dev", "uat", "prod")
+
+
+def app_context(app_dir):
+    """
+    A function to build the context the CDK CLI would pass to the app, from
+    the "context" of cdk.json and the cached lookups in cdk.context.json.
+
+    :param app_dir: The directory of the app
+    :return: The context dict
+    """
+
+    context = {}
+
+    for path, key in (
+        (app_dir / "cdk.json", "context"),
+        (app_dir / "cdk.context.json", None),
+    ):
+        if path.exists():
+            with open(path, encoding="utf8") as fp:
+                values = json.load(fp)
+            context.update(values.get(key, {}) if key else values)
+
+    return context
+
+
+def synth_environment(app_dir, environment, outdir, context):
+    """
+    A function to synthesise one environment of an app, run in a worker
+    process.
+
+    app.py reads CDK_ENVIRONMENT, and cdk.App reads CDK_OUTDIR and
+    CDK_CONTEXT_JSON, when they are created, so each worker sets them before
+    running the app.
+
+    :param app_dir: The directory of the app
+    :param environment: The environment to synthesise
+    :param outdir: The directory of the cloud assembly
+    :param context: The context to pass to the app
+    :return: The result of the environment
+    """
+
+    started = time.perf_counter()
+    result = {
+        "environment": environment,
+        "outdir": str(outdir),
+        "stacks": [],
+        "missing": [],
+        "error": None,
+    }
+
+    os.chdir(app_dir)
+    sys.path.insert(0, str(app_dir))
+    os.environ.update(
+        {
+            "CDK_ENVIRONMENT": environment,
+            "CDK_OUTDIR": str(outdir),
+            "CDK_CONTEXT_JSON": json.dumps(context),
+        }
+    )
+
+    try:
+        runpy.run_path(str(app_dir / "app.py"), run_name="__main__")
+    except Exception:
+        result["error"] = traceback.format_exc(limit=-3)
+    else:
+        with open(outdir / "manifest.json", encoding="utf8") as fp:
+            manifest = json.load(fp)
+
+        result["stacks"] = [
+            name
+            for name, artifact in manifest.get("artifacts", {}).items()
+            if artifact["type"] == "aws:cloudformation:stack"
+        ]
+        result["missing"] = [
+            missing["key"] for missing in manifest.get("missing", [])
+        ]
+
+    result["seconds"] = round(time.perf_counter() - started, 2)
+
+    return result
+
+
+def synth(
+    app_dir, environments, output="cdk.out", max_workers=None, context=None
+):
+    """
+    A function to synthesise environments of an app in a process pool.
+
+    Workers are spawned rather than forked, so none inherits the jsii kernel
+    of another.
+
+    :param app_dir: The directory of the app
+    :param environments: The environments to synthesise
+    :param output: The directory of the assemblies, relative to the app
+    :param max_workers: The size of the pool, defaulting to one per
+        environment
+    :param context: The context to pass to the app, defaulting to that of
+        its cdk.json and cdk.context.json
+    :return: A tuple of the results per environment and the total seconds
+    """
+
+    app_dir = Path(app_dir).resolve()
+    context = app_context(app_dir) if context is None else context
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers or len(environments),
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        results = list(
+            executor.map(
+                synth_environment,
+                [app_dir] * len(environments),
+                environments,
+                [app_dir / output / env for env in environments],
+                [context] * len(environments),
+            )
+        )
+
+    return results, round(time.perf_counter() - started, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("app", help="The directory of the app")
+    parser.add_argument(
+        "--environments",
+        nargs="+",
+        choices=ENVIRONMENTS,
+        default=list(ENVIRONMENTS),
+    )
+    parser.add_argument("--max-workers", type=int)
+    parser.add_argument(
+        "--report", help="An optional path to write the results to as JSON"
+    )
+    args = parser.parse_args()
+
+    results, total = synth(
+        args.app, args.environments, max_workers=args.max_workers
+    )
+
+    for result in results:
+        status = "failed" if result["error"] else "ok"
+        print(
+            f"{result['environment']:>6}: {status}, {result['seconds']}s, "
+            f"{len(result['stacks'])} stacks -> {result['outdir']}"
+        )
+        if result["missing"]:
+            print(
+                f"        missing context, run cdk synth once to look up: "
+                f"{', '.join(result['missing'])}"
+            )
+        if result["error"]:
+            print(result["error"])
+
+    print(
+        f" total: {total}s wall, "
+        f"{round(sum(r['seconds'] for r in results), 2)}s across environments"
+    )
+
+    if args.report:
+        with open(args.report, "w", encoding="utf8") as fp:
+            json.dump({"results": results, "seconds": total}, fp, indent=2)
+
+    sys.exit(1 if any(result["error"] for result in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+""" A content-hash cache of synthesised stack templates """
+
+import dataclasses
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+from importlib import metadata
+from pathlib import Path
+from typing import Mapping
+
+# Set CDK_SYNTH_CACHE=true, or pass "-c synth_cache=true" to cdk synth, to
+# reuse the templates of unchanged stacks.
+CACHE_ENV = "CDK_SYNTH_CACHE"
+CACHE_CONTEXT = "synth_cache"
+CACHE_DIR = ".synth-cache"
+CACHE_MAX_MB = int(os.getenv("CDK_SYNTH_CACHE_MB", "200"))
+
+ENTRY_FILE = "entry.json"
+
+# The directory of the apps and of the shared modules they import.
+SOURCE_DIR = Path(__file__).resolve().parents[1]
+
+
+def _canonical(value):
+    """
+    A function to turn the configuration into plain JSON types, so that it
+    can be hashed.
+    """
+
+    if dataclasses.is_dataclass(value):
+        return {
+            field.name: _canonical(getattr(value, field.name))
+            for field in dataclasses.fields(value)
+        }
+    if isinstance(value, Mapping):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def _local_modules(source_dirs, exclude):
+    """
+    A function to list the source files of the loaded modules that live
+    under the source directories, e.g. shared.parameter_bundle, so that an
+    edit of a module a stack imports changes its fingerprint.
+    """
+
+    paths = set()
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if not path or not path.endswith(".py"):
+            continue
+        path = Path(path).resolve()
+        if (
+            path not in exclude
+            and "site-packages" not in path.parts
+            and any(source_dir in path.parents for source_dir in source_dirs)
+        ):
+            paths.add(path)
+
+    return paths
+
+
+def _hash_files(digest, paths):
+    for path in sorted(paths):
+        digest.update(str(path.name).encode("utf8"))
+        digest.update(path.read_bytes())
+
+
+class SynthCache:
+    """
+    A class to skip the construction of stacks whose inputs are unchanged,
+    reusing their template and asset manifest from a previous synth.
+
+    A stack's fingerprint covers:
+    - its source module and the non-Python files beside it, e.g. user data
+    - every other loaded module under the source directories, such as the
+      config module and the shared modules the stacks import
+    - the resolved configuration and the whole context, including the cached
+      lookups and feature flags
+    - the tags applied at synth, and the aws-cdk-lib version
+    - the fingerprints of the stacks it depends on, whose exports it may
+      reference
+
+    When caching is not enabled every stack is built and the assembly is left
+    untouched.
+    """
+
+    def __init__(
+        self,
+        app,
+        enabled,
+        cache_dir=CACHE_DIR,
+        max_mb=CACHE_MAX_MB,
+        source_dirs=(SOURCE_DIR,),
+    ):
+        self.app = app
+        self.enabled = enabled
+        self.cache_dir = Path(cache_dir)
+        self.source_dirs = [Path(path).resolve() for path in source_dirs]
+        self.max_bytes = max_mb * 1024 * 1024
+        self.fingerprints = {}
+        self.depends_on = {}
+        self.cached = set()
+
+    @classmethod
+    def for_app(cls, app):
+        """
+        A function to create the cache of an app, enabled by the
+        CDK_SYNTH_CACHE environment variable or the "synth_cache" context
+        flag.
+
+        :param app: The cdk.App
+        :return: A SynthCache
+        """
+
+        enabled = str(os.getenv(CACHE_ENV, "")).lower() in ("1", "true")
+        enabled = enabled or str(
+            app.node.try_get_context(CACHE_CONTEXT)
+        ).lower() in ("1", "true")
+
+        return cls(app, enabled)
+
+    def plan(self, stacks, config, tags, depends_on, built_from):
+        """
+        A function to decide which stacks need to be constructed.
+
+        A stack is built when its fingerprint is not cached, along with every
+        stack whose constructs it is built from.
+
+        :param stacks: The stack classes, by name, in construction order
+        :param config: The resolved configuration of the app
+        :param tags: The tags applied to every stack
+        :param depends_on: The stacks each stack depends on, by name
+        :param built_from: The stacks each stack takes constructs from, by
+            name
+        :return: The set of stack names to construct
+        """
+
+        self.depends_on = depends_on
+
+        if not self.enabled:
+            return set(stacks)
+
+        sources = {
+            name: Path(inspect.getsourcefile(stack_class)).resolve()
+            for name, stack_class in stacks.items()
+        }
+
+        """
+        A stack's own module only changes its own fingerprint, any other
+        local module changes every fingerprint, as any stack may import it.
+        """
+
+        shared = hashlib.sha256(
+            json.dumps(
+                {
+                    "config": _canonical(config),
+                    "context": _canonical(self.app.node.get_all_context()),
+                    "tags": _canonical(tags),
+                    "aws-cdk-lib": metadata.version("aws-cdk-lib"),
+                },
+                sort_keys=True,
+                default=str,
+            ).encode("utf8")
+        )
+        _hash_files(
+            shared,
+            _local_modules(self.source_dirs, set(sources.values())),
+        )
+        shared = shared.hexdigest()
+
+        for name, source in sources.items():
+            digest = hashlib.sha256(f"{name}:{shared}".encode("utf8"))
+            _hash_files(
+                digest,
+                [source]
+                + [
+                    path
+                    for path in source.parent.rglob("*")
+                    if path.is_file()
+                    and path.suffix not in (".py", ".pyc")
+                    and "__pycache__" not in path.parts
+                ],
+            )
+            for dependency in sorted(
+                set(depends_on.get(name, [])) | set(built_from.get(name, []))
+            ):
+                digest.update(self.fingerprints[dependency].encode("utf8"))
+            self.fingerprints[name] = digest.hexdigest()
+
+        build = {
+            name
+            for name, fingerprint in self.fingerprints.items()
+            if not (self.cache_dir / fingerprint / ENTRY_FILE).exists()
+        }
+
+        """
+        Walk the stacks in reverse construction order, so that a stack built
+        from another pulls in that stack's own dependencies too.
+        """
+
+        for name in reversed(list(stacks)):
+            if name in build:
+                build.update(built_from.get(name, []))
+
+        self.cached = set(stacks) - build
+
+        return build
+
+    def update(self, assembly, built):
+        """
+        A function to store the stacks that were built and to add the cached
+        stacks to the assembly, as if they had been synthesised with it.
+
+        :param assembly: The CloudAssembly returned by app.synth()
+        :param built: The constructed stacks, by name
+        """
+
+        if not self.enabled:
+            return
+
+        outdir = Path(assembly.directory)
+        manifest_file = outdir / "manifest.json"
+        with open(manifest_file, encoding="utf8") as fp:
+            manifest = json.load(fp)
+
+        artifact_ids = {
+            name: stack.artifact_id for name, stack in built.items()
+        }
+
+        for name in self.cached:
+            entry_dir = self.cache_dir / self.fingerprints[name]
+            with open(entry_dir / ENTRY_FILE, encoding="utf8") as fp:
+                entry = json.load(fp)
+
+            for path in entry["files"]:
+                source = entry_dir / "files" / path
+                if source.is_dir():
+                    shutil.copytree(source, outdir / path, dirs_exist_ok=True)
+                else:
+                    shutil.copy2(source, outdir / path)
+
+            manifest["artifacts"].update(entry["artifacts"])
+            artifact_ids[name] = entry["artifact_id"]
+            os.utime(entry_dir / ENTRY_FILE)
+
+        """
+        A built stack loses its dependency on a cached stack, as the cached
+        stack was never constructed to add_dependency on.
+        """
+
+        for name in built:
+            dependencies = manifest["artifacts"][artifact_ids[name]].setdefault(
+                "dependencies", []
+            )
+            for dependency in self.depends_on.get(name, []):
+                if artifact_ids[dependency] not in dependencies:
+                    dependencies.append(artifact_ids[dependency])
+
+        """
+        Lookups that have not been cached yet are synthesised with dummy
+        values, so nothing is stored until they have been resolved.
+        """
+
+        if not manifest.get("missing"):
+            for name, stack in built.items():
+                self._store(name, stack.artifact_id, outdir, manifest)
+
+        with open(manifest_file, "w", encoding="utf8") as fp:
+            json.dump(manifest, fp, indent=2)
+
+        self._evict()
+
+    def _store(self, name, artifact_id, outdir, manifest):
+        """
+        Copy a stack's template, asset manifest and assets into the cache,
+        with its manifest artifacts.
+        """
+
+        artifacts = {
+            key: value
+            for key, value in manifest["artifacts"].items()
+            if key == artifact_id or key.startswith(f"{artifact_id}.")
+        }
+        files = [artifacts[artifact_id]["properties"]["templateFile"]]
+
+        for artifact in artifacts.values():
+            if artifact["type"] != "cdk:asset-manifest":
+                continue
+            files.append(artifact["properties"]["file"])
+            with open(
+                outdir / artifact["properties"]["file"], encoding="utf8"
+            ) as fp:
+                assets = json.load(fp)
+            for asset in [
+                *assets.get("files", {}).values(),
+                *assets.get("dockerImages", {}).values(),
+            ]:
+                path = asset["source"].get("path") or asset["source"].get(
+                    "directory"
+                )
+                if path and path not in files:
+                    files.append(path)
+
+        entry_dir = self.cache_dir / self.fingerprints[name]
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        (entry_dir / "files").mkdir(parents=True)
+
+        for path in files:
+            if (outdir / path).is_dir():
+                shutil.copytree(outdir / path, entry_dir / "files" / path)
+            else:
+                shutil.copy2(outdir / path, entry_dir / "files" / path)
+
+        with open(entry_dir / ENTRY_FILE, "w", encoding="utf8") as fp:
+            json.dump(
+                {
+                    "stack": name,
+                    "artifact_id": artifact_id,
+                    "artifacts": artifacts,
+                    "files": files,
+                },
+                fp,
+                indent=2,
+            )
+
+    def _evict(self):
+        """
+        Remove the least recently used entries until the cache is within its
+        size bound. The entry file of a cached stack is touched on every hit.
+        """
+
+        entries = []
+        for entry in self.cache_dir.glob(f"*/{ENTRY_FILE}"):
+            size = sum(
+                path.stat().st_size
+                for path in entry.parent.rglob("*")
+                if path.is_file()
+            )
+            entries.append((entry.stat().st_mtime, size, entry.parent))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
@@ -0,0 +1,136 @@
+""" Tagging of every stack in an app, with a report of its coverage """
+
+import functools
+import importlib
+import json
+import sys
+from pathlib import Path
+
+import aws_cdk as cdk
+
+REPORT_FILE = "tag-coverage.json"
+
+TAGGABLE = (cdk.ITaggable, cdk.ITaggableV2)
+
+
+def apply_tags(scope, tags):
+    """
+    A function to apply a map of tags to every taggable construct under a
+    scope, e.g. the app.
+
+    Each tag is added once at the scope, rather than once per stack. The
+    tags are applied by aspects that walk the tree inside the jsii kernel, as
+    a Python aspect would be called back across the kernel for every
+    construct. Tags without a value, e.g. an unset pipeline variable, are
+    not applied and are reported as missing by tag_coverage.
+
+    :param scope: The construct to tag
+    :param tags: The tags, by key
+    """
+
+    for key, value in tags.items():
+        if value is not None:
+            cdk.Tags.of(scope).add(key, value)
+
+
+@functools.lru_cache(maxsize=None)
+def _taggable(resource_type):
+    """
+    Find whether a CloudFormation resource type takes tags, from the L1
+    class that aws-cdk-lib generates for it.
+
+    :return: True or False, or None when the type has no L1 class
+    """
+
+    parts = resource_type.split("::")
+    if len(parts) != 3 or parts[0] != "AWS":
+        return None
+
+    try:
+        module = importlib.import_module(f"aws_cdk.aws_{parts[1].lower()}")
+    except ImportError:
+        return None
+
+    resource_class = getattr(module, f"Cfn{parts[2]}", None)
+    if resource_class is None:
+        return None
+
+    return any(
+        interface in TAGGABLE
+        for interface in getattr(resource_class, "__jsii_ifaces__", [])
+    )
+
+
+def _tag_keys(tags):
+    if isinstance(tags, dict):
+        return set(tags)
+    if isinstance(tags, list):
+        return {tag.get("Key") for tag in tags if isinstance(tag, dict)}
+    return set()
+
+
+def tag_coverage(assembly, required):
+    """
+    A function to report the taggable resources of an assembly that are
+    missing a required tag.
+
+    The synthesised templates are read, so that the report includes any tag
+    removed or overridden after it was applied.
+
+    :param assembly: The CloudAssembly returned by app.synth()
+    :param required: The keys of the tags every resource should have
+    :return: The report
+    """
+
+    outdir = Path(assembly.directory)
+    with open(outdir / "manifest.json", encoding="utf8") as fp:
+        artifacts = json.load(fp)["artifacts"]
+
+    required = sorted(required)
+    taggable = 0
+    missing = []
+
+    for artifact_id, artifact in sorted(artifacts.items()):
+        if artifact["type"] != "aws:cloudformation:stack":
+            continue
+
+        with open(
+            outdir / artifact["properties"]["templateFile"], encoding="utf8"
+        ) as fp:
+            resources = json.load(fp).get("Resources", {})
+
+        for logical_id, resource in resources.items():
+            tags = resource.get("Properties", {}).get("Tags")
+            if not (_taggable(resource["Type"]) or tags is not None):
+                continue
+
+            taggable += 1
+            absent = [key for key in required if key not in _tag_keys(tags)]
+            if absent:
+                missing.append(
+                    {
+                        "stack": artifact_id,
+                        "logical_id": logical_id,
+                        "type": resource["Type"],
+                        "missing": absent,
+                    }
+                )
+
+    report = {"required": required, "taggable": taggable, "missing": missing}
+
+    with open(outdir / REPORT_FILE, "w", encoding="utf8") as fp:
+        json.dump(report, fp, indent=2)
+
+    print(
+        f">> Tag coverage: {taggable - len(missing)} of {taggable} taggable "
+        f"resources have every required tag",
+        file=sys.stderr,
+    )
+    for resource in missing:
+        print(
+            f">> {resource['stack']}/{resource['logical_id']} "
+            f"({resource['type']}) is missing {', '.join(resource['missing'])}",
+            file=sys.stderr,
+        )
+
+    return report
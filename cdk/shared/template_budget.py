@@ -0,0 +1,336 @@
+""" A post-synth size budget and minimiser of stack templates """
+
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+# Set in the context of cdk.json, e.g.
+# "template_budget": {"max_bytes": 51200, "stacks": {"Stack-Id": 102400}}
+BUDGET_CONTEXT = "template_budget"
+
+# The limit of a template uploaded to S3, as DefaultStackSynthesizer does.
+MAX_BYTES = 1048576
+
+# Metadata written for the CDK CLI and the console tree view, which
+# CloudFormation does not use. The CLI reads construct paths from the
+# manifest instead.
+DEAD_METADATA = ("aws:cdk:path",)
+DEAD_RESOURCES = ("AWS::CDK::Metadata",)
+
+# The policy resources which can be merged, and the properties listing what
+# each policy is attached to.
+MERGEABLE = {
+    "AWS::SNS::TopicPolicy": ("Topics",),
+    "AWS::SQS::QueuePolicy": ("Queues",),
+    "AWS::IAM::Policy": ("Roles", "Users", "Groups"),
+}
+
+# The template metadata recording the logical ID each merged policy was
+# merged into, which the replacement check reads so that a merged policy is
+# not reported as removed.
+MERGED_METADATA = "cdk:merged-policies"
+
+
+class TemplateBudgetError(ValueError):
+    """
+    A class to represent stack templates which are over their byte budget.
+    """
+
+    def __init__(self, over):
+        self.over = over
+        super().__init__(
+            "Stack templates over their byte budget: "
+            + ", ".join(
+                f"{stack} ({size} > {budget} bytes)"
+                for stack, size, budget in over
+            )
+        )
+
+
+def _dedupe_statements(value):
+    """
+    Remove statements repeated within a policy document, wherever one is
+    found in the template.
+    """
+
+    if isinstance(value, list):
+        return [_dedupe_statements(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+
+    value = {key: _dedupe_statements(item) for key, item in value.items()}
+    statements = value.get("Statement")
+    if "Version" in value and isinstance(statements, list):
+        seen = set()
+        value["Statement"] = []
+        for statement in statements:
+            key = json.dumps(statement, sort_keys=True)
+            if key not in seen:
+                seen.add(key)
+                value["Statement"].append(statement)
+
+    return value
+
+
+def _rename_references(value, renamed):
+    """
+    Point the Ref and Fn::GetAtt references of merged resources at the
+    resource they were merged into.
+    """
+
+    if isinstance(value, list):
+        return [_rename_references(item, renamed) for item in value]
+    if not isinstance(value, dict):
+        return value
+
+    value = {
+        key: _rename_references(item, renamed) for key, item in value.items()
+    }
+    if isinstance(value.get("Ref"), str):
+        value["Ref"] = renamed.get(value["Ref"], value["Ref"])
+    if isinstance(value.get("Fn::GetAtt"), list):
+        attribute = value["Fn::GetAtt"]
+        value["Fn::GetAtt"] = [renamed.get(attribute[0], attribute[0])]
+        value["Fn::GetAtt"] += attribute[1:]
+
+    return value
+
+
+def _merge_policies(resources):
+    """
+    Merge policy resources of one template whose documents and properties
+    are identical into one, attached to everything each of them was
+    attached to. The first of them in the template keeps its logical ID, so
+    a policy added later never takes the ID of one already deployed.
+
+    :return: The logical IDs of the merged resources, mapped to the logical
+        ID of the resource they were merged into
+    """
+
+    groups = {}
+    for logical_id in resources:
+        resource = resources[logical_id]
+        targets = MERGEABLE.get(resource["Type"])
+        if targets is None:
+            continue
+        key = json.dumps(
+            {
+                "Type": resource["Type"],
+                "Condition": resource.get("Condition"),
+                "Properties": {
+                    prop: value
+                    for prop, value in resource.get("Properties", {}).items()
+                    if prop not in targets and prop != "PolicyName"
+                },
+            },
+            sort_keys=True,
+        )
+        groups.setdefault(key, []).append(logical_id)
+
+    renamed = {}
+    for logical_ids in groups.values():
+        kept, *merged = logical_ids
+        if not merged:
+            continue
+        properties = resources[kept]["Properties"]
+        depends_on = resources[kept].get("DependsOn", [])
+        depends_on = [depends_on] if isinstance(depends_on, str) else depends_on
+
+        for logical_id in merged:
+            resource = resources.pop(logical_id)
+            for prop in MERGEABLE[resource["Type"]]:
+                for target in resource["Properties"].get(prop, []):
+                    if target not in properties.setdefault(prop, []):
+                        properties[prop].append(target)
+            extra = resource.get("DependsOn", [])
+            for dependency in [extra] if isinstance(extra, str) else extra:
+                if dependency not in depends_on:
+                    depends_on.append(dependency)
+            renamed[logical_id] = kept
+
+        if depends_on:
+            resources[kept]["DependsOn"] = depends_on
+
+    for resource in resources.values():
+        if "DependsOn" not in resource or not renamed:
+            continue
+        depends_on = resource["DependsOn"]
+        depends_on = [depends_on] if isinstance(depends_on, str) else depends_on
+        resource["DependsOn"] = list(
+            dict.fromkeys(renamed.get(item, item) for item in depends_on)
+        )
+
+    return renamed
+
+
+def minimise(template):
+    """
+    A function to minimise a template, without changing what is deployed
+    other than the number of policy resources. Only the policies within the
+    template are merged; identical policies in other stacks are not. The
+    merged logical IDs are recorded under the cdk:merged-policies template
+    metadata.
+
+    :param template: The template, as a dict
+    :return: The minimised template
+    """
+
+    resources = {
+        logical_id: resource
+        for logical_id, resource in template.get("Resources", {}).items()
+        if resource["Type"] not in DEAD_RESOURCES
+    }
+
+    for resource in resources.values():
+        metadata = resource.get("Metadata", {})
+        for key in DEAD_METADATA:
+            metadata.pop(key, None)
+        if "Metadata" in resource and not metadata:
+            del resource["Metadata"]
+
+    renamed = _merge_policies(resources)
+    template = _rename_references(
+        _dedupe_statements({**template, "Resources": resources}), renamed
+    )
+    if renamed:
+        template["Metadata"] = {
+            **template.get("Metadata", {}),
+            MERGED_METADATA: dict(sorted(renamed.items())),
+        }
+
+    """
+    The CDKMetadata resource is guarded by a condition of its own, which
+    nothing else uses once the resource is removed.
+    """
+
+    conditions = template.get("Conditions", {})
+    if "CDKMetadataAvailable" in conditions and "CDKMetadataAvailable" not in (
+        json.dumps(template["Resources"])
+    ):
+        del conditions["CDKMetadataAvailable"]
+        if not conditions:
+            del template["Conditions"]
+
+    return template
+
+
+class TemplateBudget:
+    """
+    A class to minimise the templates of a synthesised assembly and to fail
+    synth when a template is over its byte budget.
+
+    Each template is written back without its dead metadata, repeated policy
+    statements and duplicate policy resources, and without whitespace.
+    Duplicate policies are only merged within a template, not across stacks.
+    Its file asset hash is updated to match, so that cdk-assets uploads it
+    under a key of its new content.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, stacks=None, enabled=True):
+        self.max_bytes = max_bytes
+        self.stacks = stacks or {}
+        self.enabled = enabled
+
+    @classmethod
+    def for_app(cls, app):
+        """
+        A function to create the budget of an app from the "template_budget"
+        context, with "max_bytes" per stack, a "stacks" map of budgets by
+        stack artifact ID and an optional "minimise" flag.
+
+        :param app: The cdk.App
+        :return: A TemplateBudget
+        """
+
+        budget = app.node.try_get_context(BUDGET_CONTEXT) or {}
+
+        return cls(
+            int(budget.get("max_bytes", MAX_BYTES)),
+            {
+                key: int(value)
+                for key, value in budget.get("stacks", {}).items()
+            },
+            str(budget.get("minimise", True)).lower() in ("1", "true"),
+        )
+
+    def apply(self, assembly):
+        """
+        A function to minimise the templates of an assembly and check them
+        against their budgets.
+
+        :param assembly: The CloudAssembly returned by app.synth()
+        :return: The size of each template before and after, by artifact ID
+        """
+
+        outdir = Path(assembly.directory)
+        manifest_file = outdir / "manifest.json"
+        with open(manifest_file, encoding="utf8") as fp:
+            manifest = json.load(fp)
+
+        report = {}
+        for artifact_id, artifact in manifest["artifacts"].items():
+            if artifact["type"] != "aws:cloudformation:stack":
+                continue
+
+            template_file = outdir / artifact["properties"]["templateFile"]
+            before = template_file.read_bytes()
+            after = before
+
+            if self.enabled:
+                after = json.dumps(
+                    minimise(json.loads(before)), separators=(",", ":")
+                ).encode("utf8")
+                if after != before:
+                    template_file.write_bytes(after)
+                    self._rehash(outdir, manifest, artifact, before, after)
+
+            report[artifact_id] = {
+                "before": len(before),
+                "after": len(after),
+                "budget": self.stacks.get(artifact_id, self.max_bytes),
+            }
+
+        with open(manifest_file, "w", encoding="utf8") as fp:
+            json.dump(manifest, fp, indent=2)
+
+        for artifact_id, sizes in report.items():
+            print(
+                f">> {artifact_id}: {sizes['before']} -> {sizes['after']} "
+                f"template bytes, budget {sizes['budget']}",
+                file=sys.stderr,
+            )
+
+        over = [
+            (artifact_id, sizes["after"], sizes["budget"])
+            for artifact_id, sizes in report.items()
+            if sizes["after"] > sizes["budget"]
+        ]
+        if over:
+            raise TemplateBudgetError(over)
+
+        return report
+
+    @staticmethod
+    def _rehash(outdir, manifest, artifact, before, after):
+        """
+        Replace the hash of the old template with the hash of the new one in
+        the stack's asset manifest and template URL.
+        """
+
+        old = hashlib.sha256(before).hexdigest()
+        new = hashlib.sha256(after).hexdigest()
+
+        url = artifact["properties"].get("stackTemplateAssetObjectUrl", "")
+        artifact["properties"]["stackTemplateAssetObjectUrl"] = url.replace(
+            old, new
+        )
+
+        for dependency in artifact.get("dependencies", []):
+            asset_manifest = manifest["artifacts"].get(dependency, {})
+            if asset_manifest.get("type") != "cdk:asset-manifest":
+                continue
+            asset_file = outdir / asset_manifest["properties"]["file"]
+            text = asset_file.read_text(encoding="utf8")
+            if old in text:
+                asset_file.write_text(text.replace(old, new), encoding="utf8")
@@ -0,0 +1,203 @@
+""" A harness to synthesise the apps offline in their unit tests """
+
+import json
+import math
+import os
+import re
+from pathlib import Path
+
+from shared.synth import app_context, synth
+
+# Set UPDATE_SNAPSHOTS=true to write the snapshots and synth budget afresh.
+UPDATE_ENV = "UPDATE_SNAPSHOTS"
+
+# The values of the placeholders of the contexts, the rest being "example".
+PLACEHOLDERS = {
+    "{INSERT_AWS_ACCOUNT_ID}": "123456789012",
+    "{INSERT_VPC_ID}": "vpc-12345678",
+}
+
+# The pipeline variables the apps tag their stacks with.
+PIPELINE_ENV = {
+    "PIPELINE_RUN_ID": "1",
+    "ADO_PIPELINE_RUN_ID": "1",
+    "BRANCH_NAME": "main",
+    "COMMIT_ID": "0123456789abcdef",
+}
+
+# Asset hashes change with every edit of an asset's source, so they are
+# masked in the snapshots, as are the S3 keys of the assets.
+ASSET_HASH = re.compile(r"[0-9a-f]{64}")
+ASSET_KEYS = ("S3Key", "S3ObjectKey")
+ASSET_MASK = "<asset-hash>"
+
+
+def _updating():
+    return str(os.getenv(UPDATE_ENV, "")).lower() in ("1", "true")
+
+
+def normalise_template(template):
+    """
+    A function to mask the asset hashes and S3 keys of a template, so that
+    its snapshot does not change with the source of its assets.
+
+    :param template: The template, or any value within it
+    :return: A copy with the asset hashes and S3 keys masked
+    """
+
+    if isinstance(template, dict):
+        return {
+            key: ASSET_MASK
+            if key in ASSET_KEYS and isinstance(value, str)
+            else normalise_template(value)
+            for key, value in template.items()
+        }
+    if isinstance(template, list):
+        return [normalise_template(value) for value in template]
+    if isinstance(template, str):
+        return ASSET_HASH.sub(ASSET_MASK, template)
+
+    return template
+
+
+def fixture_context(app_dir, lookups_file=None, overrides=None):
+    """
+    A function to build the context of an app with its placeholders filled
+    in, and with the results of its lookups stubbed so that it synthesises
+    without AWS credentials.
+
+    :param app_dir: The directory of the app
+    :param lookups_file: A JSON file of lookup results, by context key
+    :param overrides: Top level context keys to replace
+    :return: The context dict
+    """
+
+    context = json.dumps(app_context(Path(app_dir)))
+    for placeholder, value in PLACEHOLDERS.items():
+        context = context.replace(placeholder, value)
+    context = json.loads(re.sub(r"\{[A-Z0-9_]+\}", "example", context))
+
+    if lookups_file:
+        with open(lookups_file, encoding="utf8") as fp:
+            context.update(json.load(fp))
+
+    context.update(overrides or {})
+
+    return context
+
+
+def synth_fixture(
+    app_dir, environment, outdir, lookups_file=None, overrides=None
+):
+    """
+    A function to synthesise an app from its fixture context, in a process
+    of its own, so that apps with modules of the same name do not collide.
+
+    :param app_dir: The directory of the app
+    :param environment: The environment to synthesise
+    :param outdir: The directory of the cloud assembly
+    :param lookups_file: A JSON file of lookup results, by context key
+    :param overrides: Top level context keys to replace
+    :return: A tuple of the synth result and the templates by stack
+    """
+
+    previous = {key: os.environ.get(key) for key in PIPELINE_ENV}
+    os.environ.update(PIPELINE_ENV)
+    try:
+        (result,), _ = synth(
+            Path(app_dir),
+            [environment],
+            output=Path(outdir),
+            context=fixture_context(app_dir, lookups_file, overrides),
+        )
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key)
+            else:
+                os.environ[key] = value
+
+    assert result["error"] is None, result["error"]
+    assert (
+        result["missing"] == []
+    ), f"Lookups missing from the fixture: {result['missing']}"
+
+    with open(Path(result["outdir"]) / "manifest.json", encoding="utf8") as fp:
+        artifacts = json.load(fp)["artifacts"]
+
+    templates = {}
+    for stack in result["stacks"]:
+        template_file = artifacts[stack]["properties"]["templateFile"]
+        with open(
+            Path(result["outdir"]) / template_file, encoding="utf8"
+        ) as fp:
+            templates[stack] = json.load(fp)
+
+    return result, templates
+
+
+def assert_snapshot(template, snapshot_file):
+    """
+    A function to compare a template with its snapshot, written afresh
+    when UPDATE_SNAPSHOTS is set. Asset hashes are masked in both. A missing
+    snapshot fails, rather than being recorded, so that a renamed or
+    deleted stack is not passed.
+
+    :param template: The template, as a dict
+    :param snapshot_file: The path of the snapshot
+    """
+
+    snapshot_file = Path(snapshot_file)
+    template = normalise_template(template)
+
+    if _updating():
+        snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(snapshot_file, "w", encoding="utf8") as fp:
+            json.dump(template, fp, indent=1, sort_keys=True)
+            fp.write("\n")
+
+    assert snapshot_file.exists(), (
+        f"snapshot missing: {snapshot_file.name}, set {UPDATE_ENV}=true to "
+        f"record it"
+    )
+
+    with open(snapshot_file, encoding="utf8") as fp:
+        snapshot = normalise_template(json.load(fp))
+
+    assert template == snapshot, (
+        f"The template differs from {snapshot_file.name}, set "
+        f"{UPDATE_ENV}=true to update the snapshot if the change is intended"
+    )
+
+
+def assert_synth_budget(seconds, budget_file, headroom=2):
+    """
+    A function to fail when synth took longer than the recorded budget.
+    With UPDATE_SNAPSHOTS set, the budget is recorded as the time taken
+    multiplied by the headroom.
+
+    :param seconds: The seconds synth took
+    :param budget_file: The path of the JSON budget
+    :param headroom: The multiple of the time taken to record
+    """
+
+    budget_file = Path(budget_file)
+
+    if _updating():
+        budget_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(budget_file, "w", encoding="utf8") as fp:
+            json.dump({"seconds": math.ceil(seconds * headroom)}, fp, indent=2)
+            fp.write("\n")
+
+    assert budget_file.exists(), (
+        f"synth budget missing: {budget_file.name}, set {UPDATE_ENV}=true to "
+        f"record it"
+    )
+
+    with open(budget_file, encoding="utf8") as fp:
+        budget = json.load(fp)["seconds"]
+
+    assert seconds <= budget, (
+        f"Synth took {seconds:.2f}s, over its budget of {budget}s in "
+        f"{budget_file.name}"
+    )
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+A benchmark of tagging an app of several thousand constructs.
+
+The benchmark builds a tree of stacks of SQS queues, applies the tag map of
+the apps in three ways and measures the synth wall time and the requests
+sent to the jsii kernel:
+
+- per stack: the previous cdk.Tags.of(stack).add per tag per stack
+- aspect: a single Python aspect setting every tag in one walk of the tree,
+  which is called back across the kernel for every construct
+- apply_tags: cdk.Tags.of(app).add once per tag, walked inside the kernel
+
+The coverage report is timed on the resulting assembly.
+
+Run from the cdk directory:
+python -m shared.tests.benchmark.benchmark_tagging --stacks 5 --queues 400
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import aws_cdk as cdk
+import jsii
+from aws_cdk import aws_sqs as sqs
+
+from shared.profiler import KernelCalls
+from shared.tagging import apply_tags, tag_coverage
+
+TAGS = {
+    "ado_pipeline_run_id": "1",
+    "branch_name": "main",
+    "caution": "Created with IaC - Do not modify on the console!",
+    "code": "https://github.com/donovan-said/aws-cdk-examples",
+    "commit_id": "0123456789abcdef",
+    "created_by": "cdk",
+    "environment": "dev",
+}
+
+
+@jsii.implements(cdk.IAspect)
+class TagAspect:
+    """
+    A single aspect setting the whole tag map on each taggable resource.
+    """
+
+    def __init__(self, tags):
+        self.tags = tags
+
+    def visit(self, node):
+        if isinstance(node, cdk.CfnResource) and hasattr(type(node), "tags"):
+            tag_manager = node.tags
+            for key, value in self.tags.items():
+                tag_manager.set_tag(key, value, 100, True)
+
+
+def per_stack(app, stacks):
+    for stack in stacks:
+        for key, value in TAGS.items():
+            cdk.Tags.of(stack).add(key, value)
+
+
+def aspect(app, stacks):
+    cdk.Aspects.of(app).add(TagAspect(TAGS))
+
+
+def app_wide(app, stacks):
+    apply_tags(app, TAGS)
+
+
+def measure(tagger, stack_count, queue_count):
+    """
+    A function to build the app, tag it and synthesise it.
+
+    :param tagger: The callable applying the tags
+    :param stack_count: The number of stacks
+    :param queue_count: The number of queues per stack
+    :return: A tuple of the seconds, jsii calls, constructs and assembly
+    """
+
+    app = cdk.App(outdir=tempfile.mkdtemp())
+    stacks = []
+    for stack_index in range(stack_count):
+        stack = cdk.Stack(app, f"Stack-{stack_index}")
+        for queue_index in range(queue_count):
+            sqs.Queue(stack, f"Queue-{queue_index}")
+        stacks.append(stack)
+
+    with KernelCalls() as calls:
+        started = time.perf_counter()
+        tagger(app, stacks)
+        assembly = app.synth()
+        elapsed = time.perf_counter() - started
+
+    return elapsed, calls.count, len(app.node.find_all()), assembly
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stacks", type=int, default=5)
+    parser.add_argument("--queues", type=int, default=400)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for label, tagger in (
+        ("per stack", per_stack),
+        ("aspect", aspect),
+        ("apply_tags", app_wide),
+    ):
+        timings = []
+        for _ in range(args.runs):
+            elapsed, calls, constructs, assembly = measure(
+                tagger, args.stacks, args.queues
+            )
+            timings.append(elapsed)
+        print(
+            f"{label:>10}: {statistics.median(timings):.2f}s median tag and "
+            f"synth, {calls} jsii calls, {constructs} constructs"
+        )
+
+    started = time.perf_counter()
+    report = tag_coverage(assembly, TAGS)
+    print(
+        f"{'coverage':>10}: {time.perf_counter() - started:.2f}s for "
+        f"{report['taggable']} taggable resources"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+A collection of tests which synthesise the stacks of the shared apps
+offline, from their fixture context.
+
+The templates are compared with the snapshots in tests/unit/snapshots. Set
+UPDATE_SNAPSHOTS=true to update the snapshots, and the synth budget, after
+an intended change.
+"""
+
+from pathlib import Path
+
+import pytest
+from aws_cdk.assertions import Match, Template
+
+from shared.testing import (
+    ASSET_MASK,
+    assert_snapshot,
+    assert_synth_budget,
+    normalise_template,
+    synth_fixture,
+)
+
+SHARED_DIR = Path(__file__).parents[2]
+SNAPSHOT_DIR = Path(__file__).parent / "snapshots"
+
+APPS = {
+    "aws-budgets": ["example-Budget-Stack"],
+    "aws-lambda-ami-refresh": ["Lambda-Stack"],
+}
+
+
+@pytest.fixture(name="synthesised", scope="module")
+def fixture_synthesised(tmp_path_factory):
+    return {
+        app: synth_fixture(
+            SHARED_DIR / app, "dev", tmp_path_factory.mktemp(app)
+        )
+        for app in APPS
+    }
+
+
+def test_every_stack_is_synthesised(synthesised):
+    """
+    Test that every stack is synthesised, within the synth time budget.
+    """
+
+    for app, stacks in APPS.items():
+        assert synthesised[app][0]["stacks"] == stacks
+
+    assert_synth_budget(
+        sum(result["seconds"] for result, _ in synthesised.values()),
+        SNAPSHOT_DIR / "synth-budget.json",
+    )
+
+
+@pytest.mark.parametrize(
+    "app, stack",
+    [(app, stack) for app, stacks in APPS.items() for stack in stacks],
+)
+def test_snapshot(synthesised, app, stack):
+    """
+    Test that each template matches its snapshot.
+    """
+
+    assert_snapshot(
+        synthesised[app][1][stack],
+        SNAPSHOT_DIR / app / f"{stack}.template.json",
+    )
+
+
+def test_budget_stack(synthesised):
+    """
+    Test that the budget notifies the topic, which only the account may
+    publish to.
+    """
+
+    budget = Template.from_json(
+        synthesised["aws-budgets"][1]["example-Budget-Stack"]
+    )
+    budget.resource_count_is("AWS::Budgets::Budget", 1)
+    budget.has_resource_properties(
+        "AWS::Budgets::Budget",
+        {
+            "Budget": Match.object_like(
+                {"BudgetType": "COST", "TimeUnit": "MONTHLY"}
+            ),
+            "NotificationsWithSubscribers": Match.array_with(
+                [
+                    Match.object_like(
+                        {
+                            "Subscribers": [
+                                Match.object_like({"SubscriptionType": "SNS"})
+                            ]
+                        }
+                    )
+                ]
+            ),
+        },
+    )
+    budget.has_resource_properties(
+        "AWS::SNS::TopicPolicy",
+        {
+            "PolicyDocument": {
+                "Statement": [Match.object_like({"Sid": "AllowAllInAccount"})],
+                "Version": "2012-10-17",
+            }
+        },
+    )
+
+
+def test_lambda_stack(synthesised):
+    """
+    Test that the AMI refresh function is deployed with its handler, on a
+    schedule.
+    """
+
+    ami_refresh = Template.from_json(
+        synthesised["aws-lambda-ami-refresh"][1]["Lambda-Stack"]
+    )
+    ami_refresh.has_resource_properties(
+        "AWS::Lambda::Function",
+        {"Handler": "lambda_handler.lambda_handler"},
+    )
+    ami_refresh.has_resource_properties(
+        "AWS::Events::Rule",
+        {"ScheduleExpression": Match.string_like_regexp("^(cron|rate)\\(")},
+    )
+
+
+def test_asset_hashes_are_masked():
+    """
+    Test that an edit to an asset's source does not change its snapshot.
+    """
+
+    asset_hash = "0123456789abcdef" * 4
+    template = {
+        "Code": {"S3Bucket": "assets", "S3Key": f"{asset_hash}.zip"},
+        "Metadata": [{"Fn::Sub": f"cdk-{asset_hash}-assets"}],
+        "Timeout": 180,
+    }
+
+    assert normalise_template(template) == {
+        "Code": {"S3Bucket": "assets", "S3Key": ASSET_MASK},
+        "Metadata": [{"Fn::Sub": f"cdk-{ASSET_MASK}-assets"}],
+        "Timeout": 180,
+    }
+
+
+def test_missing_snapshot_fails(tmp_path, monkeypatch):
+    """
+    Test that a missing snapshot or synth budget fails rather than being
+    recorded, unless UPDATE_SNAPSHOTS is set.
+    """
+
+    monkeypatch.delenv("UPDATE_SNAPSHOTS", raising=False)
+    snapshot_file = tmp_path / "Renamed-Stack.template.json"
+    budget_file = tmp_path / "synth-budget.json"
+
+    with pytest.raises(AssertionError, match="snapshot missing"):
+        assert_snapshot({"Resources": {}}, snapshot_file)
+    with pytest.raises(AssertionError, match="synth budget missing"):
+        assert_synth_budget(1.0, budget_file)
+    assert list(tmp_path.iterdir()) == []
+
+    monkeypatch.setenv("UPDATE_SNAPSHOTS", "true")
+    assert_snapshot({"Resources": {}}, snapshot_file)
+    assert_synth_budget(1.0, budget_file)
+
+    monkeypatch.delenv("UPDATE_SNAPSHOTS")
+    assert_snapshot({"Resources": {}}, snapshot_file)
+    assert_synth_budget(1.0, budget_file)
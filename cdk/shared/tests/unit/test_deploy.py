@@ -0,0 +1,198 @@
+"""
+A collection of tests for the dependency-wave deploy driver, against moto's
+CloudFormation.
+"""
+
+import json
+import threading
+import time
+
+import boto3
+import pytest
+from moto import mock_cloudformation
+
+from shared.deploy import (
+    BOOTSTRAP_HASH_TAG,
+    CloudFormationDeployer,
+    deployment_waves,
+    load_stacks,
+    run_waves,
+    synth_problem,
+)
+
+TEMPLATE = {"Resources": {"Topic": {"Type": "AWS::SNS::Topic"}}}
+
+DEPENDENCIES = {
+    "Network-Stack": [],
+    "HostedZone-Stack": [],
+    "RDS-Stack": ["Network-Stack"],
+    "Storage-Stack": [],
+    "App-Stack": ["Network-Stack", "HostedZone-Stack", "RDS-Stack"],
+}
+
+
+@pytest.fixture(name="assembly")
+def fixture_assembly(tmp_path):
+    """
+    A cloud assembly of the shape app.py synthesises, with an asset manifest
+    per stack.
+    """
+
+    artifacts = {"Tree": {"type": "cdk:tree"}}
+    for stack, dependencies in DEPENDENCIES.items():
+        (tmp_path / f"{stack}.template.json").write_text(json.dumps(TEMPLATE))
+        artifacts[f"{stack}.assets"] = {"type": "cdk:asset-manifest"}
+        artifacts[stack] = {
+            "type": "aws:cloudformation:stack",
+            "properties": {
+                "templateFile": f"{stack}.template.json",
+                "stackName": f"DEV-{stack}",
+                "tags": {"environment": "dev"},
+            },
+            "dependencies": [f"{stack}.assets", *dependencies],
+        }
+
+    with open(tmp_path / "manifest.json", "w") as file:
+        json.dump({"version": "34.0.0", "artifacts": artifacts}, file)
+
+    return tmp_path
+
+
+@pytest.fixture(name="deployer")
+def fixture_deployer(aws_credentials):
+    with mock_cloudformation():
+        yield CloudFormationDeployer(
+            boto3.Session(region_name="eu-west-2"), delay=1
+        )
+
+
+@pytest.fixture(name="aws_credentials")
+def fixture_aws_credentials(monkeypatch):
+    for key in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(key, "testing")
+
+
+def test_deployment_waves(assembly):
+    """
+    Test that the waves are read from the assembly, without its asset
+    manifests, and that a cycle is refused.
+    """
+
+    stacks = load_stacks(assembly)
+
+    assert stacks["RDS-Stack"]["dependencies"] == ["Network-Stack"]
+    assert deployment_waves(
+        {stack: value["dependencies"] for stack, value in stacks.items()}
+    ) == [
+        ["HostedZone-Stack", "Network-Stack", "Storage-Stack"],
+        ["RDS-Stack"],
+        ["App-Stack"],
+    ]
+
+    with pytest.raises(ValueError, match="cycle"):
+        deployment_waves({"a": ["b"], "b": ["a"]})
+
+
+def test_run_waves_concurrency_and_failure():
+    """
+    Test that a wave runs concurrently up to the limit, and that no wave is
+    started after a stack fails.
+    """
+
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def action(stack):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        if stack == "c":
+            raise RuntimeError("rolled back")
+        return "DONE"
+
+    results = run_waves([["a", "b", "c"], ["d"]], action, 2)
+
+    assert peak[0] == 2
+    assert [result["stack"] for result in results] == ["a", "b", "c"]
+    assert results[2]["status"] == "FAILED"
+    assert results[2]["error"] == "rolled back"
+
+
+def test_deploy_assembly(assembly, deployer):
+    """
+    Test that every stack of the assembly is deployed with its tags, and that
+    a second deploy is a no-op.
+    """
+
+    stacks = load_stacks(assembly)
+    waves = deployment_waves(
+        {stack: value["dependencies"] for stack, value in stacks.items()}
+    )
+
+    def deploy(stack):
+        return deployer.deploy_stack(assembly, stacks[stack])
+
+    results = run_waves(waves, deploy, 3)
+
+    assert {result["status"] for result in results} == {"CREATE_COMPLETE"}
+    assert deployer.stack_status("DEV-App-Stack")["Tags"] == [
+        {"Key": "environment", "Value": "dev"}
+    ]
+
+    results = run_waves(waves, deploy, 3)
+
+    assert {result["status"] for result in results} <= {
+        "NO_CHANGES",
+        "UPDATE_COMPLETE",
+    }
+
+
+def test_bootstrap_is_skipped_when_unchanged(tmp_path, deployer):
+    """
+    Test that the bootstrap stack is deployed with the hash of its template
+    and parameters, and is only deployed again when either changes.
+    """
+
+    template = tmp_path / "bootstrap-template.json"
+    params = tmp_path / "dev-params.json"
+    template.write_text(json.dumps(TEMPLATE))
+    params.write_text("[]")
+
+    assert deployer.bootstrap("CDKToolkit", template, params) == (
+        "CREATE_COMPLETE"
+    )
+    assert deployer.bootstrap("CDKToolkit", template, params) == "SKIPPED"
+
+    resources = {**TEMPLATE["Resources"], "Queue": {"Type": "AWS::SQS::Queue"}}
+    template.write_text(json.dumps({"Resources": resources}))
+
+    assert deployer.bootstrap("CDKToolkit", template, params) == (
+        "UPDATE_COMPLETE"
+    )
+
+    tags = deployer.stack_status("CDKToolkit")["Tags"]
+    assert [tag["Key"] for tag in tags] == [BOOTSTRAP_HASH_TAG]
+
+
+def test_synth_problem():
+    """
+    Test that an assembly built on uncached context lookups is not deployed,
+    as well as one whose app failed.
+    """
+
+    result = {"environment": "dev", "missing": [], "error": None}
+
+    assert synth_problem(result, "dev-profile") is None
+    assert synth_problem({**result, "error": "Traceback"}, "p") == "Traceback"
+
+    problem = synth_problem(
+        {**result, "missing": ["vpc-provider:account=1", "hosted-zone:a"]},
+        "dev-profile",
+    )
+    assert problem == (
+        "Missing context, run CDK_ENVIRONMENT=dev cdk synth --profile "
+        "dev-profile once in the app directory to look up and cache: "
+        "vpc-provider:account=1, hosted-zone:a"
+    )
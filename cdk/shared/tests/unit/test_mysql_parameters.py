@@ -0,0 +1,89 @@
+"""
+A collection of tests for the MySQL parameters derived from an instance
+class.
+"""
+
+import pytest
+
+from shared.mysql_parameters import (
+    GIB,
+    INSTANCE_PARAMETERS,
+    SLOW_LOG,
+    instance_resources,
+    tuned_parameters,
+)
+
+
+def test_instance_resources():
+    """
+    Test that the memory and vCPUs of an instance type are looked up, with
+    or without the "db." prefix.
+    """
+
+    assert instance_resources("r5.large") == (16 * GIB, 2)
+    assert instance_resources("db.t3.micro") == (GIB, 2)
+
+    with pytest.raises(ValueError, match="'x1.large'"):
+        instance_resources("x1.large")
+
+
+def test_tuned_parameters_scale_with_the_instance_class():
+    """
+    Test that the buffer pool, connections and I/O capacity grow with the
+    instance class, and that the buffer pool is a whole number of chunks.
+    """
+
+    large = tuned_parameters("r5.large")
+    xlarge = tuned_parameters("r5.2xlarge")
+
+    assert int(large["innodb_buffer_pool_size"]) == 12 * GIB
+    assert large["innodb_buffer_pool_instances"] == "12"
+    assert large["max_connections"] == "1365"
+    for key in (
+        "innodb_buffer_pool_size",
+        "max_connections",
+        "innodb_io_capacity",
+        "table_open_cache_instances",
+    ):
+        assert int(xlarge[key]) > int(large[key])
+
+    micro = tuned_parameters("t3.micro")
+    assert int(micro["innodb_buffer_pool_size"]) == GIB // 2
+    assert int(micro["innodb_buffer_pool_size"]) % (128 * 1024**2) == 0
+    assert micro["slow_query_log"] == "1"
+
+
+def test_tuned_parameters_storage_iops():
+    """
+    Test that the I/O capacity follows the IOPS of the storage when known.
+    """
+
+    parameters = tuned_parameters("r5.large", iops=12000)
+
+    assert parameters["innodb_io_capacity"] == "6000"
+    assert parameters["innodb_io_capacity_max"] == "12000"
+
+
+def test_tuned_parameters_overrides():
+    """
+    Test that overrides replace derived values and add new ones, as strings.
+    """
+
+    parameters = tuned_parameters(
+        "r5.large", {"max_connections": 500, "long_query_time": 0.5}
+    )
+
+    assert parameters["max_connections"] == "500"
+    assert parameters["long_query_time"] == "0.5"
+    assert parameters["innodb_io_capacity"] == "400"
+
+
+def test_instance_parameters():
+    """
+    Test that every parameter derived from the instance class is listed as
+    one Aurora does not accept on a cluster, and the slow log is not.
+    """
+
+    assert set(tuned_parameters("r5.large")) - set(SLOW_LOG) == set(
+        INSTANCE_PARAMETERS
+    )
@@ -0,0 +1,214 @@
+"""
+A collection of tests for the SSM parameter bundle construct pair.
+"""
+
+import json
+
+import aws_cdk as cdk
+import pytest
+from aws_cdk import aws_sns as sns
+from aws_cdk.assertions import Template
+
+from shared.parameter_bundle import MAX_VALUE_LENGTH, ParameterBundle
+
+ENV = cdk.Environment(account="123456789012", region="eu-west-2")
+
+
+def evaluate(value, parameters):
+    """
+    Evaluate the Ref, Fn::Split and Fn::Select of a resolved value as
+    CloudFormation would, with the given template parameter values.
+    """
+
+    if isinstance(value, list):
+        return [evaluate(item, parameters) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "Ref" in value:
+        return parameters[value["Ref"]]
+    if "Fn::Split" in value:
+        delimiter, source = value["Fn::Split"]
+        return evaluate(source, parameters).split(delimiter)
+    index, items = value["Fn::Select"]
+    return evaluate(items, parameters)[index]
+
+
+def test_bundle_is_one_parameter():
+    """
+    Test that every value is published in a single JSON-encoded parameter,
+    with lists kept as JSON arrays.
+    """
+
+    stack = cdk.Stack(cdk.App(), "Producer", env=ENV)
+    ParameterBundle(
+        stack,
+        "Bundle",
+        parameter_name="/ALIAS/NET",
+        values={
+            "VPC/CIDR": "10.0.0.0/16",
+            "VPC/PRIVATE/SUBNET": ["subnet-1", "subnet-2"],
+        },
+    )
+
+    template = Template.from_stack(stack)
+    template.resource_count_is("AWS::SSM::Parameter", 1)
+
+    (parameter,) = template.find_resources("AWS::SSM::Parameter").values()
+    assert json.loads(parameter["Properties"]["Value"]) == {
+        "VPC/CIDR": "10.0.0.0/16",
+        "VPC/PRIVATE/SUBNET": ["subnet-1", "subnet-2"],
+    }
+
+
+def test_bundle_keeps_legacy_parameters():
+    """
+    Test that the legacy keys are also published as a parameter each, under
+    the names and logical IDs they had before bundles.
+    """
+
+    stack = cdk.Stack(cdk.App(), "Producer", env=ENV)
+    ParameterBundle(
+        stack,
+        "Bundle",
+        parameter_name="/ALIAS/NET",
+        values={
+            "VPC/CIDR": "10.0.0.0/16",
+            "VPC/PRIVATE/SUBNET": ["subnet-1", "subnet-2"],
+            "VPC/ID": "vpc-1",
+        },
+        legacy_keys=("VPC/CIDR", "VPC/PRIVATE/SUBNET"),
+    )
+
+    parameters = Template.from_stack(stack).find_resources(
+        "AWS::SSM::Parameter"
+    )
+    assert {
+        logical_id: (
+            parameter["Properties"]["Name"],
+            parameter["Properties"]["Type"],
+            parameter["Properties"]["Value"],
+        )
+        for logical_id, parameter in parameters.items()
+        if logical_id.startswith("SSMParameter")
+    } == {
+        "SSMParameterVPCCIDRD59EECB8": (
+            "/ALIAS/NET/VPC/CIDR",
+            "String",
+            "10.0.0.0/16",
+        ),
+        "SSMParameterVPCPRIVATESUBNETE335E3BF": (
+            "/ALIAS/NET/VPC/PRIVATE/SUBNET",
+            "StringList",
+            "subnet-1,subnet-2",
+        ),
+    }
+    assert len(parameters) == 3
+
+
+def test_bundle_resolves_tokens():
+    """
+    Test that tokens are resolved into the JSON at deploy time, and that
+    values which are neither strings nor lists of strings are refused.
+    """
+
+    stack = cdk.Stack(cdk.App(), "Producer", env=ENV)
+    topic = sns.Topic(stack, "Topic")
+    ParameterBundle(
+        stack,
+        "Bundle",
+        parameter_name="/ALIAS/NET",
+        values={"TOPIC/ARN": topic.topic_arn},
+    )
+
+    (parameter,) = (
+        Template.from_stack(stack)
+        .find_resources("AWS::SSM::Parameter")
+        .values()
+    )
+    assert "Fn::Join" in parameter["Properties"]["Value"]
+
+    with pytest.raises(TypeError, match="SUBNETS"):
+        ParameterBundle(
+            stack,
+            "Invalid",
+            parameter_name="/ALIAS/INVALID",
+            values={"SUBNETS": [topic]},
+        )
+
+
+def test_bundle_is_read_at_deploy_time():
+    """
+    Test that a bundle is read through a single template parameter, rather
+    than at synth, and that its string and list values are cut out of the
+    JSON the publishing stack wrote.
+    """
+
+    values = {
+        "VPC/CIDR": "10.0.0.0/16",
+        "VPC/ID": "vpc-1",
+        "VPC/SUBNET": ["subnet-1", "subnet-2"],
+        "VPC/SUBNET/ID": ["subnet-3"],
+    }
+    stack = cdk.Stack(cdk.App(), "Consumer", env=ENV)
+    bundle = ParameterBundle.from_parameter_name(stack, "/ALIAS/NET")
+    resolved = {
+        "cidr": stack.resolve(bundle.get("VPC/CIDR")),
+        "id": stack.resolve(bundle.get("VPC/ID")),
+        "subnets": stack.resolve(bundle.get_list("VPC/SUBNET")),
+        "subnet_ids": stack.resolve(bundle.get_list("VPC/SUBNET/ID")),
+    }
+    sns.Topic(stack, "Topic", display_name=bundle.get("VPC/CIDR"))
+
+    parameters = Template.from_stack(stack).to_json()["Parameters"]
+    (name,) = parameters.keys() - {"BootstrapVersion"}
+    assert parameters[name] == {
+        "Type": "AWS::SSM::Parameter::Value<String>",
+        "Default": "/ALIAS/NET",
+    }
+
+    published = json.dumps(values, separators=(",", ":"))
+    assert {
+        key: evaluate(value, {name: published})
+        for key, value in resolved.items()
+    } == {
+        "cidr": "10.0.0.0/16",
+        "id": "vpc-1",
+        "subnets": ["subnet-1", "subnet-2"],
+        "subnet_ids": ["subnet-3"],
+    }
+
+
+def test_bundle_must_be_readable_back():
+    """
+    Test that values which cannot be cut out of the JSON at deploy time, and
+    bundles over the size of an SSM parameter, are refused at synth.
+    """
+
+    stack = cdk.Stack(cdk.App(), "Producer", env=ENV)
+    topic = sns.Topic(stack, "Topic")
+
+    with pytest.raises(ValueError, match="SUBNETS .* empty"):
+        ParameterBundle(
+            stack,
+            "Empty",
+            parameter_name="/ALIAS/EMPTY",
+            values={"SUBNETS": []},
+        )
+
+    with pytest.raises(ValueError, match="NAME .* quote or backslash"):
+        ParameterBundle(
+            stack,
+            "Quoted",
+            parameter_name="/ALIAS/QUOTED",
+            values={"NAME": 'a "name"'},
+        )
+
+    with pytest.raises(ValueError, match=f"over the {MAX_VALUE_LENGTH}"):
+        ParameterBundle(
+            stack,
+            "Large",
+            parameter_name="/ALIAS/LARGE",
+            values={
+                f"TOPIC/{index}/ARN": topic.topic_arn for index in range(16)
+            },
+        )
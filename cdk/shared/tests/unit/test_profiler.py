@@ -0,0 +1,134 @@
+"""
+A collection of tests for the synth-time profiler.
+"""
+
+import json
+from pathlib import Path
+
+import aws_cdk as cdk
+from aws_cdk import aws_sns as sns
+from jsii._kernel.providers.process import _NodeProcess
+
+from shared.profiler import (
+    FOLDED_FILE,
+    REPORT_FILE,
+    KernelCalls,
+    SynthProfiler,
+)
+
+
+def build(app, profiler):
+    with profiler.stack("small_stack"):
+        small = cdk.Stack(app, "Small-Stack")
+        sns.Topic(small, "Topic")
+
+    with profiler.stack("large_stack"):
+        large = cdk.Stack(app, "Large-Stack")
+        for index in range(5):
+            sns.Topic(large, f"Topic-{index}")
+
+    with profiler.synth():
+        assembly = app.synth()
+
+    return profiler.report(assembly)
+
+
+def test_profiler_report(tmp_path):
+    """
+    Test that each stack is reported with its own wall time, jsii calls,
+    construct count and template size, and that the report is written as
+    JSON and in the folded flamegraph format.
+    """
+
+    app = cdk.App(outdir=str(tmp_path), context={"profile": "true"})
+    report = build(app, SynthProfiler.for_app(app))
+
+    small, large, synth = report["phases"]
+
+    assert [small["name"], large["name"], synth["name"]] == [
+        "small_stack",
+        "large_stack",
+        "synth",
+    ]
+    assert small["stack_names"] == ["Small-Stack"]
+    assert large["constructs"] > small["constructs"]
+    assert large["template_bytes"] > small["template_bytes"]
+    assert large["jsii_calls"] > small["jsii_calls"] > 0
+    assert "constructs" not in synth
+
+    with open(tmp_path / REPORT_FILE) as file:
+        assert json.load(file) == report
+
+    folded = Path(tmp_path / FOLDED_FILE).read_text().splitlines()
+    assert folded[0].startswith("app;stack;small_stack ")
+    assert folded[2].startswith("app;synth;synth ")
+
+
+def test_profiler_restores_kernel(tmp_path):
+    """
+    Test that the jsii kernel is only wrapped while a profile is recorded,
+    so profilers neither stack their counts nor outlive their report.
+    """
+
+    send = _NodeProcess.send
+
+    for run in range(2):
+        app = cdk.App(
+            outdir=str(tmp_path / str(run)), context={"profile": "true"}
+        )
+        profiler = SynthProfiler.for_app(app)
+        assert _NodeProcess.send is send
+
+        with profiler.stack("stack"):
+            assert _NodeProcess.send is not send
+            cdk.Stack(app, "Stack")
+
+        profiler.report(app.synth())
+        assert _NodeProcess.send is send
+
+    app = cdk.App(outdir=str(tmp_path / "with"), context={"profile": "true"})
+    with SynthProfiler.for_app(app) as profiler:
+        with profiler.stack("stack"):
+            cdk.Stack(app, "Stack")
+    assert _NodeProcess.send is send
+
+
+def test_kernel_calls():
+    """
+    Test that the counter the benchmarks share counts jsii calls only while
+    it is open, carrying the count on when it is reopened.
+    """
+
+    send = _NodeProcess.send
+    app = cdk.App()
+
+    with KernelCalls() as calls:
+        cdk.Stack(app, "First")
+    assert _NodeProcess.send is send
+    counted = calls.count
+    assert counted > 0
+
+    cdk.Stack(app, "Uncounted")
+    assert calls.count == counted
+
+    with calls:
+        cdk.Stack(app, "Second")
+    assert calls.count > counted
+    assert _NodeProcess.send is send
+
+
+def test_profiler_disabled(tmp_path, monkeypatch):
+    """
+    Test that the profiler does nothing unless it is enabled.
+    """
+
+    monkeypatch.delenv("CDK_PROFILE", raising=False)
+
+    send = _NodeProcess.send
+    app = cdk.App(outdir=str(tmp_path))
+    profiler = SynthProfiler.for_app(app)
+
+    assert build(app, profiler) is None
+    assert profiler.phases == []
+    assert _NodeProcess.send is send
+    assert not (tmp_path / REPORT_FILE).exists()
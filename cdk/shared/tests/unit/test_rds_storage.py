@@ -0,0 +1,61 @@
+"""
+A collection of tests for the RDS storage profile limits.
+"""
+
+import pytest
+
+from shared.rds_storage import storage_iops, validate_storage
+
+
+@pytest.mark.parametrize(
+    "profile",
+    [
+        ("mysql", "gp2", 100, None, None),
+        ("mysql", "gp3", 100, None, None),
+        ("mysql", "gp3", 400, 12000, 500),
+        ("mysql", "gp3", 1000, 64000, 4000),
+        ("mysql", "io1", 100, 5000, None),
+        ("oracle", "gp3", 200, 20000, None),
+    ],
+)
+def test_validate_storage_accepts(profile):
+    """
+    Test that profiles within the limits RDS applies are accepted.
+    """
+
+    assert validate_storage(*profile) == []
+
+
+@pytest.mark.parametrize(
+    "profile, error",
+    [
+        (("mysql", "gp2", 100, 3000, None), "gp2 storage cannot have iops"),
+        (("mysql", "gp3", 10, None, None), "allocated_gb must be from 20"),
+        (("mysql", "gp3", 200, 12000, None), "under 400 GiB for mysql"),
+        (("mysql", "gp3", 400, 70000, None), "iops must be from 12000"),
+        (("mysql", "gp3", 400, 12000, 4000), "0.25 MiB/s per IOPS"),
+        (("mysql", "io1", 100, 6000, None), "0.5 to 50 per GiB"),
+        (("mysql", "io1", 200, None, None), "io1 storage must have iops"),
+        (("mysql", "io2", 200, 1000, None), "type must be one of"),
+    ],
+)
+def test_validate_storage_rejects(profile, error):
+    """
+    Test that profiles outside the limits are rejected with the reason.
+    """
+
+    errors = validate_storage(*profile)
+
+    assert len(errors) == 1
+    assert error in errors[0]
+
+
+def test_storage_iops():
+    """
+    Test that the IOPS of a profile default to those of its baseline.
+    """
+
+    assert storage_iops("mysql", "gp2", 100) == 300
+    assert storage_iops("mysql", "gp3", 100) == 3000
+    assert storage_iops("mysql", "gp3", 400) == 12000
+    assert storage_iops("mysql", "gp3", 400, 20000) == 20000
@@ -0,0 +1,212 @@
+"""
+A collection of tests for the replacement impact analyser.
+"""
+
+import json
+
+import pytest
+
+from shared.replacement import (
+    blocked_changes,
+    check_replacements,
+    classify_property,
+    compare_assemblies,
+    load_behaviour,
+)
+from shared.template_budget import minimise
+
+DATABASE = {
+    "Type": "AWS::RDS::DBInstance",
+    "Properties": {
+        "DBInstanceIdentifier": "example-rds",
+        "DBInstanceClass": "db.t3.micro",
+        "Engine": "mysql",
+        "MultiAZ": False,
+    },
+    "DeletionPolicy": "Snapshot",
+}
+
+TOPIC = {"Type": "AWS::SNS::Topic", "Properties": {"TopicName": "a"}}
+
+GROUP = {
+    "Type": "AWS::AutoScaling::AutoScalingGroup",
+    "Properties": {"MaxSize": "2", "MinSize": "1"},
+}
+
+
+def write_assembly(path, templates):
+    """
+    Write a cloud assembly of the given templates, by stack artifact ID.
+    """
+
+    path.mkdir()
+    artifacts = {}
+    for stack, resources in templates.items():
+        (path / f"{stack}.template.json").write_text(
+            json.dumps({"Resources": resources}), encoding="utf8"
+        )
+        artifacts[stack] = {
+            "type": "aws:cloudformation:stack",
+            "properties": {"templateFile": f"{stack}.template.json"},
+        }
+    (path / "manifest.json").write_text(
+        json.dumps({"artifacts": artifacts}), encoding="utf8"
+    )
+
+    return path
+
+
+def with_properties(resource, **properties):
+    return {
+        **resource,
+        "Properties": {**resource["Properties"], **properties},
+    }
+
+
+@pytest.mark.parametrize(
+    "resource_type, prop, impact",
+    [
+        ("AWS::RDS::DBInstance", "DBInstanceIdentifier", "replacement"),
+        ("AWS::RDS::DBInstance", "Engine", "replacement"),
+        ("AWS::RDS::DBInstance", "DBInstanceClass", "interruption"),
+        ("AWS::RDS::DBInstance", "MultiAZ", "in-place"),
+        (
+            "AWS::AutoScaling::AutoScalingGroup",
+            "LaunchTemplate",
+            "interruption",
+        ),
+        ("AWS::Example::Unknown", "Name", "unknown"),
+    ],
+)
+def test_classify_property(resource_type, prop, impact):
+    """
+    Test that properties are classified from the bundled table.
+    """
+
+    assert classify_property(load_behaviour(), resource_type, prop) == impact
+
+
+def test_compare_assemblies():
+    """
+    Test that each changed resource takes the impact of its worst change,
+    that a renamed logical ID removes the old resource, and that unchanged
+    resources are left out.
+    """
+
+    changes = compare_assemblies(
+        {
+            "RDS-Stack": {"Resources": {"RDSInstance": DATABASE}},
+            "App-Stack": {"Resources": {"ASG": GROUP, "Topic": TOPIC}},
+        },
+        {
+            "RDS-Stack": {
+                "Resources": {
+                    "RDSInstance": with_properties(
+                        DATABASE, DBInstanceClass="db.t3.small", MultiAZ=True
+                    )
+                }
+            },
+            "App-Stack": {
+                "Resources": {
+                    "ASGRenamed": GROUP,
+                    "Topic": TOPIC,
+                }
+            },
+        },
+        load_behaviour(),
+    )
+
+    assert [
+        (change["logical_id"], change["action"], change["impact"])
+        for change in changes
+    ] == [
+        ("ASG", "remove", "replacement"),
+        ("ASGRenamed", "add", "none"),
+        ("RDSInstance", "modify", "interruption"),
+    ]
+    assert changes[2]["properties"] == {
+        "DBInstanceClass": "interruption",
+        "MultiAZ": "in-place",
+    }
+
+
+def test_blocked_changes():
+    """
+    Test that replacing a stateful resource is blocked unless allowed, and
+    that replacing a stateless one is not.
+    """
+
+    changes = compare_assemblies(
+        {"RDS-Stack": {"Resources": {"RDSInstance": DATABASE, "Topic": TOPIC}}},
+        {
+            "RDS-Stack": {
+                "Resources": {
+                    "RDSInstance": with_properties(
+                        DATABASE, DBInstanceIdentifier="example-rds-2"
+                    ),
+                    "Topic": with_properties(TOPIC, TopicName="b"),
+                }
+            }
+        },
+        load_behaviour(),
+    )
+
+    assert [change["impact"] for change in changes] == [
+        "replacement",
+        "replacement",
+    ]
+    assert [change["logical_id"] for change in blocked_changes(changes)] == [
+        "RDSInstance"
+    ]
+    assert blocked_changes(changes, ["RDS-Stack/RDS*"]) == []
+
+
+def test_check_replacements(tmp_path, capsys):
+    """
+    Test that two assemblies on disk are compared, printed and reported.
+    """
+
+    old = write_assembly(tmp_path / "old", {"RDS-Stack": {"DB": DATABASE}})
+    new = write_assembly(
+        tmp_path / "new",
+        {"RDS-Stack": {"DB": with_properties(DATABASE, Engine="postgres")}},
+    )
+
+    blocked = check_replacements(old, new, report=tmp_path / "report.json")
+
+    assert [change["logical_id"] for change in blocked] == ["DB"]
+    assert "BLOCKED RDS-Stack/DB" in capsys.readouterr().out
+    with open(tmp_path / "report.json", encoding="utf8") as fp:
+        assert json.load(fp)["blocked"] == blocked
+    assert check_replacements(old, old) == []
+
+
+def test_merged_policy_is_not_removed():
+    """
+    Test that a policy merged into an identical one by the template budget
+    is reported as merged in place rather than removed.
+    """
+
+    policy = {
+        "Type": "AWS::SNS::TopicPolicy",
+        "Properties": {
+            "PolicyDocument": {"Statement": [], "Version": "2012-10-17"},
+            "Topics": [{"Ref": "Topic"}],
+        },
+    }
+    old = {
+        "Topic": TOPIC,
+        "PolicyA": policy,
+        "PolicyB": {**policy, "Properties": {**policy["Properties"]}},
+    }
+
+    changes = compare_assemblies(
+        {"Stack": {"Resources": old}},
+        {"Stack": minimise({"Resources": json.loads(json.dumps(old))})},
+        load_behaviour(),
+    )
+
+    assert [
+        (change["logical_id"], change["action"], change["impact"])
+        for change in changes
+    ] == [("PolicyB", "merge", "in-place")]
@@ -0,0 +1,74 @@
+"""
+A collection of tests for the parallel multi-environment synth.
+"""
+
+import json
+import re
+import shutil
+from pathlib import Path
+
+import pytest
+
+from shared.synth import app_context, synth
+
+BUDGETS_APP = Path(__file__).parents[2] / "aws-budgets"
+
+
+@pytest.fixture
+def budgets_app(tmp_path, monkeypatch):
+    """
+    A copy of the budgets app, with the placeholders of its context filled
+    in so that it can be synthesised.
+    """
+
+    app_dir = tmp_path / "aws-budgets"
+    shutil.copytree(
+        BUDGETS_APP,
+        app_dir,
+        ignore=shutil.ignore_patterns("cdk.out", "__pycache__"),
+    )
+
+    context_file = app_dir / "cdk.context.json"
+    context = context_file.read_text().replace(
+        "{INSERT_AWS_ACCOUNT_ID}", "123456789012"
+    )
+    context_file.write_text(re.sub(r"\{[A-Z_]+\}", "example", context))
+
+    monkeypatch.setenv("PIPELINE_RUN_ID", "1")
+    monkeypatch.setenv("BRANCH_NAME", "main")
+    monkeypatch.setenv("COMMIT_ID", "abc")
+
+    return app_dir
+
+
+def test_app_context(tmp_path):
+    """
+    Test that the context of cdk.json and cdk.context.json are merged, as the
+    CDK CLI would pass them to the app.
+    """
+
+    (tmp_path / "cdk.json").write_text(
+        json.dumps({"app": "python3 app.py", "context": {"flag": True}})
+    )
+    (tmp_path / "cdk.context.json").write_text(json.dumps({"tags": {}}))
+
+    assert app_context(tmp_path) == {"flag": True, "tags": {}}
+
+
+def test_synth_environments(budgets_app):
+    """
+    Test that each environment is synthesised into its own assembly, and
+    that a failing environment is reported without stopping the others.
+    """
+
+    results, _ = synth(budgets_app, ["dev", "prod"])
+    dev, prod = results
+
+    assert dev["error"] is None
+    assert dev["stacks"] == ["example-Budget-Stack"]
+    assert (
+        budgets_app / "cdk.out" / "dev" / "example-Budget-Stack.template.json"
+    ).exists()
+
+    assert "budget_threshold.prod.threshold is missing" in prod["error"]
+    assert prod["stacks"] == []
@@ -0,0 +1,247 @@
+"""
+A collection of tests for the content-hash synth cache.
+"""
+
+import importlib.util
+import json
+import sys
+
+import aws_cdk as cdk
+
+from shared.synth_cache import ENTRY_FILE, SynthCache
+
+# A local module the stacks import, as they import shared.parameter_bundle.
+SHARED_SOURCE = """
+TOPIC_NAME = "{marker}"
+"""
+
+SOURCES = {
+    "topic_stack": """
+import aws_cdk as cdk
+from aws_cdk import aws_sns as sns
+
+import naming
+
+
+class Stack(cdk.Stack):
+    def __init__(self, scope, construct_id, **kwargs):
+        super().__init__(scope, construct_id, **kwargs)
+        self.topic = sns.Topic(self, "Topic", display_name=naming.TOPIC_NAME)
+        # {marker}
+""",
+    "subscriber_stack": """
+import aws_cdk as cdk
+
+
+class Stack(cdk.Stack):
+    def __init__(self, scope, construct_id, topic_stack, **kwargs):
+        super().__init__(scope, construct_id, **kwargs)
+        cdk.CfnOutput(self, "Topic", value=topic_stack.topic.topic_arn)
+        # {marker}
+""",
+    "audit_stack": """
+import aws_cdk as cdk
+from aws_cdk import aws_sns as sns
+
+
+class Stack(cdk.Stack):
+    def __init__(self, scope, construct_id, **kwargs):
+        super().__init__(scope, construct_id, **kwargs)
+        sns.Topic(self, "Topic")
+        # {marker}
+""",
+}
+
+IDS = {
+    "topic_stack": "Topic-Stack",
+    "subscriber_stack": "Subscriber-Stack",
+    "audit_stack": "Audit-Stack",
+}
+DEPENDS_ON = {
+    "topic_stack": [],
+    "subscriber_stack": ["topic_stack"],
+    "audit_stack": ["topic_stack"],
+}
+BUILT_FROM = {"subscriber_stack": ["topic_stack"]}
+
+
+def load_module(path, name, source):
+    module_dir = path / name
+    module_dir.mkdir(exist_ok=True)
+    module_file = module_dir / f"{name}.py"
+    module_file.write_text(source)
+    spec = importlib.util.spec_from_file_location(name, module_file)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+
+    return module
+
+
+def load_stacks(path, markers=None):
+    """
+    Write a module per stack, and the module they import, with a marker
+    standing in for an edit of its source, and import them afresh.
+    """
+
+    markers = markers or {}
+    load_module(
+        path,
+        "naming",
+        SHARED_SOURCE.replace("{marker}", markers.get("naming", "Topic")),
+    )
+
+    classes = {}
+    for name, source in SOURCES.items():
+        module = load_module(
+            path, name, source.replace("{marker}", markers.get(name, ""))
+        )
+        classes[name] = module.Stack
+
+    return classes
+
+
+def synth(tmp_path, run, classes, max_mb=1):
+    """
+    Run the app as app.py would, returning the stacks that were constructed
+    and the manifest of the assembly.
+    """
+
+    outdir = tmp_path / f"cdk.out.{run}"
+    app = cdk.App(outdir=str(outdir))
+    cache = SynthCache(
+        app, True, tmp_path / ".synth-cache", max_mb, source_dirs=[tmp_path]
+    )
+    build = cache.plan(
+        classes, {"environment": "dev"}, {}, DEPENDS_ON, BUILT_FROM
+    )
+
+    stacks = {}
+    for name in classes:
+        if name not in build:
+            continue
+        args = [stacks["topic_stack"]] if name == "subscriber_stack" else []
+        stacks[name] = classes[name](app, IDS[name], *args)
+        for dependency in DEPENDS_ON[name]:
+            if dependency in stacks:
+                stacks[name].add_dependency(stacks[dependency])
+
+    cache.update(app.synth(), stacks)
+
+    with open(outdir / "manifest.json") as file:
+        manifest = json.load(file)
+
+    return build, manifest
+
+
+def test_unchanged_stacks_are_reused(tmp_path):
+    """
+    Test that a second synth of unchanged stacks constructs nothing, and
+    produces the same templates and manifest artifacts.
+    """
+
+    classes = load_stacks(tmp_path)
+    first_build, first = synth(tmp_path, 1, classes)
+    second_build, second = synth(tmp_path, 2, classes)
+
+    assert first_build == set(SOURCES)
+    assert second_build == set()
+    assert second["artifacts"].keys() - {"Tree"} == (
+        first["artifacts"].keys() - {"Tree"}
+    )
+
+    for name in IDS.values():
+        template = f"{name}.template.json"
+        assert (tmp_path / "cdk.out.2" / template).read_text() == (
+            tmp_path / "cdk.out.1" / template
+        ).read_text()
+
+
+def test_changed_stack_is_rebuilt(tmp_path):
+    """
+    Test that only a changed stack, and the stacks it is built from, are
+    constructed, and that a dependency on a cached stack is kept.
+    """
+
+    synth(tmp_path, 1, load_stacks(tmp_path))
+
+    classes = load_stacks(tmp_path, {"audit_stack": "edited"})
+    build, manifest = synth(tmp_path, 2, classes)
+
+    assert build == {"audit_stack"}
+    assert "Topic-Stack" in manifest["artifacts"]
+    assert manifest["artifacts"]["Audit-Stack"]["dependencies"] == [
+        "Audit-Stack.assets",
+        "Topic-Stack",
+    ]
+
+    classes = load_stacks(
+        tmp_path, {"audit_stack": "edited", "subscriber_stack": "edited"}
+    )
+    build, _ = synth(tmp_path, 3, classes)
+
+    assert build == {"subscriber_stack", "topic_stack"}
+
+    """
+    A change to the topic stack changes the fingerprint of every stack that
+    depends on it.
+    """
+
+    classes = load_stacks(
+        tmp_path,
+        {
+            "audit_stack": "edited",
+            "subscriber_stack": "edited",
+            "topic_stack": "edited",
+        },
+    )
+    build, _ = synth(tmp_path, 4, classes)
+
+    assert build == set(SOURCES)
+
+
+def test_changed_shared_module_rebuilds_every_stack(tmp_path):
+    """
+    Test that an edit of a module the stacks import, rather than of a stack,
+    is not served from the cache.
+    """
+
+    synth(tmp_path, 1, load_stacks(tmp_path))
+
+    classes = load_stacks(tmp_path, {"naming": "Edited"})
+    build, _ = synth(tmp_path, 2, classes)
+
+    assert build == set(SOURCES)
+    with open(tmp_path / "cdk.out.2" / "Topic-Stack.template.json") as file:
+        resources = json.load(file)["Resources"]
+
+    assert [
+        resource["Properties"]["DisplayName"]
+        for resource in resources.values()
+        if resource["Type"] == "AWS::SNS::Topic"
+    ] == ["Edited"]
+
+
+def test_eviction(tmp_path):
+    """
+    Test that the least recently used entries are evicted once the cache is
+    over its size bound.
+    """
+
+    synth(tmp_path, 1, load_stacks(tmp_path), max_mb=0)
+
+    assert list((tmp_path / ".synth-cache").glob(f"*/{ENTRY_FILE}")) == []
+
+
+def test_disabled_cache_builds_everything(tmp_path):
+    """
+    Test that every stack is built when the cache is not enabled.
+    """
+
+    app = cdk.App(outdir=str(tmp_path))
+    cache = SynthCache(app, False)
+
+    assert cache.plan({"a": cdk.Stack, "b": cdk.Stack}, {}, {}, {}, {}) == {
+        "a",
+        "b",
+    }
@@ -0,0 +1,67 @@
+"""
+A collection of tests for the app-wide tagging and its coverage report.
+"""
+
+import json
+
+import aws_cdk as cdk
+from aws_cdk import (
+    aws_iam as iam,
+    aws_sns as sns,
+    aws_sqs as sqs,
+    aws_ssm as ssm,
+)
+
+from shared.tagging import REPORT_FILE, apply_tags, tag_coverage
+
+TAGS = {"environment": "dev", "team": "platform", "commit_id": None}
+
+
+def test_tag_coverage(tmp_path):
+    """
+    Test that every taggable resource of every stack is tagged, and that the
+    resources missing a tag, whether unset or removed, are reported.
+    """
+
+    app = cdk.App(outdir=str(tmp_path))
+    queues = cdk.Stack(app, "Queue-Stack")
+    sqs.Queue(queues, "Queue")
+    untagged = sqs.Queue(queues, "Untagged")
+    cdk.Tags.of(untagged).remove("team")
+
+    topics = cdk.Stack(app, "Topic-Stack")
+    topic = sns.Topic(topics, "Topic")
+    topic.add_to_resource_policy(
+        iam.PolicyStatement(
+            actions=["sns:Publish"],
+            principals=[iam.AccountRootPrincipal()],
+            resources=[topic.topic_arn],
+        )
+    )
+    ssm.StringParameter(topics, "Parameter", string_value="value")
+
+    apply_tags(app, TAGS)
+    report = tag_coverage(app.synth(), TAGS)
+
+    with open(tmp_path / REPORT_FILE) as file:
+        assert json.load(file) == report
+
+    assert report["required"] == ["commit_id", "environment", "team"]
+    assert report["taggable"] == 4
+    assert {
+        resource["logical_id"].rstrip("0123456789ABCDEF"): resource["missing"]
+        for resource in report["missing"]
+    } == {
+        "Queue": ["commit_id"],
+        "Untagged": ["commit_id", "team"],
+        "Topic": ["commit_id"],
+        "Parameter": ["commit_id"],
+    }
+
+    with open(tmp_path / "manifest.json") as file:
+        manifest = json.load(file)
+
+    assert manifest["artifacts"]["Topic-Stack"]["properties"]["tags"] == {
+        "environment": "dev",
+        "team": "platform",
+    }
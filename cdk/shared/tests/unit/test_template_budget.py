@@ -0,0 +1,178 @@
+"""
+A collection of tests for the template size budget and minimiser.
+"""
+
+import hashlib
+import json
+
+import aws_cdk as cdk
+import pytest
+from aws_cdk import aws_iam as iam, aws_sns as sns
+
+from shared.template_budget import (
+    MERGED_METADATA,
+    TemplateBudget,
+    TemplateBudgetError,
+    minimise,
+)
+
+STATEMENT = {"Action": "sns:Publish", "Effect": "Allow", "Resource": "*"}
+
+
+def topic_policy(topic, depends_on=None):
+    policy = {
+        "Type": "AWS::SNS::TopicPolicy",
+        "Properties": {
+            "PolicyDocument": {
+                "Statement": [STATEMENT, STATEMENT],
+                "Version": "2012-10-17",
+            },
+            "Topics": [{"Ref": topic}],
+        },
+        "Metadata": {"aws:cdk:path": f"Stack/{topic}/Policy"},
+    }
+    if depends_on:
+        policy["DependsOn"] = depends_on
+
+    return policy
+
+
+def test_minimise():
+    """
+    Test that dead metadata and repeated statements are removed, and that
+    identical policies are merged with their references updated.
+    """
+
+    template = minimise(
+        {
+            "Conditions": {"CDKMetadataAvailable": {"Fn::Equals": [1, 1]}},
+            "Resources": {
+                "TopicA": {"Type": "AWS::SNS::Topic"},
+                "TopicB": {"Type": "AWS::SNS::Topic"},
+                "PolicyA": topic_policy("TopicA"),
+                "PolicyB": topic_policy("TopicB", "TopicB"),
+                "Subscriber": {
+                    "Type": "AWS::SNS::Subscription",
+                    "DependsOn": ["PolicyB"],
+                    "Properties": {"TopicArn": {"Ref": "PolicyB"}},
+                },
+                "CDKMetadata": {
+                    "Type": "AWS::CDK::Metadata",
+                    "Condition": "CDKMetadataAvailable",
+                },
+            },
+        }
+    )
+
+    assert "Conditions" not in template
+    assert sorted(template["Resources"]) == [
+        "PolicyA",
+        "Subscriber",
+        "TopicA",
+        "TopicB",
+    ]
+    assert template["Resources"]["PolicyA"] == {
+        "Type": "AWS::SNS::TopicPolicy",
+        "Properties": {
+            "PolicyDocument": {
+                "Statement": [STATEMENT],
+                "Version": "2012-10-17",
+            },
+            "Topics": [{"Ref": "TopicA"}, {"Ref": "TopicB"}],
+        },
+        "DependsOn": ["TopicB"],
+    }
+    assert template["Resources"]["Subscriber"] == {
+        "Type": "AWS::SNS::Subscription",
+        "DependsOn": ["PolicyA"],
+        "Properties": {"TopicArn": {"Ref": "PolicyA"}},
+    }
+    assert template["Metadata"] == {MERGED_METADATA: {"PolicyB": "PolicyA"}}
+
+
+def test_minimise_keeps_first_policy():
+    """
+    Test that the first policy in the template keeps its logical ID, even
+    when a policy added after it sorts first.
+    """
+
+    template = minimise(
+        {
+            "Resources": {
+                "TopicA": {"Type": "AWS::SNS::Topic"},
+                "TopicB": {"Type": "AWS::SNS::Topic"},
+                "TopicPolicy": topic_policy("TopicA"),
+                "AddedPolicy": topic_policy("TopicB"),
+            },
+        }
+    )
+
+    assert sorted(template["Resources"]) == ["TopicA", "TopicB", "TopicPolicy"]
+    assert template["Metadata"] == {
+        MERGED_METADATA: {"AddedPolicy": "TopicPolicy"}
+    }
+
+
+def synth(tmp_path):
+    app = cdk.App(
+        outdir=str(tmp_path),
+        context={"aws:cdk:enable-path-metadata": True},
+    )
+    stack = cdk.Stack(app, "Topic-Stack")
+    for index in range(3):
+        topic = sns.Topic(stack, f"Topic-{index}")
+        topic.add_to_resource_policy(
+            iam.PolicyStatement(
+                sid="AllowAllInAccount",
+                actions=["sns:Publish"],
+                principals=[iam.AccountRootPrincipal()],
+                resources=["*"],
+            )
+        )
+
+    return app.synth()
+
+
+def test_apply(tmp_path):
+    """
+    Test that the templates of an assembly are minimised, and that the
+    template asset hash is updated to match.
+    """
+
+    report = TemplateBudget().apply(synth(tmp_path))
+    template_file = tmp_path / "Topic-Stack.template.json"
+    digest = hashlib.sha256(template_file.read_bytes()).hexdigest()
+
+    assert report["Topic-Stack"]["after"] < report["Topic-Stack"]["before"]
+    assert digest in (tmp_path / "Topic-Stack.assets.json").read_text()
+    assert digest in (tmp_path / "manifest.json").read_text()
+
+    template = json.loads(template_file.read_text())
+    policies = [
+        resource
+        for resource in template["Resources"].values()
+        if resource["Type"] == "AWS::SNS::TopicPolicy"
+    ]
+    assert len(policies) == 1
+    assert len(policies[0]["Properties"]["Topics"]) == 3
+    assert "aws:cdk:path" not in template_file.read_text()
+
+
+def test_budget_exceeded(tmp_path):
+    """
+    Test that synth fails when a template is over its budget, and that a
+    budget for the stack overrides the default.
+    """
+
+    with pytest.raises(TemplateBudgetError, match="Topic-Stack"):
+        TemplateBudget(max_bytes=100).apply(synth(tmp_path / "default"))
+
+    app = cdk.App(
+        context={
+            "template_budget": {
+                "max_bytes": 100,
+                "stacks": {"Topic-Stack": 10000},
+            }
+        }
+    )
+    assert TemplateBudget.for_app(app).apply(synth(tmp_path / "override"))